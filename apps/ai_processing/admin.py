@@ -8,7 +8,8 @@ class URLProcessingRequestAdmin(admin.ModelAdmin):
     list_display = ('url', 'status', 'created_at', 'processed_at')
     list_filter = ('status',)
     search_fields = ('url', 'error_message')
-    readonly_fields = ('created_at', 'processed_at', 'response_data')
+    readonly_fields = ('created_at', 'processed_at', 'response_data',
+                       'payload_tokens', 'input_tokens', 'output_tokens', 'latency_ms')
     fieldsets = (
         (None, {
             'fields': ('url', 'status')
@@ -16,6 +17,9 @@ class URLProcessingRequestAdmin(admin.ModelAdmin):
         ('Timing', {
             'fields': ('created_at', 'processed_at')
         }),
+        ('Usage', {
+            'fields': ('payload_tokens', 'input_tokens', 'output_tokens', 'latency_ms')
+        }),
         ('Response', {
             'fields': ('response_data', 'error_message')
         }),
@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class AIProcessingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.ai_processing'
-    verbose_name = 'AI Processing' 
\ No newline at end of file
+    verbose_name = 'AI Processing'
+
+    def ready(self):
+        # Connect the signal receivers that invalidate the dashboard status counts
+        from . import status_counts  # noqa: F401
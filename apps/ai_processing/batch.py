@@ -0,0 +1,283 @@
+"""
+Concurrent execution of batch URL processing.
+
+Processing a URL is mostly waiting: on the product page download and on the Bedrock
+converse call. BatchExecutor claims the pending requests of a batch from the work
+queue (see work_queue.py) and runs them on a pool of worker threads, with separate
+limits for the two stages:
+
+    max_workers            requests processed at the same time
+    fetch_concurrency      page downloads in flight
+    bedrock_concurrency    converse calls in flight
+
+Converse calls are also spaced out by an AdaptiveRateLimiter, which halves its rate
+when Bedrock throttles and slowly increases it again after successful calls, so a
+batch runs as fast as the account's quota allows instead of sleeping a fixed delay
+between URLs. Throttled calls are retried.
+
+The defaults come from the AI_BATCH_* settings.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Bedrock error codes that mean "slow down" rather than "this request is wrong"
+THROTTLING_ERROR_CODES = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceQuotaExceededException',
+    'ServiceUnavailableException',
+    'ModelNotReadyException',
+}
+
+
+def is_throttling_error(error):
+    """Return True if error is a botocore ClientError for a throttled request."""
+    response = getattr(error, 'response', None)
+    if not isinstance(response, dict):
+        return False
+    return response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+
+
+class AdaptiveRateLimiter:
+    """
+    A thread-safe rate limiter with additive increase and multiplicative decrease.
+
+    Callers are spaced 1 / rate seconds apart. The rate is multiplied by backoff on
+    every throttling error and increased by recovery after every success, staying
+    between min_rate and max_rate.
+    """
+
+    def __init__(self, requests_per_second=1.0, min_rate=0.05, max_rate=None,
+                 backoff=0.5, recovery=0.05, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            requests_per_second: Initial rate; None or 0 disables the limiter
+            min_rate: Lowest rate backed off to
+            max_rate: Highest rate recovered to (default: the initial rate)
+            backoff: Factor applied to the rate on throttling
+            recovery: Requests per second added to the rate on success
+            clock: Monotonic clock in seconds
+            sleep: Function used to wait
+        """
+        self.rate = requests_per_second
+        self.min_rate = min_rate
+        self.max_rate = max_rate or requests_per_second
+        self.backoff = backoff
+        self.recovery = recovery
+        self.clock = clock
+        self.sleep = sleep
+        self._next = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait for the next free slot."""
+        if not self.rate:
+            return
+        with self._lock:
+            now = self.clock()
+            wait = max(0.0, self._next - now)
+            self._next = max(now, self._next) + 1.0 / self.rate
+        if wait:
+            self.sleep(wait)
+
+    def on_success(self):
+        if not self.rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.recovery)
+
+    def on_throttle(self):
+        if not self.rate:
+            return
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.backoff)
+            # Let the next caller wait a full (longer) interval
+            self._next = max(self._next, self.clock() + 1.0 / self.rate)
+        logger.warning(f"Bedrock throttled the request, backing off to {self.rate:.2f} requests/s")
+
+
+class ProcessingLimits:
+    """Concurrency and rate limits for the stages of processing a URL."""
+
+    def __init__(self, fetch_concurrency=None, bedrock_concurrency=None, rate_limiter=None, max_retries=5):
+        """
+        Args:
+            fetch_concurrency: Maximum page downloads in flight (None for no limit)
+            bedrock_concurrency: Maximum converse calls in flight (None for no limit)
+            rate_limiter: Optional AdaptiveRateLimiter for converse calls
+            max_retries: Number of times a throttled converse call is retried
+        """
+        self._fetch = threading.BoundedSemaphore(fetch_concurrency) if fetch_concurrency else None
+        self._bedrock = threading.BoundedSemaphore(bedrock_concurrency) if bedrock_concurrency else None
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+
+    @contextmanager
+    def fetching(self):
+        """Context manager holding a page download slot."""
+        if self._fetch is None:
+            yield
+            return
+        with self._fetch:
+            yield
+
+    def converse(self, client, **kwargs):
+        """
+        Call client.converse(**kwargs) within the Bedrock limits, retrying throttled calls.
+
+        Returns:
+            dict: The converse response
+        """
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                if self._bedrock is None:
+                    response = client.converse(**kwargs)
+                else:
+                    with self._bedrock:
+                        response = client.converse(**kwargs)
+            except Exception as e:
+                if not is_throttling_error(e) or attempt == self.max_retries:
+                    raise
+                if self.rate_limiter is not None:
+                    self.rate_limiter.on_throttle()
+                else:
+                    time.sleep(2 ** attempt)
+                continue
+
+            if self.rate_limiter is not None:
+                self.rate_limiter.on_success()
+            return response
+
+
+# Limits used when a URL is processed on its own
+NO_LIMITS = ProcessingLimits()
+
+
+class BatchExecutor:
+    """Processes the pending requests of a batch on a pool of worker threads."""
+
+    def __init__(self, max_workers=None, fetch_concurrency=None, bedrock_concurrency=None,
+                 requests_per_second=None, client=None, process=None, queue=None, sleep=time.sleep):
+        """
+        Args:
+            max_workers: Number of requests processed at the same time
+            fetch_concurrency: Maximum page downloads in flight
+            bedrock_concurrency: Maximum converse calls in flight
+            requests_per_second: Initial converse rate; 0 disables rate limiting
+            client: Bedrock client shared by the workers (default: get_bedrock_client())
+            process: Callable (request_id, client, limits) processing one request
+                     (default: views.process_url_request)
+            queue: WorkQueue the requests are claimed from
+            sleep: Function waiting for scheduled retries
+        """
+        self.max_workers = max_workers or getattr(settings, 'AI_BATCH_MAX_WORKERS', 4)
+        fetch_concurrency = fetch_concurrency or getattr(settings, 'AI_BATCH_FETCH_CONCURRENCY', 4)
+        bedrock_concurrency = bedrock_concurrency or getattr(settings, 'AI_BATCH_BEDROCK_CONCURRENCY', 2)
+        if requests_per_second is None:
+            requests_per_second = getattr(settings, 'AI_BEDROCK_REQUESTS_PER_SECOND', 1.0)
+
+        self.limits = ProcessingLimits(
+            fetch_concurrency=fetch_concurrency,
+            bedrock_concurrency=bedrock_concurrency,
+            rate_limiter=AdaptiveRateLimiter(requests_per_second),
+        )
+        self.client = client
+        self.process = process
+        self.queue = queue
+        self.sleep = sleep
+
+    def _process(self, request_id, client):
+        try:
+            self.process(request_id, client=client, limits=self.limits)
+        finally:
+            # Worker threads open their own database connections
+            connections.close_all()
+
+    def run(self, batch_id):
+        """
+        Process all claimable requests of a batch, then create pages for completed ones.
+
+        Requests are claimed from the work queue as workers become free, so they are
+        never processed twice when queue workers (run_workers) serve the same batch.
+        Claims, lease heartbeats and retry scheduling happen on the calling thread.
+        Failed requests are retried with the queue's backoff: when only scheduled
+        retries are left, the executor waits for them rather than leaving them to
+        queue workers that may not be running, so the batch always ends with every
+        request completed or out of attempts.
+
+        Args:
+            batch_id: ID of the BatchURLProcessingRequest
+        """
+        from .models import BatchURLProcessingRequest, URLProcessingRequest
+        from .utils import get_bedrock_client
+        from .views import create_pages_for_completed_requests, process_url_request
+        from .work_queue import WorkQueue
+
+        if self.process is None:
+            self.process = process_url_request
+        if self.queue is None:
+            self.queue = WorkQueue()
+
+        try:
+            batch = BatchURLProcessingRequest.objects.get(id=batch_id)
+        except BatchURLProcessingRequest.DoesNotExist:
+            logger.error(f"Batch ID {batch_id} not found")
+            return
+
+        logger.info(f"Processing claimable requests in batch {batch_id} with {self.max_workers} workers")
+
+        client = None
+        heartbeat_interval = self.queue.lease_seconds / 3
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ai-batch') as executor:
+            futures = {}
+            while True:
+                free = self.max_workers - len(futures)
+                claimed = self.queue.claim(limit=free, batch_id=batch_id) if free else []
+                if claimed and client is None:
+                    client = self.client or get_bedrock_client()
+                for url_request in claimed:
+                    futures[executor.submit(self._process, url_request.id, client)] = url_request.id
+                if not futures:
+                    retry_at = self.queue.next_retry_at(batch_id)
+                    if retry_at is None:
+                        break
+                    delay = (retry_at - timezone.now()).total_seconds()
+                    logger.info(f"Waiting {max(delay, 0):.0f}s for the next retry in batch {batch_id}")
+                    self.sleep(max(delay, 0))
+                    continue
+
+                done, _ = wait(futures, timeout=heartbeat_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    request_id = futures.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.exception(f"Error processing request {request_id}")
+                        # Let finish() retry it rather than leaving it processing
+                        url_request = URLProcessingRequest.objects.get(pk=request_id)
+                        if url_request.status == 'processing':
+                            url_request.mark_as_failed(str(e))
+                    self.queue.finish(request_id)
+                if futures:
+                    self.queue.heartbeat(list(futures.values()))
+
+        create_pages_for_completed_requests(batch_id)
+
+        # The counters are kept up to date by each request's status changes;
+        # recount once to correct any drift
+        if batch.reconcile():
+            logger.warning(f"Corrected drifted counters of batch {batch_id}")
+
+        logger.info(f"Batch processing complete for batch ID: {batch_id}")
@@ -0,0 +1,216 @@
+"""
+Page acquisition for the AI pipeline.
+
+Every URL is downloaded once per processing run through a pooled requests session
+with retries, and the resulting FetchedPage (bytes, decoded text and a lazily built
+parse tree) is handed to both the HTML simplifier and the fallback preprocessor.
+
+Each thread gets its own session (requests sessions are not guaranteed thread-safe),
+so keep-alive connections are reused across the URLs a batch worker processes.
+Responses carrying an ETag or Last-Modified header are remembered in a small
+in-memory LRU, and the next fetch of the same URL is a conditional request: a
+304 Not Modified reuses the stored body instead of downloading it again. Only the
+body and headers are remembered; parse trees live as long as the FetchedPage that
+built them.
+
+Pool size, retries, timeout and the number of remembered pages come from the
+AI_FETCH_* settings.
+"""
+
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from apps.scrapers.utils.html_parser import get_html_parser, make_soup
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# What the fetcher keeps of a page for conditional requests
+RememberedPage = namedtuple('RememberedPage', ['content', 'encoding', 'headers', 'status_code'])
+
+
+class FetchedPage:
+    """A downloaded page, with its parse tree built once on first use."""
+
+    def __init__(self, url, content, encoding, headers, status_code=200, not_modified=False):
+        """
+        Args:
+            url: The requested URL
+            content: Response body as bytes
+            encoding: Encoding used to decode content
+            headers: Response headers
+            status_code: HTTP status of the response the content came from
+            not_modified: True if the content was reused after a 304 Not Modified
+        """
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+        self.headers = headers
+        self.status_code = status_code
+        self.not_modified = not_modified
+        self._text = None
+        self._soups = {}
+
+    @classmethod
+    def from_response(cls, url, response):
+        return cls(url, response.content, response.encoding or response.apparent_encoding,
+                   response.headers, response.status_code)
+
+    @property
+    def text(self):
+        """The body decoded the way requests' Response.text would."""
+        if self._text is None:
+            try:
+                self._text = str(self.content, self.encoding or 'utf-8', errors='replace')
+            except LookupError:
+                self._text = str(self.content, 'utf-8', errors='replace')
+        return self._text
+
+    @property
+    def content_type(self):
+        return self.headers.get('Content-Type', '').lower()
+
+    @property
+    def is_html(self):
+        return 'text/html' in self.content_type
+
+    def soup(self, parser=None):
+        """
+        Return the parse tree of the page, parsing it once per parser backend.
+
+        The tree is shared by all callers, which must not modify it.
+        """
+        name = get_html_parser(parser)
+        soup = self._soups.get(name)
+        if soup is None:
+            soup = self._soups[name] = make_soup(self.text, name)
+        return soup
+
+
+class PageFetcher:
+    """Downloads pages through per-thread pooled sessions with conditional requests."""
+
+    def __init__(self, pool_size=None, retries=None, timeout=None, max_remembered=None):
+        """
+        Args:
+            pool_size: Connections kept per host and thread
+            retries: Retries on connection errors and 429/5xx responses
+            timeout: Timeout in seconds for each request
+            max_remembered: Number of pages kept for conditional requests (0 disables them)
+        """
+        self.pool_size = pool_size or getattr(settings, 'AI_FETCH_POOL_SIZE', 10)
+        self.retries = retries if retries is not None else getattr(settings, 'AI_FETCH_RETRIES', 3)
+        self.timeout = timeout or getattr(settings, 'AI_FETCH_TIMEOUT', 30)
+        if max_remembered is None:
+            max_remembered = getattr(settings, 'AI_FETCH_REMEMBERED_PAGES', 128)
+        self.max_remembered = max_remembered
+
+        self._local = threading.local()
+        self._remembered = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _build_session(self):
+        session = requests.Session()
+        session.headers['User-Agent'] = USER_AGENT
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=('GET', 'HEAD'),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @property
+    def session(self):
+        """The pooled session of the current thread."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._build_session()
+        return session
+
+    def _remembered_page(self, url):
+        with self._lock:
+            page = self._remembered.get(url)
+            if page is not None:
+                self._remembered.move_to_end(url)
+            return page
+
+    def _remember(self, page):
+        if not self.max_remembered:
+            return
+        if not (page.headers.get('ETag') or page.headers.get('Last-Modified')):
+            return
+        with self._lock:
+            self._remembered[page.url] = RememberedPage(page.content, page.encoding, page.headers, page.status_code)
+            self._remembered.move_to_end(page.url)
+            while len(self._remembered) > self.max_remembered:
+                self._remembered.popitem(last=False)
+
+    def fetch(self, url):
+        """
+        Download a page, revalidating a remembered copy if there is one.
+
+        Args:
+            url: URL of the page
+
+        Returns:
+            FetchedPage: The page
+
+        Raises:
+            requests.RequestException: If the page cannot be downloaded
+        """
+        headers = {}
+        previous = self._remembered_page(url)
+        if previous is not None:
+            if previous.headers.get('ETag'):
+                headers['If-None-Match'] = previous.headers['ETag']
+            if previous.headers.get('Last-Modified'):
+                headers['If-Modified-Since'] = previous.headers['Last-Modified']
+
+        logger.info(f"Fetching {url}...")
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304 and previous is not None:
+            logger.info(f"{url} not modified, reusing the stored page")
+            return FetchedPage(url, previous.content, previous.encoding, previous.headers,
+                               previous.status_code, not_modified=True)
+
+        response.raise_for_status()
+        page = FetchedPage.from_response(url, response)
+        self._remember(page)
+        return page
+
+    def head(self, url, timeout=10):
+        """Send a HEAD request through the pooled session."""
+        return self.session.head(url, timeout=timeout)
+
+    def forget(self):
+        """Drop all remembered pages."""
+        with self._lock:
+            self._remembered.clear()
+
+
+# The fetcher shared by the whole process
+page_fetcher = PageFetcher()
+
+
+def fetch_page(url):
+    """Download a page with the shared fetcher."""
+    return page_fetcher.fetch(url)
@@ -0,0 +1,34 @@
+import logging
+from django.core.management.base import BaseCommand
+from apps.ai_processing.models import BatchURLProcessingRequest
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = (
+        'Recount the requests of batches and correct drifted counters. '
+        'Batch counters are maintained incrementally; run this periodically (e.g. from cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-id', type=int, action='append', help='Only reconcile this batch (repeatable)')
+        parser.add_argument('--all', action='store_true',
+                            help='Reconcile all batches, not only pending and processing ones')
+
+    def handle(self, *args, **options):
+        batches = BatchURLProcessingRequest.objects.order_by('id')
+        if options.get('batch_id'):
+            batches = batches.filter(id__in=options['batch_id'])
+        elif not options.get('all'):
+            batches = batches.filter(status__in=['pending', 'processing'])
+
+        checked = corrected = 0
+        for batch in batches.iterator():
+            checked += 1
+            if batch.reconcile():
+                corrected += 1
+                logger.warning(f"Corrected drifted counters of batch {batch.id}")
+                self.stdout.write(f"Corrected batch {batch.id} ({batch.name}): {batch.processed_urls}/"
+                                  f"{batch.total_urls} processed, {batch.failed_urls} failed, status {batch.status}")
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {checked} batches, corrected {corrected}"))
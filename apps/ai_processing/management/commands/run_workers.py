@@ -0,0 +1,58 @@
+import logging
+import multiprocessing
+from django.core.management.base import BaseCommand
+from django.db import connections
+from apps.ai_processing.work_queue import run_worker_process
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Run worker processes that claim and process queued URL processing requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Number of worker processes (default: 1)')
+        parser.add_argument('--batch-id', type=int, help='Only process requests of this batch')
+        parser.add_argument('--max-items', type=int, help='Stop each worker after this many requests')
+        parser.add_argument('--burst', action='store_true', help='Exit when the queue is empty instead of polling')
+        parser.add_argument('--delay', type=float, default=0, help='Delay between requests of a worker (in seconds)')
+
+    def handle(self, *args, **options):
+        worker_options = {
+            'batch_id': options['batch_id'],
+            'max_items': options['max_items'],
+            'burst': options['burst'],
+            'delay': options['delay'],
+        }
+
+        if options['processes'] <= 1:
+            processed = run_worker_process(**worker_options)
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed or 0} requests"))
+            return
+
+        # Child processes must open their own database connections
+        connections.close_all()
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+        processes = [
+            context.Process(target=run_worker_process, kwargs=worker_options, name=f'ai-worker-{n}')
+            for n in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} worker processes")
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping workers...")
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+
+        failed = [process.name for process in processes if process.exitcode]
+        if failed:
+            self.stdout.write(self.style.ERROR(f"Workers exited with errors: {', '.join(failed)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("All workers finished"))
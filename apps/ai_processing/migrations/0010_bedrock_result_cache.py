@@ -0,0 +1,35 @@
+# Generated by Django 5.1.15 on 2026-10-17 03:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_processing', '0009_urlprocessingrequest_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BedrockResultCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='SHA-256 of the prompt ARN, HTML and existing tags', max_length=64, unique=True)),
+                ('prompt_arn', models.CharField(max_length=255)),
+                ('response_data', models.JSONField()),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Bedrock Result Cache Entry',
+                'verbose_name_plural': 'Bedrock Result Cache Entries',
+            },
+        ),
+        migrations.AddField(
+            model_name='urlprocessingrequest',
+            name='from_cache',
+            field=models.BooleanField(default=False, help_text='Whether the response was reused from the Bedrock result cache'),
+        ),
+    ]
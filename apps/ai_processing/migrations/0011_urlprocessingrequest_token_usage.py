@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-17 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_processing', '0010_bedrock_result_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlprocessingrequest',
+            name='input_tokens',
+            field=models.PositiveIntegerField(blank=True, help_text='Input tokens reported by Bedrock', null=True),
+        ),
+        migrations.AddField(
+            model_name='urlprocessingrequest',
+            name='latency_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Latency of the Bedrock call in milliseconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='urlprocessingrequest',
+            name='output_tokens',
+            field=models.PositiveIntegerField(blank=True, help_text='Output tokens reported by Bedrock', null=True),
+        ),
+        migrations.AddField(
+            model_name='urlprocessingrequest',
+            name='payload_tokens',
+            field=models.PositiveIntegerField(blank=True, help_text='Estimated number of tokens of the prompt variables sent to Bedrock', null=True),
+        ),
+    ]
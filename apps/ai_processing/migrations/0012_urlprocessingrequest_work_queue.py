@@ -0,0 +1,38 @@
+# Generated by Django 5.1.15 on 2026-10-17 03:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_processing', '0011_urlprocessingrequest_token_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlprocessingrequest',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, help_text='Number of times a worker claimed the request'),
+        ),
+        migrations.AddField(
+            model_name='urlprocessingrequest',
+            name='available_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Earliest time a worker may claim the request'),
+        ),
+        migrations.AddField(
+            model_name='urlprocessingrequest',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='When another worker may reclaim the request', null=True),
+        ),
+        migrations.AddField(
+            model_name='urlprocessingrequest',
+            name='leased_by',
+            field=models.CharField(blank=True, default='', help_text='Worker holding the request', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='urlprocessingrequest',
+            index=models.Index(fields=['status', 'available_at'], name='ai_request_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.15 on 2026-10-17 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_processing', '0012_urlprocessingrequest_work_queue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='batchurlprocessingrequest',
+            index=models.Index(fields=['-created_at', '-id'], name='ai_batch_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='urlprocessingrequest',
+            index=models.Index(fields=['-created_at'], name='ai_request_created_idx'),
+        ),
+    ]
@@ -1,7 +1,23 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Value, When
 from django.utils import timezone
 
 
+# Batch counters that include a request in each status
+STATUS_COUNTERS = {
+    'pending': (),
+    'processing': ('processed_urls',),
+    'completed': ('processed_urls', 'successful_urls'),
+    'failed': ('processed_urls', 'failed_urls'),
+}
+
+
+def invalidate_status_counts_on_commit():
+    """Drop the cached dashboard status histograms once the current transaction commits."""
+    from .status_counts import invalidate_status_counts
+    transaction.on_commit(invalidate_status_counts)
+
+
 class BatchURLProcessingRequest(models.Model):
     """Model to track batch URL processing requests."""
     name = models.CharField(max_length=255, verbose_name="Batch Name")
@@ -41,43 +57,91 @@ class BatchURLProcessingRequest(models.Model):
         verbose_name = "Batch URL Processing Request"
         verbose_name_plural = "Batch URL Processing Requests"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='ai_batch_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.status})"
     
-    def update_status(self):
-        """Update the status based on individual URL processing requests."""
-        # Count related requests by status
-        total = self.url_requests.count()
-        processed = self.url_requests.exclude(status='pending').count()
-        completed = self.url_requests.filter(status='completed').count()
-        failed = self.url_requests.filter(status='failed').count()
+    @classmethod
+    def record_transition(cls, batch_id, previous, status, count=1):
+        """
+        Update a batch's counters and status after requests changed status.
         
-        # Update counters
-        self.total_urls = total
-        self.processed_urls = processed
-        self.successful_urls = completed
-        self.failed_urls = failed
+        The counters are changed with atomic F() increments and the status is derived
+        from them, so concurrent workers never count the batch's requests.
         
-        # Calculate the new status
-        if total == 0:
-            new_status = 'pending'
-        elif processed == 0:
-            new_status = 'pending'
-        elif processed < total:
-            new_status = 'processing'
-        elif failed == total:
-            new_status = 'failed'
-        elif completed == total:
-            new_status = 'completed'
-            self.completed_at = timezone.now()
-        else:
-            new_status = 'partial'
-            
-        self.status = new_status
-        self.save()
+        Args:
+            batch_id: ID of the batch
+            previous: Status the requests had
+            status: Status the requests have now
+            count: Number of requests that changed status
+        """
+        deltas = {}
+        for field in STATUS_COUNTERS[previous]:
+            deltas[field] = deltas.get(field, 0) - count
+        for field in STATUS_COUNTERS[status]:
+            deltas[field] = deltas.get(field, 0) + count
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
         
-        return new_status
+        with transaction.atomic():
+            cls.objects.filter(pk=batch_id).update(**{
+                field: F(field) + delta for field, delta in deltas.items()
+            })
+            cls._derive_status(cls.objects.filter(pk=batch_id))
+            invalidate_status_counts_on_commit()
+    
+    @staticmethod
+    def _derive_status(batches):
+        """Set the status of batches from their counters, in a single UPDATE."""
+        completed = Q(total_urls__gt=0, successful_urls=F('total_urls'))
+        batches.update(
+            status=Case(
+                When(processed_urls=0, then=Value('pending')),
+                When(total_urls__gt=F('successful_urls') + F('failed_urls'), then=Value('processing')),
+                When(completed, then=Value('completed')),
+                When(failed_urls=F('total_urls'), then=Value('failed')),
+                default=Value('partial'),
+            ),
+            completed_at=Case(
+                When(completed, then=Value(timezone.now())),
+                default=F('completed_at'),
+            ),
+        )
+    
+    def update_status(self):
+        """Derive the status from the batch counters (without counting its requests)."""
+        self._derive_status(BatchURLProcessingRequest.objects.filter(pk=self.pk))
+        self.refresh_from_db(fields=['status', 'completed_at'])
+        return self.status
+    
+    def reconcile(self):
+        """
+        Recount the batch's requests and correct the counters if they drifted.
+        
+        Returns:
+            bool: True if any counter was corrected
+        """
+        counts = self.url_requests.aggregate(
+            total_urls=Count('id'),
+            processed_urls=Count('id', filter=~Q(status='pending')),
+            successful_urls=Count('id', filter=Q(status='completed')),
+            failed_urls=Count('id', filter=Q(status='failed')),
+        )
+        self.refresh_from_db(fields=list(counts))
+        drifted = any(getattr(self, field) != value for field, value in counts.items())
+        
+        with transaction.atomic():
+            if drifted:
+                BatchURLProcessingRequest.objects.filter(pk=self.pk).update(**counts)
+                for field, value in counts.items():
+                    setattr(self, field, value)
+                invalidate_status_counts_on_commit()
+            self.update_status()
+        return drifted
     
     @property
     def progress_percentage(self):
@@ -120,6 +184,18 @@ class URLProcessingRequest(models.Model):
     error_message = models.TextField(blank=True, null=True)
     response_data = models.JSONField(blank=True, null=True)
     created_page_id = models.IntegerField(blank=True, null=True, help_text="ID of the page created from this request")
+    from_cache = models.BooleanField(
+        default=False,
+        help_text="Whether the response was reused from the Bedrock result cache"
+    )
+    payload_tokens = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        help_text="Estimated number of tokens of the prompt variables sent to Bedrock"
+    )
+    input_tokens = models.PositiveIntegerField(blank=True, null=True, help_text="Input tokens reported by Bedrock")
+    output_tokens = models.PositiveIntegerField(blank=True, null=True, help_text="Output tokens reported by Bedrock")
+    latency_ms = models.PositiveIntegerField(blank=True, null=True, help_text="Latency of the Bedrock call in milliseconds")
     batch = models.ForeignKey(
         BatchURLProcessingRequest,
         on_delete=models.CASCADE,
@@ -127,42 +203,91 @@ class URLProcessingRequest(models.Model):
         null=True,
         blank=True
     )
+    # Work queue state (see work_queue.py)
+    attempts = models.PositiveIntegerField(default=0, help_text="Number of times a worker claimed the request")
+    available_at = models.DateTimeField(default=timezone.now, help_text="Earliest time a worker may claim the request")
+    leased_by = models.CharField(max_length=255, blank=True, default='', help_text="Worker holding the request")
+    lease_expires_at = models.DateTimeField(blank=True, null=True, help_text="When another worker may reclaim the request")
     
     class Meta:
         verbose_name = "URL Processing Request"
         verbose_name_plural = "URL Processing Requests"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='ai_request_queue_idx'),
+            models.Index(fields=['-created_at'], name='ai_request_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.url} ({self.status})"
     
-    def mark_as_processing(self):
-        self.status = 'processing'
-        self.save(update_fields=['status'])
+    def _set_status(self, status, **fields):
+        """
+        Move the request to status and update its batch's counters.
         
-        # Update batch status if part of a batch
-        if self.batch:
-            self.batch.update_status()
-    
-    def mark_as_completed(self, response_data):
-        self.status = 'completed'
-        self.processed_at = timezone.now()
-        self.response_data = response_data
-        self.save(update_fields=['status', 'processed_at', 'response_data'])
+        The row is only updated if its status is still the one this instance last
+        saw, so a transition is counted once even when requests are updated
+        concurrently.
+        """
+        while True:
+            previous = self.status
+            with transaction.atomic():
+                updated = URLProcessingRequest.objects.filter(pk=self.pk, status=previous).update(
+                    status=status, **fields
+                )
+                if updated:
+                    if self.batch_id:
+                        BatchURLProcessingRequest.record_transition(self.batch_id, previous, status)
+                    invalidate_status_counts_on_commit()
+                    break
+            self.refresh_from_db(fields=['status'])
         
-        # Update batch status if part of a batch
-        if self.batch:
-            self.batch.update_status()
+        self.status = status
+        for field, value in fields.items():
+            setattr(self, field, value)
+    
+    def mark_as_pending(self):
+        self._set_status('pending', error_message=None, attempts=0, available_at=timezone.now())
+    
+    def schedule_retry(self, available_at):
+        """Put a failed request back in the queue, keeping its error and attempts."""
+        self._set_status('pending', available_at=available_at, leased_by='', lease_expires_at=None)
+    
+    def mark_as_processing(self):
+        self._set_status('processing')
+    
+    def record_usage(self, payload_tokens, bedrock_response=None):
+        """Record the estimated payload size and the usage Bedrock reported for it."""
+        self.payload_tokens = payload_tokens
+        usage = (bedrock_response or {}).get('usage') or {}
+        metrics = (bedrock_response or {}).get('metrics') or {}
+        self.input_tokens = usage.get('inputTokens')
+        self.output_tokens = usage.get('outputTokens')
+        self.latency_ms = metrics.get('latencyMs')
+        self.save(update_fields=['payload_tokens', 'input_tokens', 'output_tokens', 'latency_ms'])
+    
+    def mark_as_completed(self, response_data, from_cache=False):
+        self._set_status('completed', processed_at=timezone.now(), response_data=response_data,
+                         from_cache=from_cache)
     
     def mark_as_failed(self, error_message):
-        self.status = 'failed'
-        self.processed_at = timezone.now()
-        self.error_message = error_message
-        self.save(update_fields=['status', 'processed_at', 'error_message'])
-        
-        # Update batch status if part of a batch
-        if self.batch:
-            self.batch.update_status()
+        self._set_status('failed', processed_at=timezone.now(), error_message=error_message)
+
+class BedrockResultCacheEntry(models.Model):
+    """Structured data extracted by Bedrock, stored by the database result cache."""
+    key = models.CharField(max_length=64, unique=True, help_text="SHA-256 of the prompt ARN, HTML and existing tags")
+    prompt_arn = models.CharField(max_length=255)
+    response_data = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    hit_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Bedrock Result Cache Entry"
+        verbose_name_plural = "Bedrock Result Cache Entries"
+
+    def __str__(self):
+        return self.key
 
 
 class SelectorConfiguration(models.Model):
@@ -0,0 +1,238 @@
+"""
+Token-budgeted prompt variables for Bedrock.
+
+The preprocessed page and the existing tags are fitted into a token budget
+(AI_PAYLOAD_MAX_TOKENS) instead of cutting the page at a fixed number of characters:
+
+    * tokens are estimated from the text length (AI_PAYLOAD_CHARS_PER_TOKEN
+      characters per token), which is close enough for budgeting without a tokenizer
+    * only the tags whose words appear on the page are sent, most relevant first and
+      at most AI_PAYLOAD_MAX_TAGS of them
+    * the page gets the rest of the budget. Simplifier output keeps its sections in
+      SelectorConfiguration order: sections that fit are kept whole and the others
+      keep the elements that fit. Markup keeps whole elements, descending into an
+      element that does not fit to keep the children that do. Content is never cut
+      in the middle of a tag.
+"""
+
+import json
+import logging
+import re
+
+from bs4 import NavigableString
+from django.conf import settings
+
+from apps.scrapers.utils.html_parser import make_soup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TOKENS = 25000
+DEFAULT_MAX_TAGS = 200
+DEFAULT_CHARS_PER_TOKEN = 4
+
+# Headers written by extract_content_with_selectors
+SECTION_RE = re.compile(r'^### .* ###$', re.MULTILINE)
+ELEMENT_RE = re.compile(r'^--- Element \d+ ---$', re.MULTILINE)
+
+MARKUP_RE = re.compile(r'<[^>]*>')
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def words(text):
+    """Return the set of lowercase words of text, ignoring markup."""
+    return set(WORD_RE.findall(MARKUP_RE.sub(' ', text).lower()))
+
+
+def split_at(text, pattern):
+    """Split text before each match of pattern; the first part may be empty."""
+    starts = [match.start() for match in pattern.finditer(text)]
+    bounds = [0] + starts + [len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:]) if end > start or start == 0]
+
+
+class Payload:
+    """The prompt variables of one Bedrock request and their estimated size."""
+
+    def __init__(self, url, site_html, tags, tokens, trimmed):
+        """
+        Args:
+            url: URL of the page
+            site_html: Page content, fitted into the budget
+            tags: Existing tags sent with the page
+            tokens: Estimated number of tokens of the prompt variables
+            trimmed: Whether page content was left out to fit the budget
+        """
+        self.url = url
+        self.site_html = site_html
+        self.tags = tags
+        self.tokens = tokens
+        self.trimmed = trimmed
+
+    @property
+    def tags_json(self):
+        return json.dumps(self.tags) if self.tags else ''
+
+    def prompt_variables(self):
+        return {
+            'site_html': {'text': self.site_html},
+            'page_url': {'text': self.url},
+            'existing_tags': {'text': self.tags_json},
+        }
+
+
+class PayloadBuilder:
+    """Fits page content and existing tags into a token budget."""
+
+    def __init__(self, max_tokens=None, max_tags=None, chars_per_token=None):
+        """
+        Args:
+            max_tokens: Token budget of the prompt variables
+            max_tags: Maximum number of existing tags sent
+            chars_per_token: Characters counted as one token
+        """
+        self.max_tokens = max_tokens or getattr(settings, 'AI_PAYLOAD_MAX_TOKENS', DEFAULT_MAX_TOKENS)
+        self.max_tags = max_tags if max_tags is not None else getattr(settings, 'AI_PAYLOAD_MAX_TAGS', DEFAULT_MAX_TAGS)
+        self.chars_per_token = chars_per_token or getattr(settings, 'AI_PAYLOAD_CHARS_PER_TOKEN', DEFAULT_CHARS_PER_TOKEN)
+
+    def estimate_tokens(self, text):
+        """Estimate the number of tokens of text."""
+        return -(-len(text) // self.chars_per_token)
+
+    def relevant_tags(self, tags, content):
+        """
+        Select the existing tags that share words with the page.
+
+        A tag is relevant if at least half of the words of its name appear on the page;
+        tags are ranked by that fraction and then keep their original order.
+
+        Args:
+            tags: List of {'category', 'name'} dicts
+            content: Page content
+
+        Returns:
+            list: At most max_tags of the tags
+        """
+        page_words = words(content)
+        scored = []
+        for index, tag in enumerate(tags):
+            tag_words = words(tag['name'])
+            if not tag_words:
+                continue
+            overlap = len(tag_words & page_words) / len(tag_words)
+            if overlap >= 0.5:
+                scored.append((-overlap, index, tag))
+        scored.sort(key=lambda item: item[:2])
+        return [tag for _, _, tag in scored[:self.max_tags]]
+
+    def fit(self, content, max_chars):
+        """
+        Fit page content into max_chars characters, leaving out whole sections or elements.
+
+        Returns:
+            str: The content, unchanged if it fits
+        """
+        if len(content) <= max_chars:
+            return content
+        if SECTION_RE.search(content):
+            return self._fit_sections(content, max_chars)
+        return self._fit_markup(content, max_chars)
+
+    def _fit_sections(self, content, max_chars):
+        # Sections come in SelectorConfiguration order, which is their priority
+        kept = []
+        remaining = max_chars
+        for section in split_at(content, SECTION_RE):
+            if len(section) <= remaining:
+                kept.append(section)
+                remaining -= len(section)
+                continue
+
+            header, *elements = split_at(section, ELEMENT_RE)
+            if elements:
+                if len(header) <= remaining:
+                    kept.append(header)
+                    remaining -= len(header)
+                    for element in elements:
+                        if len(element) <= remaining:
+                            kept.append(element)
+                            remaining -= len(element)
+            elif SECTION_RE.match(section):
+                # A single element has no marker: keep the header and the whole lines that fit
+                head, _, body = section.partition('\n')
+                fitted = self._fit_lines(body, remaining - len(head) - 2)
+                if fitted:
+                    kept.append(f'{head}\n{fitted}\n')
+                    remaining -= len(head) + len(fitted) + 2
+        return ''.join(kept)
+
+    def _fit_lines(self, text, max_chars):
+        kept = []
+        remaining = max_chars
+        for line in text.split('\n'):
+            if len(line) + 1 <= remaining:
+                kept.append(line)
+                remaining -= len(line) + 1
+        return '\n'.join(kept).strip('\n')
+
+    def _fit_markup(self, content, max_chars):
+        soup = make_soup(content)
+        if soup.body:
+            return self._fit_element(soup.body, max_chars)
+        kept = []
+        remaining = max_chars
+        for child in soup.contents:
+            markup = self._fit_element(child, remaining)
+            kept.append(markup)
+            remaining -= len(markup)
+        return ''.join(kept)
+
+    def _fit_element(self, element, max_chars):
+        """Serialize element into max_chars characters, keeping the children that fit."""
+        markup = element.output_ready() if isinstance(element, NavigableString) else element.decode()
+        if len(markup) <= max_chars:
+            return markup
+        if isinstance(element, NavigableString) or not element.contents:
+            return ''
+
+        close = f'</{element.name}>'
+        opening = element.decode(iterator=iter((element,)))[:-len(close)]
+        remaining = max_chars - len(opening) - len(close)
+        if remaining < 0:
+            return ''
+
+        kept = []
+        for child in element.children:
+            child_markup = self._fit_element(child, remaining)
+            kept.append(child_markup)
+            remaining -= len(child_markup)
+        if not any(kept):
+            return ''
+        return opening + ''.join(kept) + close
+
+    def build(self, url, content, tags):
+        """
+        Build the prompt variables of a page.
+
+        Args:
+            url: URL of the page
+            content: Preprocessed page content
+            tags: All existing tags, as {'category', 'name'} dicts
+
+        Returns:
+            Payload: The fitted payload
+        """
+        tags = self.relevant_tags(tags, content)
+        tags_json = json.dumps(tags) if tags else ''
+
+        max_chars = self.max_tokens * self.chars_per_token - len(url) - len(tags_json)
+        site_html = self.fit(content, max(max_chars, 0))
+        trimmed = site_html != content
+        if trimmed:
+            logger.warning(
+                f"Page content of {url} trimmed from about {self.estimate_tokens(content)} to "
+                f"{self.estimate_tokens(site_html)} tokens to fit the budget of {self.max_tokens}"
+            )
+
+        tokens = self.estimate_tokens(site_html) + self.estimate_tokens(url) + self.estimate_tokens(tags_json)
+        logger.info(f"Payload for {url}: about {tokens} tokens, {len(tags)} existing tags")
+        return Payload(url, site_html, tags, tokens, trimmed)
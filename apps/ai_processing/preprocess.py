@@ -0,0 +1,182 @@
+"""
+Single-parse HTML preprocessing of Bedrock payloads.
+
+Supplier pages are often 1-2 MB, and shrinking them is the largest CPU cost before
+the Bedrock call. The page is parsed once and never modified:
+
+    1. regions are selected on the parse tree (the whole <body> if no CSS selector
+       matches)
+    2. each region is serialized by a single walk over its elements, which skips
+       comments and scripts, styles, iframes, noscript and inline-hidden elements
+       instead of decomposing them
+    3. the serialized markup is minified in one regular expression pass: runs of
+       whitespace become one space, whitespace between two tags is dropped, and
+       <br> tags are normalized and keep the whitespace around them
+
+The output is byte-identical to the previous implementation, which parsed the page
+again for the CSS selectors, re-parsed every match and made four passes over the
+markup; apps/ai_processing/test_data/preprocessed holds golden outputs for the
+sample pages in the repository. That implementation also parsed the joined regions
+once more, which lxml and html5lib use to merge <html>, <head> and <body> regions
+into the new <body> and html5lib to drop table parts outside a table. Regions of
+those elements are therefore still parsed again with those parsers.
+"""
+
+import logging
+import re
+
+from bs4 import Comment, Tag
+
+from apps.scrapers.utils.html_parser import make_soup
+
+logger = logging.getLogger(__name__)
+
+# Elements left out of the payload, with their content
+PRUNED_TAGS = frozenset(('script', 'style', 'iframe', 'noscript'))
+HIDDEN_STYLES = ('display:none', 'display: none')
+
+# <br> tags, a literal placeholder once used to protect them, or a run of whitespace
+MINIFY_RE = re.compile(r'(?P<br><br\s*/?>|\{\{BR_TAG\}\})|\s+', re.IGNORECASE)
+BR_RE = re.compile(r'<br\s*/?>', re.IGNORECASE)
+
+# Elements that lxml or html5lib merge or drop when they are parsed as children of <body>
+REPARSED_TAGS = frozenset((
+    'html', 'head', 'body', 'caption', 'colgroup', 'col', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td',
+))
+
+
+def is_pruned(element):
+    """Return True if element and its content are left out of the payload."""
+    if isinstance(element, Comment):
+        return True
+    if not isinstance(element, Tag):
+        return False
+    if element.name.lower() in PRUNED_TAGS:
+        return True
+    style = element.get('style')
+    if isinstance(style, list):
+        style = ' '.join(style)
+    return bool(style) and any(hidden in style for hidden in HIDDEN_STYLES)
+
+
+def iter_kept(root, keep_root=True):
+    """
+    Yield root and its descendants in document order, skipping pruned subtrees.
+
+    Args:
+        root: The element to walk
+        keep_root: If False, root itself may be pruned (selected regions); the
+                   <body> of a page always is kept
+    """
+    if not keep_root and is_pruned(root):
+        return
+    yield root
+    if not root.contents:
+        return
+
+    # Walk the descendants like Tag.descendants does (a document's next_element is
+    # not its first child)
+    stop = root._last_descendant().next_element
+    element = root.contents[0]
+    while element is not None and element is not stop:
+        if is_pruned(element):
+            element = element._last_descendant().next_element
+        else:
+            yield element
+            element = element.next_element
+
+
+def serialize(root, keep_root=True):
+    """Serialize root like str(root) would after removing the pruned elements."""
+    return root.decode(iterator=iter_kept(root, keep_root))
+
+
+def minify(markup):
+    """
+    Minify serialized markup in one pass.
+
+    Whitespace runs become a single space, or nothing between a closing '>' and an
+    opening '<'; <br> tags (and their whitespace) are left out of that rule and are
+    written as '<br>'.
+    """
+    previous_br_end = -1
+
+    def replace(match):
+        nonlocal previous_br_end
+        if match.group('br'):
+            previous_br_end = match.end()
+            return '<br>'
+        start, end = match.span()
+        between_tags = (
+            start > 0 and markup[start - 1] == '>' and previous_br_end != start
+            and end < len(markup) and markup[end] == '<' and not BR_RE.match(markup, end)
+        )
+        return '' if between_tags else ' '
+
+    return MINIFY_RE.sub(replace, markup)
+
+
+def select_regions(soup, selectors):
+    """
+    Select the elements matching any of the CSS selectors, selector by selector.
+
+    Returns:
+        list: Matching elements, possibly nested or repeated, in selector order
+    """
+    regions = []
+    for selector in selectors:
+        try:
+            matches = soup.select(selector)
+        except Exception as e:
+            logger.error(f"Error applying selector '{selector}': {str(e)}")
+            continue
+        if matches:
+            logger.info(f"Found {len(matches)} elements matching selector '{selector}'")
+            regions.extend(matches)
+        else:
+            logger.warning(f"No elements found matching selector '{selector}'")
+    return regions
+
+
+def needs_reparse(soup, regions):
+    """Return True if regions of soup serialize differently once parsed again as children of <body>."""
+    if soup.builder.NAME == 'html.parser':
+        return False
+    return any(isinstance(region, Tag) and region.name.lower() in REPARSED_TAGS for region in regions)
+
+
+def preprocess(html_content, css_selectors=None, parser=None, soup=None):
+    """
+    Reduce a page to the markup sent to Bedrock.
+
+    Args:
+        html_content (str): The raw HTML content
+        css_selectors (str, optional): Comma-separated CSS selectors of the regions to keep
+        parser (str, optional): HTML parser backend; defaults to the SCRAPER_HTML_PARSER setting
+        soup (BeautifulSoup, optional): Parse tree of html_content to reuse; it is not modified
+
+    Returns:
+        str: Preprocessed HTML content
+    """
+    if soup is None:
+        soup = make_soup(html_content, parser)
+
+    selectors = [s.strip() for s in (css_selectors or '').split(',') if s.strip()]
+    regions = select_regions(soup, selectors) if selectors else []
+
+    if regions:
+        logger.info(f"Keeping {len(regions)} regions matched by {len(selectors)} CSS selectors")
+        markup = '<body>' + ''.join(serialize(region, keep_root=False) for region in regions) + '</body>'
+        if needs_reparse(soup, regions):
+            regions_soup = make_soup(f'<html><head><meta charset="utf-8"></head>{markup}</html>', soup.builder.NAME)
+            markup = serialize(regions_soup.body)
+    else:
+        if selectors:
+            logger.warning("No elements matched any of the provided selectors, using the full page")
+        body = soup.body
+        if not body:
+            logger.warning("No body tag found in HTML, using full content")
+            body = soup
+        markup = serialize(body)
+
+    return minify(markup)
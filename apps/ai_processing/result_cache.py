@@ -0,0 +1,260 @@
+"""
+Content-addressed cache of Bedrock extraction results.
+
+Re-processing a URL (retrying a request or a batch) usually sends Bedrock exactly the
+same prompt variables again. Results are therefore cached under a SHA-256 key of
+everything that determines the answer: the prompt ARN, the preprocessed HTML and the
+existing tags offered to the model. Only successfully extracted structured data is
+stored, so failures are always retried against Bedrock.
+
+Two backends are available, chosen with the AI_RESULT_CACHE_BACKEND setting:
+
+    database     BedrockResultCacheEntry rows (default)
+    filesystem   one JSON file per key under AI_RESULT_CACHE_DIR
+    none         caching disabled
+
+Entries older than AI_RESULT_CACHE_TTL seconds are ignored, and once the cache holds
+more than AI_RESULT_CACHE_MAX_ENTRIES the least recently used (database) or oldest
+(filesystem) entries are evicted. Eviction scans the whole cache, so writes run it at
+most once every AI_RESULT_CACHE_EVICT_INTERVAL seconds per process and cache; in
+between the cache may briefly hold more entries than the limit.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BedrockResultCacheEntry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 30 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_EVICT_INTERVAL = 5 * 60
+
+
+def result_cache_key(prompt_arn, html_content, existing_tags):
+    """
+    Build the cache key of a Bedrock request.
+
+    Args:
+        prompt_arn: ARN of the Bedrock prompt
+        html_content: The preprocessed HTML sent to the model
+        existing_tags: List of {'category', 'name'} dicts sent to the model
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    tags_digest = hashlib.sha256(
+        json.dumps(sorted((tag['category'], tag['name']) for tag in existing_tags)).encode('utf-8')
+    ).hexdigest()
+
+    digest = hashlib.sha256()
+    for part in (prompt_arn, html_content, tags_digest):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ResultCache(ABC):
+    """Base class of the result cache backends."""
+
+    # Monotonic time of the last eviction of each cache location in this process;
+    # caches are built per request, so this outlives the instances
+    _last_evicted = {}
+    _evict_lock = threading.Lock()
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, evict_interval=DEFAULT_EVICT_INTERVAL):
+        """
+        Args:
+            ttl: Seconds an entry stays valid (None for no expiry)
+            max_entries: Maximum number of entries kept (None for no limit)
+            evict_interval: Minimum seconds between evictions run by set() (0 to evict on every write)
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_interval = evict_interval
+
+    @property
+    @abstractmethod
+    def location(self):
+        """Identify the storage of the cache, so instances sharing it share evictions."""
+
+    @abstractmethod
+    def get(self, key):
+        """Return the cached structured data for key, or None."""
+
+    @abstractmethod
+    def set(self, key, prompt_arn, data):
+        """Store structured data under key and evict old entries if an eviction is due."""
+
+    @abstractmethod
+    def evict(self):
+        """Remove expired entries, then the least recently used ones above max_entries."""
+
+    def evict_if_due(self):
+        """
+        Run evict() unless it already ran for this location within evict_interval seconds.
+
+        Returns:
+            bool: True if evict() ran
+        """
+        now = time.monotonic()
+        with self._evict_lock:
+            last = self._last_evicted.get(self.location)
+            if last is not None and now - last < self.evict_interval:
+                return False
+            self._last_evicted[self.location] = now
+        self.evict()
+        return True
+
+
+class DatabaseResultCache(ResultCache):
+    """Result cache stored in BedrockResultCacheEntry rows."""
+
+    location = 'database'
+
+    def _valid(self):
+        entries = BedrockResultCacheEntry.objects.all()
+        if self.ttl:
+            entries = entries.filter(created_at__gte=timezone.now() - timedelta(seconds=self.ttl))
+        return entries
+
+    def get(self, key):
+        entry = self._valid().filter(key=key).values('response_data').first()
+        if entry is None:
+            return None
+        BedrockResultCacheEntry.objects.filter(key=key).update(
+            last_used_at=timezone.now(),
+            hit_count=F('hit_count') + 1,
+        )
+        return entry['response_data']
+
+    def set(self, key, prompt_arn, data):
+        now = timezone.now()
+        # Concurrent workers may store the same key; the last write wins
+        BedrockResultCacheEntry.objects.bulk_create(
+            [BedrockResultCacheEntry(key=key, prompt_arn=prompt_arn, response_data=data,
+                                     created_at=now, last_used_at=now)],
+            update_conflicts=True,
+            unique_fields=['key'],
+            update_fields=['prompt_arn', 'response_data', 'created_at', 'last_used_at'],
+        )
+        self.evict_if_due()
+
+    def evict(self):
+        if self.ttl:
+            cutoff = timezone.now() - timedelta(seconds=self.ttl)
+            BedrockResultCacheEntry.objects.filter(created_at__lt=cutoff).delete()
+        if self.max_entries:
+            stale_ids = list(BedrockResultCacheEntry.objects.order_by('-last_used_at')
+                             .values_list('id', flat=True)[self.max_entries:])
+            if stale_ids:
+                BedrockResultCacheEntry.objects.filter(id__in=stale_ids).delete()
+
+
+class FileSystemResultCache(ResultCache):
+    """
+    Result cache stored as one JSON file per key.
+
+    A file's mtime is its creation time, so expiry and eviction only need a directory
+    listing; the oldest entries (rather than the least recently used) are evicted.
+    """
+
+    def __init__(self, directory, **kwargs):
+        """
+        Args:
+            directory: Directory holding the cache files, created on first write
+        """
+        super().__init__(**kwargs)
+        self.directory = Path(directory)
+
+    @property
+    def location(self):
+        return str(self.directory.resolve())
+
+    def _path(self, key):
+        return self.directory / key[:2] / f'{key}.json'
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if self.ttl and time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)['response_data']
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable result cache file {path}: {e}")
+            return None
+
+    def set(self, key, prompt_arn, data):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'prompt_arn': prompt_arn, 'response_data': data}, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.evict_if_due()
+
+    def evict(self):
+        cutoff = time.time() - self.ttl if self.ttl else None
+        entries = []
+        for path in self.directory.glob('*/*.json'):
+            try:
+                mtime = path.stat().st_mtime
+                if cutoff is not None and mtime < cutoff:
+                    path.unlink()
+                else:
+                    entries.append((mtime, path))
+            except OSError:
+                continue
+
+        if self.max_entries and len(entries) > self.max_entries:
+            entries.sort(reverse=True)
+            for _, path in entries[self.max_entries:]:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+
+def get_result_cache():
+    """
+    Return the result cache configured with the AI_RESULT_CACHE_* settings.
+
+    Returns:
+        ResultCache: The cache backend, or None if caching is disabled
+    """
+    backend = getattr(settings, 'AI_RESULT_CACHE_BACKEND', 'database')
+    options = {
+        'ttl': getattr(settings, 'AI_RESULT_CACHE_TTL', DEFAULT_TTL),
+        'max_entries': getattr(settings, 'AI_RESULT_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+        'evict_interval': getattr(settings, 'AI_RESULT_CACHE_EVICT_INTERVAL', DEFAULT_EVICT_INTERVAL),
+    }
+
+    if backend == 'database':
+        return DatabaseResultCache(**options)
+    if backend == 'filesystem':
+        directory = getattr(settings, 'AI_RESULT_CACHE_DIR', None) or os.path.join(settings.BASE_DIR, 'cache', 'bedrock')
+        return FileSystemResultCache(directory, **options)
+    if backend not in ('', 'none'):
+        logger.warning(f"Unknown result cache backend '{backend}', caching disabled")
+    return None
@@ -0,0 +1,85 @@
+"""
+Status histograms of URL processing requests and batches for the dashboard.
+
+Each histogram is computed with a single conditional-aggregation query and kept in
+the Django cache for AI_DASHBOARD_COUNTS_TTL seconds. It is invalidated whenever a
+request or batch changes status (see URLProcessingRequest._set_status and
+BatchURLProcessingRequest.record_transition), when one is created and when a batch
+is deleted, so the TTL only bounds the staleness left by other bulk updates.
+Deleting single requests invalidates explicitly: a post_delete receiver on
+URLProcessingRequest would stop Django from deleting a batch's requests in bulk.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import BatchURLProcessingRequest, URLProcessingRequest
+
+REQUEST_STATUSES = ('pending', 'processing', 'completed', 'failed')
+BATCH_STATUSES = ('pending', 'processing', 'completed', 'failed', 'partial')
+
+REQUEST_COUNTS_KEY = 'ai_processing:request_status_counts'
+BATCH_COUNTS_KEY = 'ai_processing:batch_status_counts'
+
+DEFAULT_TTL = 30
+
+
+def _ttl():
+    return getattr(settings, 'AI_DASHBOARD_COUNTS_TTL', DEFAULT_TTL)
+
+
+def histogram(queryset, statuses, **extra):
+    """
+    Count the rows of queryset in total and per status in one query.
+
+    Args:
+        queryset: Rows to count
+        statuses: Status values to count
+        **extra: Additional aggregates
+
+    Returns:
+        dict: {'total': n, <status>: n, ..., <extra>: ...}
+    """
+    aggregates = {'total': Count('id')}
+    for status in statuses:
+        aggregates[status] = Count('id', filter=Q(status=status))
+    aggregates.update(extra)
+    return queryset.aggregate(**aggregates)
+
+
+def request_status_counts():
+    """Return the cached status histogram of all URL processing requests."""
+    return cache.get_or_set(
+        REQUEST_COUNTS_KEY,
+        lambda: histogram(URLProcessingRequest.objects.all(), REQUEST_STATUSES,
+                          cached=Count('id', filter=Q(status='completed', from_cache=True))),
+        _ttl(),
+    )
+
+
+def batch_status_counts():
+    """Return the cached status histogram of all batches."""
+    return cache.get_or_set(
+        BATCH_COUNTS_KEY,
+        lambda: histogram(BatchURLProcessingRequest.objects.all(), BATCH_STATUSES),
+        _ttl(),
+    )
+
+
+def invalidate_status_counts():
+    """Drop the cached histograms after a status change."""
+    cache.delete_many([REQUEST_COUNTS_KEY, BATCH_COUNTS_KEY])
+
+
+@receiver(post_save, sender=URLProcessingRequest)
+@receiver(post_save, sender=BatchURLProcessingRequest)
+@receiver(post_delete, sender=BatchURLProcessingRequest)
+def _invalidate_on_change(sender, created=True, **kwargs):
+    # Saves of existing rows that change a status go through the transition
+    # methods, which invalidate themselves
+    if created:
+        transaction.on_commit(invalidate_status_counts)
@@ -0,0 +1,794 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.categorized_tags.models import CategorizedTag
+from apps.categorized_tags.resolver import tag_resolver
+from apps.scrapers.utils.html_parser import available_parsers, get_html_parser
+
+from .batch import AdaptiveRateLimiter, BatchExecutor, ProcessingLimits, is_throttling_error
+from .fetch import FetchedPage, PageFetcher
+from .models import BatchURLProcessingRequest, BedrockResultCacheEntry, URLProcessingRequest
+from .payload import PayloadBuilder
+from .preprocess import minify
+from .result_cache import DatabaseResultCache, FileSystemResultCache, ResultCache, result_cache_key
+from .status_counts import batch_status_counts, request_status_counts
+from .utils import (
+    BedrockClientProvider, bedrock_client_provider, get_bedrock_client, preprocess_html, process_url_content,
+)
+from .views import process_url_request
+from .work_queue import WorkQueue, Worker
+
+
+def throttling_error():
+    return ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, 'Converse')
+
+
+def bedrock_response(data):
+    return {'output': {'message': {'content': [{'text': f"```json\n{json.dumps(data)}\n```"}]}}}
+
+
+class StubBedrockClient:
+    """A thread-safe stand-in for the bedrock-runtime client."""
+
+    def __init__(self, response, throttle=0, delay=0):
+        self.response = response
+        self.throttle = throttle
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def converse(self, **kwargs):
+        with self._lock:
+            self.calls.append(kwargs)
+            if self.throttle:
+                self.throttle -= 1
+                raise throttling_error()
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        return self.response
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def http_response(status_code=200, content=b'', headers=None):
+    response = mock.Mock(status_code=status_code, content=content, encoding='utf-8',
+                         headers={'Content-Type': 'text/html; charset=utf-8', **(headers or {})})
+    response.raise_for_status.return_value = None
+    return response
+
+
+class PageFetcherTests(SimpleTestCase):
+
+    def test_revalidates_remembered_pages(self):
+        fetcher = PageFetcher()
+        fetcher._local.session = session = mock.Mock()
+        session.get.side_effect = [
+            http_response(content=b'<p>v1</p>', headers={'ETag': '"v1"'}),
+            http_response(304),
+        ]
+
+        first = fetcher.fetch('https://example.com/a')
+        second = fetcher.fetch('https://example.com/a')
+
+        self.assertEqual(second.text, '<p>v1</p>')
+        self.assertTrue(second.not_modified)
+        self.assertFalse(first.not_modified)
+        self.assertEqual(session.get.call_args.kwargs['headers'], {'If-None-Match': '"v1"'})
+
+    def test_remembers_pages_without_parse_trees(self):
+        fetcher = PageFetcher()
+        fetcher._local.session = session = mock.Mock()
+        session.get.return_value = http_response(content=b'<p>v1</p>', headers={'ETag': '"v1"'})
+
+        page = fetcher.fetch('https://example.com/a')
+        page.soup()
+
+        remembered = fetcher._remembered['https://example.com/a']
+        self.assertNotIsInstance(remembered, FetchedPage)
+        self.assertEqual(remembered.content, b'<p>v1</p>')
+
+    def test_uses_one_session_per_thread(self):
+        fetcher = PageFetcher()
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(fetcher.session))
+        thread.start()
+        thread.join()
+
+        self.assertIs(fetcher.session, fetcher.session)
+        self.assertIsNot(sessions[0], fetcher.session)
+        self.assertEqual(fetcher.session.get_adapter('https://example.com').max_retries.total, fetcher.retries)
+
+    @mock.patch('apps.ai_processing.utils.simplify_html_content', side_effect=ValueError('no content'))
+    def test_process_url_content_downloads_and_parses_once(self, simplify_html_content):
+        page = FetchedPage('https://example.com/a', b'<html><body><script>x</script><p>Spec</p></body></html>',
+                           'utf-8', {'Content-Type': 'text/html'})
+        soup = page.soup()
+
+        with mock.patch('apps.ai_processing.utils.fetch_page', return_value=page) as fetch_page, \
+                mock.patch('apps.ai_processing.utils.make_soup') as make_soup:
+            self.assertEqual(process_url_content(page.url), '<body><p>Spec</p></body>')
+
+        fetch_page.assert_called_once_with(page.url)
+        make_soup.assert_not_called()
+        self.assertIs(simplify_html_content.call_args.kwargs['page'], page)
+        self.assertIs(page.soup(), soup)
+
+
+class PreprocessGoldenTests(SimpleTestCase):
+    """The single-walk preprocessor must reproduce the outputs of the previous implementation."""
+
+    GOLDEN_DIR = os.path.join(settings.BASE_DIR, 'apps', 'ai_processing', 'test_data', 'preprocessed')
+    PAGES = ('product_page.html', 'sample_original.html', 'clean_original.html',
+             os.path.join('scripts', 'debug_page_1747413378.html'))
+    SELECTORS = {
+        'full': None,
+        'nested': 'div, p',
+        'regions': 'body > div:nth-child(2), footer, script, .price, header, section.info-page-frame, td:nth-child(2)',
+    }
+
+    # Regions that the previous implementation's final parse merged or dropped with some parsers
+    TABLE_PAGE = ('<html><head><title>Specs</title></head><body class="page"><h1>Pump</h1><table>'
+                  '<tr><th>Weight</th><td>5 <b>kg</b></td></tr><tr><th>Flow</th><td>2 l/min</td></tr></table></body></html>')
+    TABLE_CELLS = '<td>5 <b>kg</b></td><td>2 l/min</td>'
+    TABLE_ROWS = '<tr><th>Weight</th><td>5 <b>kg</b></td></tr><tr><th>Flow</th><td>2 l/min</td></tr>'
+    TABLE = '<h1>Pump</h1><table>' + TABLE_ROWS + '</table>'
+    CONTEXT_CASES = {
+        'html.parser': {
+            'body': '<body><body class="page">' + TABLE + '</body></body>',
+            'html': '<body><html><head><title>Specs</title></head><body class="page">' + TABLE + '</body></html></body>',
+            'td': '<body>' + TABLE_CELLS + '</body>',
+            'tr': '<body>' + TABLE_ROWS + '</body>',
+            'td:nth-child(2), h1': '<body>' + TABLE_CELLS + '<h1>Pump</h1></body>',
+        },
+        'lxml': {
+            'body': '<body>' + TABLE + '</body>',
+            'html': '<body><title>Specs</title>' + TABLE + '</body>',
+            'td': '<body>' + TABLE_CELLS + '</body>',
+            'tr': '<body>' + TABLE_ROWS + '</body>',
+            'td:nth-child(2), h1': '<body>' + TABLE_CELLS + '<h1>Pump</h1></body>',
+        },
+        'html5lib': {
+            'body': '<body class="page"><h1>Pump</h1><table><tbody>' + TABLE_ROWS + '</tbody></table></body>',
+            'html': '<body class="page"><title>Specs</title><h1>Pump</h1><table><tbody>' + TABLE_ROWS + '</tbody></table></body>',
+            'td': '<body>5 <b>kg</b>2 l/min</body>',
+            'tr': '<body>Weight5 <b>kg</b>Flow2 l/min</body>',
+            'td:nth-child(2), h1': '<body>5 <b>kg</b>2 l/min<h1>Pump</h1></body>',
+        },
+    }
+
+    def parsers(self):
+        """Installed parsers, the default first."""
+        default = get_html_parser()
+        return [default] + [parser for parser in available_parsers() if parser != default]
+
+    def golden(self, page, case, parser):
+        stem = os.path.splitext(os.path.basename(page))[0]
+        # Outputs that depend on the parser are stored per parser
+        for name in (f'{stem}.{case}.{parser}.html', f'{stem}.{case}.html'):
+            path = os.path.join(self.GOLDEN_DIR, name)
+            if os.path.exists(path):
+                with open(path, encoding='utf-8', newline='') as f:
+                    return f.read()
+
+    def test_matches_golden_outputs(self):
+        for parser in self.parsers():
+            for page in self.PAGES:
+                with open(os.path.join(settings.BASE_DIR, page), encoding='utf-8') as f:
+                    html = f.read()
+                for case, selectors in self.SELECTORS.items():
+                    with self.subTest(parser=parser, page=page, case=case):
+                        self.assertEqual(preprocess_html(html, selectors, parser=parser),
+                                         self.golden(page, case, parser))
+                with self.subTest(parser=parser, page=page, case='unmatched'):
+                    self.assertEqual(preprocess_html(html, 'article.missing', parser=parser),
+                                     self.golden(page, 'full', parser))
+
+    def test_matches_previous_outputs_of_document_and_table_regions(self):
+        for parser in self.parsers():
+            for selectors, expected in self.CONTEXT_CASES[parser].items():
+                with self.subTest(parser=parser, selectors=selectors):
+                    self.assertEqual(preprocess_html(self.TABLE_PAGE, selectors, parser=parser), expected)
+
+    def test_does_not_modify_the_parse_tree(self):
+        page = FetchedPage('https://example.com/a', b'<html><body><p style="display:none">x</p><p>y</p>'
+                           b'<!-- note --><script>z</script></body></html>', 'utf-8', {'Content-Type': 'text/html'})
+        before = str(page.soup())
+
+        self.assertEqual(preprocess_html(page.text, 'p', soup=page.soup()), '<body><p>y</p></body>')
+        self.assertEqual(str(page.soup()), before)
+
+    def test_minify(self):
+        self.assertEqual(minify('<div>\n  <p>a \t b</p>\n</div>'), '<div><p>a b</p></div>')
+        self.assertEqual(minify('<p>a</p> <br/> <p>b</p>{{BR_TAG}}'), '<p>a</p> <br> <p>b</p><br>')
+
+
+class PayloadBuilderTests(SimpleTestCase):
+
+    def test_keeps_whole_elements_of_markup(self):
+        builder = PayloadBuilder(chars_per_token=1)
+        html = ('<body><div><p>' + 'a' * 60 + '</p><p>short</p></div>'
+                '<table><tr><td>spec</td></tr></table></body>')
+
+        self.assertEqual(builder.fit(html, 80),
+                         '<body><div><p>short</p></div><table><tr><td>spec</td></tr></table></body>')
+        self.assertEqual(builder.fit(html, 1000), html)
+
+    def test_keeps_sections_in_configuration_order(self):
+        builder = PayloadBuilder(chars_per_token=1)
+        content = ('\n\n### Description ###\n\n' + 'x' * 40 +
+                   '\n\n### Specifications ###\n\n--- Element 1 ---\n' + 'y' * 60 +
+                   '\n\n--- Element 2 ---\nsmall\n\n### Images ###\n\n<img src="a.png">')
+
+        fitted = builder.fit(content, 120)
+
+        self.assertIn('x' * 40, fitted)
+        self.assertIn('--- Element 2 ---\nsmall', fitted)
+        self.assertNotIn('y', fitted.replace('### Specifications ###', ''))
+        self.assertNotIn('Images', fitted)
+        self.assertLessEqual(len(fitted), 120)
+
+    def test_sends_only_relevant_tags(self):
+        builder = PayloadBuilder(max_tags=2)
+        tags = [{'category': 'Type', 'name': name} for name in
+                ('Fume Hood', 'Biosafety Cabinet', 'Cabinet', 'Class II Cabinet')]
+
+        payload = builder.build('https://example.com/a', '<h1>Class II biosafety cabinet</h1>', tags)
+
+        self.assertEqual([tag['name'] for tag in payload.tags], ['Biosafety Cabinet', 'Cabinet'])
+        self.assertEqual(payload.prompt_variables()['existing_tags']['text'], json.dumps(payload.tags))
+        self.assertGreater(payload.tokens, 0)
+
+
+class AdaptiveRateLimiterTests(SimpleTestCase):
+
+    def test_spaces_calls_and_adapts_to_throttling(self):
+        clock = FakeClock()
+        limiter = AdaptiveRateLimiter(2.0, recovery=0.5, clock=clock, sleep=clock.sleep)
+
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(clock.sleeps, [0.5])
+
+        limiter.on_throttle()
+        self.assertEqual(limiter.rate, 1.0)
+        limiter.acquire()
+        self.assertEqual(clock.sleeps[-1], 1.0)
+
+        limiter.on_success()
+        limiter.on_success()
+        self.assertEqual(limiter.rate, 2.0)  # Never above the initial rate
+
+    def test_disabled(self):
+        clock = FakeClock()
+        limiter = AdaptiveRateLimiter(0, clock=clock, sleep=clock.sleep)
+        for _ in range(3):
+            limiter.acquire()
+        limiter.on_throttle()
+        self.assertEqual(clock.sleeps, [])
+
+
+class ProcessingLimitsTests(SimpleTestCase):
+
+    def test_converse_retries_throttled_calls(self):
+        clock = FakeClock()
+        limits = ProcessingLimits(rate_limiter=AdaptiveRateLimiter(4.0, clock=clock, sleep=clock.sleep))
+        client = StubBedrockClient({'output': {}}, throttle=2)
+
+        self.assertEqual(limits.converse(client, modelId='arn'), {'output': {}})
+        self.assertEqual(len(client.calls), 3)
+        self.assertEqual(limits.rate_limiter.rate, 1.0 + 0.05)
+
+    def test_converse_raises_other_errors(self):
+        client = mock.Mock()
+        client.converse.side_effect = ClientError({'Error': {'Code': 'ValidationException'}}, 'Converse')
+
+        with self.assertRaises(ClientError):
+            ProcessingLimits().converse(client, modelId='arn')
+        self.assertEqual(client.converse.call_count, 1)
+        self.assertFalse(is_throttling_error(ValueError()))
+
+
+@override_settings(AWS_ACCESS_KEY_ID='key', AWS_SECRET_ACCESS_KEY='secret', AI_BEDROCK_MAX_POOL_CONNECTIONS=16)
+class BedrockClientProviderTests(SimpleTestCase):
+
+    @mock.patch('apps.ai_processing.utils.boto3.client')
+    def test_builds_one_pooled_client_for_all_threads(self, boto3_client):
+        provider = BedrockClientProvider()
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(provider.get())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(boto3_client.call_count, 1)
+        self.assertEqual(set(map(id, clients)), {id(boto3_client.return_value)})
+        config = boto3_client.call_args.kwargs['config']
+        self.assertEqual(config.max_pool_connections, 16)
+        self.assertTrue(config.tcp_keepalive)
+
+        provider.reset()
+        provider.get()
+        self.assertEqual(boto3_client.call_count, 2)
+
+    @mock.patch('apps.ai_processing.utils.boto3.client')
+    def test_fake_client_can_be_injected(self, boto3_client):
+        fake = StubBedrockClient({'output': {}})
+        with bedrock_client_provider.override(fake):
+            self.assertIs(get_bedrock_client(), fake)
+        self.assertIsNot(get_bedrock_client(), fake)
+        bedrock_client_provider.reset()
+
+
+class ResultCacheTests(TestCase):
+
+    def setUp(self):
+        ResultCache._last_evicted.clear()
+
+    def test_key_covers_prompt_html_and_tags(self):
+        tags = [{'category': 'Manufacturer', 'name': 'Horiba'}, {'category': 'Application', 'name': 'FTIR'}]
+        key = result_cache_key('arn', '<h1>A</h1>', tags)
+
+        self.assertEqual(key, result_cache_key('arn', '<h1>A</h1>', list(reversed(tags))))
+        self.assertNotEqual(key, result_cache_key('arn2', '<h1>A</h1>', tags))
+        self.assertNotEqual(key, result_cache_key('arn', '<h1>B</h1>', tags))
+        self.assertNotEqual(key, result_cache_key('arn', '<h1>A</h1>', tags[:1]))
+
+    def test_database_cache_expires_and_evicts(self):
+        cache = DatabaseResultCache(ttl=60, max_entries=2)
+        for n in range(3):
+            cache.set(f'key{n}', 'arn', {'title': n})
+            BedrockResultCacheEntry.objects.filter(key=f'key{n}').update(
+                last_used_at=timezone.now() + timedelta(seconds=n))
+
+        cache.evict()
+        self.assertIsNone(cache.get('key0'))  # Least recently used, evicted
+        self.assertEqual(cache.get('key2'), {'title': 2})
+        self.assertEqual(BedrockResultCacheEntry.objects.get(key='key2').hit_count, 1)
+
+        BedrockResultCacheEntry.objects.filter(key='key1').update(created_at=timezone.now() - timedelta(seconds=61))
+        self.assertIsNone(cache.get('key1'))
+        cache.evict()
+        self.assertEqual(BedrockResultCacheEntry.objects.count(), 1)
+
+    def test_filesystem_cache_expires_and_evicts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = FileSystemResultCache(directory, ttl=60, max_entries=2)
+            for n in range(3):
+                cache.set(f'key{n}', 'arn', {'title': n})
+                os.utime(cache._path(f'key{n}'), (time.time() + n, time.time() + n))
+
+            cache.evict()
+            self.assertIsNone(cache.get('key0'))  # Oldest, evicted
+            self.assertEqual(cache.get('key2'), {'title': 2})
+
+            os.utime(cache._path('key1'), (time.time() - 61, time.time() - 61))
+            self.assertIsNone(cache.get('key1'))
+
+    def test_writes_evict_at_most_once_per_interval(self):
+        cache = DatabaseResultCache(ttl=None, max_entries=1, evict_interval=60)
+        with mock.patch.object(DatabaseResultCache, 'evict') as evict:
+            for n in range(3):
+                cache.set(f'key{n}', 'arn', {'title': n})
+            # A new instance on the same storage shares the interval
+            DatabaseResultCache(ttl=None, max_entries=1, evict_interval=60).set('key3', 'arn', {})
+        self.assertEqual(evict.call_count, 1)
+        self.assertEqual(BedrockResultCacheEntry.objects.count(), 4)
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = FileSystemResultCache(directory, ttl=None, max_entries=1, evict_interval=0)
+            for n in range(3):
+                cache.set(f'key{n}', 'arn', {'title': n})
+            self.assertEqual(len(list(cache.directory.glob('*/*.json'))), 1)
+
+
+class BatchCounterTests(TestCase):
+
+    def make_batch(self, count):
+        batch = BatchURLProcessingRequest.objects.create(name='Batch')
+        URLProcessingRequest.objects.bulk_create(
+            URLProcessingRequest(url=f'https://example.com/{n}', batch=batch) for n in range(count)
+        )
+        batch.reconcile()
+        return batch, list(batch.url_requests.order_by('id'))
+
+    def counters(self, batch):
+        batch.refresh_from_db()
+        return (batch.status, batch.total_urls, batch.processed_urls, batch.successful_urls, batch.failed_urls)
+
+    def test_transitions_update_counters_without_counting_requests(self):
+        batch, (first, second, third) = self.make_batch(3)
+        self.assertEqual(self.counters(batch), ('pending', 3, 0, 0, 0))
+
+        with CaptureQueriesContext(connection) as queries:
+            first.mark_as_processing()
+            first.mark_as_completed({'title': 'A'})
+        self.assertFalse([q['sql'] for q in queries if 'COUNT(' in q['sql'].upper()])
+        self.assertEqual(self.counters(batch), ('processing', 3, 1, 1, 0))
+
+        second.mark_as_processing()
+        second.mark_as_failed('boom')
+        third.mark_as_processing()
+        third.mark_as_completed({'title': 'C'})
+        self.assertEqual(self.counters(batch), ('partial', 3, 3, 2, 1))
+
+        second.mark_as_pending()
+        self.assertEqual(self.counters(batch), ('processing', 3, 2, 2, 0))
+        second.mark_as_processing()
+        second.mark_as_completed({'title': 'B'})
+        self.assertEqual(self.counters(batch), ('completed', 3, 3, 3, 0))
+        self.assertIsNotNone(batch.completed_at)
+
+    def test_stale_instances_count_each_transition_once(self):
+        batch, (url_request, _) = self.make_batch(2)
+        stale = URLProcessingRequest.objects.get(id=url_request.id)
+
+        url_request.mark_as_processing()
+        stale.mark_as_failed('timeout')
+
+        self.assertEqual(self.counters(batch), ('processing', 2, 1, 0, 1))
+
+    def test_reconcile_corrects_drift(self):
+        batch, (url_request, _) = self.make_batch(2)
+        URLProcessingRequest.objects.filter(id=url_request.id).update(status='completed')
+        BatchURLProcessingRequest.objects.filter(id=batch.id).update(failed_urls=5)
+
+        self.assertTrue(batch.reconcile())
+        self.assertEqual(self.counters(batch), ('processing', 2, 1, 1, 0))
+        self.assertFalse(batch.reconcile())
+
+
+class WorkQueueTests(TestCase):
+
+    def setUp(self):
+        self.batch = BatchURLProcessingRequest.objects.create(name='Queue')
+        self.queue = WorkQueue(lease_seconds=60, max_attempts=2, retry_backoff=30, worker_id='a')
+        self.queue.enqueue(['https://example.com/1', 'https://example.com/2', 'https://example.com/1'],
+                           batch=self.batch)
+
+    def test_claims_each_request_once(self):
+        other = WorkQueue(lease_seconds=60, worker_id='b')
+
+        first = self.queue.claim(batch_id=self.batch.id)
+        second = other.claim(limit=5, batch_id=self.batch.id)
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(first[0].id, second[0].id)
+        self.assertEqual((first[0].status, first[0].leased_by, first[0].attempts), ('processing', 'a', 1))
+        self.assertEqual(self.queue.claim(batch_id=self.batch.id), [])
+        self.batch.refresh_from_db()
+        self.assertEqual((self.batch.total_urls, self.batch.processed_urls), (2, 2))
+
+    def test_uses_skip_locked_where_supported(self):
+        with mock.patch.object(connection.features, 'has_select_for_update_skip_locked', True):
+            claimed = self.queue.claim(limit=5)
+        self.assertEqual(len(claimed), 2)
+
+    def test_reclaims_expired_leases_and_fails_abandoned_requests(self):
+        url_request = self.queue.claim()[0]
+        other = WorkQueue(lease_seconds=60, max_attempts=2, worker_id='b')
+        expire = lambda: URLProcessingRequest.objects.filter(id=url_request.id).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.queue.heartbeat([url_request.id]), 1)
+        expire()
+        reclaimed = other.claim()[0]
+        self.assertEqual((reclaimed.id, reclaimed.leased_by, reclaimed.attempts), (url_request.id, 'b', 2))
+        self.assertEqual(self.queue.heartbeat([url_request.id]), 0)
+
+        expire()
+        self.assertEqual(other.fail_abandoned(), 1)
+        url_request.refresh_from_db()
+        self.assertEqual(url_request.status, 'failed')
+
+    def test_retries_failed_requests_with_backoff(self):
+        url_request = self.queue.claim()[0]
+        url_request.mark_as_failed('timeout')
+
+        self.assertTrue(self.queue.finish(url_request.id))
+        url_request.refresh_from_db()
+        self.assertEqual((url_request.status, url_request.error_message), ('pending', 'timeout'))
+        self.assertGreater(url_request.available_at, timezone.now() + timedelta(seconds=25))
+        self.assertNotIn(url_request.id, [r.id for r in self.queue.claim(limit=5)])
+
+        URLProcessingRequest.objects.filter(id=url_request.id).update(available_at=timezone.now())
+        self.assertEqual(self.queue.claim()[0].id, url_request.id)
+        url_request.refresh_from_db()
+        url_request.mark_as_failed('timeout again')
+        self.assertFalse(self.queue.finish(url_request.id))
+        self.assertEqual(self.queue.retry_delay(3), 120)
+
+    def test_worker_processes_the_queue(self):
+        processed = []
+
+        def process(request_id):
+            URLProcessingRequest.objects.get(id=request_id).mark_as_completed({'title': 'Done'})
+            processed.append(request_id)
+
+        worker = Worker(queue=self.queue, process=process, batch_id=self.batch.id)
+
+        self.assertEqual(worker.run(burst=True), 2)
+        self.assertCountEqual(processed, self.batch.url_requests.values_list('id', flat=True))
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.status, 'completed')
+
+
+class DashboardCountsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.batch = BatchURLProcessingRequest.objects.create(name='Dashboard')
+        WorkQueue().enqueue([f'https://example.com/{n}' for n in range(4)], batch=self.batch)
+        self.requests = list(self.batch.url_requests.order_by('id'))
+        self.requests[0].mark_as_processing()
+        self.requests[0].mark_as_completed({'title': 'A'}, from_cache=True)
+        self.requests[1].mark_as_processing()
+
+    def count_queries(self, queries):
+        return [q['sql'] for q in queries if 'COUNT(' in q['sql'].upper()]
+
+    def test_histogram_is_one_query_and_cached(self):
+        with CaptureQueriesContext(connection) as queries:
+            counts = request_status_counts()
+            self.assertEqual(request_status_counts(), counts)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(counts, {'total': 4, 'pending': 2, 'processing': 1, 'completed': 1, 'failed': 0,
+                                  'cached': 1})
+
+    def test_transitions_invalidate_cached_counts(self):
+        request_status_counts()
+        batch_status_counts()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.requests[1].mark_as_failed('boom')
+        self.assertEqual(request_status_counts()['failed'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BatchURLProcessingRequest.objects.create(name='Other')
+        self.assertEqual(batch_status_counts()['total'], 2)
+
+    @override_settings(STORAGES={
+        **settings.STORAGES,
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    })
+    def test_dashboard_counts_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('ai_processing:dashboard'), {'status': 'pending'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.count_queries(queries)), 1)
+        self.assertEqual(response.context['requests'].paginator.count, 2)
+        self.assertEqual(response.context['processing_count'], 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('ai_processing:dashboard'), {'view': 'batch'})
+        self.assertEqual(len(self.count_queries(queries)), 1)
+        self.assertEqual(response.context['processing_count'], 1)
+
+    def test_batch_options_are_keyset_paginated(self):
+        created_at = timezone.now()
+        for n in range(4):
+            BatchURLProcessingRequest.objects.create(name=f'Batch {n}', created_at=created_at)
+        expected = list(BatchURLProcessingRequest.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        seen = []
+        after = None
+        with override_settings(AI_DASHBOARD_BATCH_OPTIONS_PAGE_SIZE=2):
+            while True:
+                params = {'after': after} if after else {}
+                data = self.client.get(reverse('ai_processing:batch_options'), params).json()
+                seen.extend(batch['id'] for batch in data['results'])
+                after = data['next']
+                if after is None:
+                    break
+        self.assertEqual(seen, expected)
+
+        data = self.client.get(reverse('ai_processing:batch_options'), {'q': 'batch 2'}).json()
+        self.assertEqual([batch['name'] for batch in data['results']], ['Batch 2'])
+
+
+class InlineExecutor:
+    """A ThreadPoolExecutor stand-in running work on the calling thread, which may use the test database."""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class BatchExecutorTests(TestCase):
+
+    def make_batch(self, count):
+        batch = BatchURLProcessingRequest.objects.create(name='Batch', total_urls=count)
+        URLProcessingRequest.objects.bulk_create(
+            URLProcessingRequest(url=f'https://example.com/{n}', batch=batch) for n in range(count)
+        )
+        return batch
+
+    def test_processes_requests_concurrently_within_limits(self):
+        batch = self.make_batch(8)
+        client = StubBedrockClient({'output': {}}, delay=0.05)
+        processed = []
+
+        def process(request_id, client, limits):
+            # No database writes from worker threads with the in-memory test database
+            with limits.fetching():
+                time.sleep(0.01)
+            limits.converse(client, modelId='arn')
+            processed.append(request_id)
+
+        executor = BatchExecutor(max_workers=8, bedrock_concurrency=3, requests_per_second=0,
+                                 client=client, process=process)
+        with mock.patch('apps.ai_processing.batch.connections'):
+            executor.run(batch.id)
+
+        self.assertCountEqual(processed, batch.url_requests.values_list('id', flat=True))
+        self.assertEqual(client.max_in_flight, 3)
+
+    @mock.patch('apps.ai_processing.views.create_pages_for_completed_requests')
+    @mock.patch('apps.ai_processing.batch.ThreadPoolExecutor', InlineExecutor)
+    @mock.patch('apps.ai_processing.batch.connections')
+    def test_waits_for_scheduled_retries_until_the_batch_is_final(self, connections, create_pages):
+        for fail_times, status in ((1, 'completed'), (5, 'failed')):
+            with self.subTest(fail_times=fail_times):
+                batch = self.make_batch(2)
+                first = batch.url_requests.order_by('id').first()
+                failures = []
+
+                def process(request_id, client, limits):
+                    url_request = URLProcessingRequest.objects.get(id=request_id)
+                    if request_id == first.id and len(failures) < fail_times:
+                        failures.append(request_id)
+                        if len(failures) == 1:
+                            raise RuntimeError('connection reset')
+                        url_request.mark_as_failed('timeout')
+                    else:
+                        url_request.mark_as_completed({'title': 'Done'})
+
+                sleeps = []
+                queue = WorkQueue(max_attempts=3, retry_backoff=30, worker_id='executor')
+                executor = BatchExecutor(max_workers=2, requests_per_second=0, client=object(),
+                                         process=process, queue=queue, sleep=sleeps.append)
+                # Sleeping moves the clock forward
+                start = timezone.now()
+                with mock.patch('django.utils.timezone.now', side_effect=lambda: start + timedelta(seconds=sum(sleeps))):
+                    executor.run(batch.id)
+
+                batch.refresh_from_db()
+                first.refresh_from_db()
+                self.assertEqual(batch.status, status if status == 'completed' else 'partial')
+                self.assertEqual(first.status, status)
+                self.assertEqual(first.attempts, min(fail_times + 1, 3))
+                self.assertEqual(len(sleeps), first.attempts - 1)
+
+
+class ProcessURLRequestTests(TestCase):
+
+    def setUp(self):
+        tag_resolver.clear()
+
+    @mock.patch('apps.ai_processing.views.create_or_update_lab_equipment_internal',
+                return_value={'success': True, 'page_id': 42})
+    @mock.patch('apps.ai_processing.views.process_url_content', return_value='<h1>Spectrometer</h1>')
+    def test_uses_the_given_client_and_limits(self, process_url_content, create_page):
+        url_request = URLProcessingRequest.objects.create(url='https://example.com/spectrometer')
+        client = StubBedrockClient(bedrock_response({'title': 'Spectrometer'}), throttle=1)
+        clock = FakeClock()
+        limits = ProcessingLimits(rate_limiter=AdaptiveRateLimiter(1.0, clock=clock, sleep=clock.sleep))
+
+        process_url_request(url_request.id, client=client, limits=limits)
+
+        url_request.refresh_from_db()
+        self.assertEqual(url_request.status, 'completed')
+        self.assertEqual(url_request.name, 'Spectrometer')
+        self.assertEqual(url_request.created_page_id, 42)
+        self.assertEqual(len(client.calls), 2)
+        self.assertEqual(client.calls[0]['promptVariables']['site_html'], {'text': '<h1>Spectrometer</h1>'})
+
+    @mock.patch('apps.ai_processing.views.create_or_update_lab_equipment_internal',
+                return_value={'success': True, 'page_id': 42})
+    @mock.patch('apps.ai_processing.views.process_url_content', return_value='<h1>Spectrometer</h1>')
+    def test_reuses_cached_results(self, process_url_content, create_page):
+        client = StubBedrockClient(bedrock_response({'title': 'Spectrometer'}))
+        first = URLProcessingRequest.objects.create(url='https://example.com/spectrometer')
+        second = URLProcessingRequest.objects.create(url='https://example.com/spectrometer')
+
+        process_url_request(first.id, client=client)
+        process_url_request(second.id, client=client)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(len(client.calls), 1)
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.response_data, first.response_data)
+
+    @mock.patch('apps.ai_processing.views.create_or_update_lab_equipment_internal',
+                return_value={'success': True, 'page_id': 42})
+    @mock.patch('apps.ai_processing.views.process_url_content', return_value='<h1>Centrifuge</h1>')
+    def test_fetches_tags_once_and_records_usage_once(self, process_url_content, create_page):
+        CategorizedTag.objects.create(category='Type', name='Centrifuge')
+        client = StubBedrockClient(bedrock_response({'title': 'Centrifuge'}))
+        first = URLProcessingRequest.objects.create(url='https://example.com/centrifuge')
+        second = URLProcessingRequest.objects.create(url='https://example.com/centrifuge')
+
+        with mock.patch.object(URLProcessingRequest, 'record_usage', autospec=True) as record_usage, \
+                CaptureQueriesContext(connection) as context:
+            with self.captureOnCommitCallbacks(execute=True):
+                process_url_request(first.id, client=client)
+            process_url_request(second.id, client=client)
+
+        tag_queries = [q for q in context.captured_queries
+                       if q['sql'].startswith('SELECT') and 'FROM "categorized_tags_categorizedtag"' in q['sql']]
+        self.assertEqual(len(tag_queries), 1)
+        # Once after the Bedrock call, once for the cache hit
+        self.assertEqual(record_usage.call_count, 2)
+        self.assertIs(record_usage.call_args_list[0].args[2], client.response)
+        self.assertEqual(len(record_usage.call_args_list[1].args), 2)
+
+
+    @mock.patch('apps.ai_processing.views.create_or_update_lab_equipment_internal',
+                return_value={'success': True, 'page_id': 42})
+    @mock.patch('apps.ai_processing.views.process_url_content', return_value='<h1>Fume hood</h1>')
+    def test_records_token_usage(self, process_url_content, create_page):
+        CategorizedTag.objects.create(category='Type', name='Fume Hood')
+        CategorizedTag.objects.create(category='Type', name='Centrifuge')
+        response = {**bedrock_response({'title': 'Fume hood'}),
+                    'usage': {'inputTokens': 1200, 'outputTokens': 300}, 'metrics': {'latencyMs': 2500}}
+        client = StubBedrockClient(response)
+        url_request = URLProcessingRequest.objects.create(url='https://example.com/hood')
+
+        process_url_request(url_request.id, client=client)
+
+        url_request.refresh_from_db()
+        self.assertEqual(json.loads(client.calls[0]['promptVariables']['existing_tags']['text']),
+                         [{'category': 'Type', 'name': 'Fume Hood'}])
+        self.assertGreater(url_request.payload_tokens, 0)
+        self.assertEqual((url_request.input_tokens, url_request.output_tokens, url_request.latency_ms),
+                         (1200, 300, 2500))
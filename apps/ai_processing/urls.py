@@ -5,6 +5,7 @@ app_name = 'ai_processing'
 
 urlpatterns = [
     path('', views.dashboard_view, name='dashboard'),
+    path('batches/options/', views.batch_options_view, name='batch_options'),
     path('process/', views.process_url_view, name='process_url'),
     path('status/<int:request_id>/', views.processing_status_view, name='processing_status'),
     path('create-equipment/<int:request_id>/', views.create_lab_equipment_view, name='create_equipment'),
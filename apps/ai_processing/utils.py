@@ -5,189 +5,54 @@ import json
 import re
 import sys
 import subprocess
-from bs4 import BeautifulSoup, Comment
+import threading
+from contextlib import contextmanager
 import requests
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
 from apps.categorized_tags.models import CategorizedTag
+from apps.scrapers.utils.debug_artifacts import capture_artifact
+from apps.scrapers.utils.html_parser import make_soup
+from .fetch import fetch_page, page_fetcher
+from .preprocess import preprocess
 from urllib.parse import urlparse
-from django.utils import timezone
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
-def preprocess_html(html_content, css_selectors=None):
+def preprocess_html(html_content, css_selectors=None, parser=None, soup=None):
     """Preprocess HTML to reduce payload size for AWS Bedrock.
     
     This function:
-    1. If CSS selectors are provided, extracts only matching elements
-    2. Otherwise extracts only the body content
-    3. Removes script, style tags, and comments
+    1. If CSS selectors are provided, keeps only matching elements
+    2. Otherwise keeps only the body content
+    3. Leaves out script, style tags, and comments
     4. Strips excess whitespace while preserving BR tags
-    5. Removes other unnecessary elements
+    5. Leaves out other unnecessary elements
+    
+    The page is parsed once and processed in a single tree walk, see preprocess.py.
     
     Args:
         html_content (str): The raw HTML content
         css_selectors (str, optional): Comma-separated CSS selectors to filter content
+        parser (str, optional): HTML parser backend; defaults to the SCRAPER_HTML_PARSER setting
+        soup (BeautifulSoup, optional): Parse tree of html_content to reuse instead of parsing
+            it again; it is not modified
         
     Returns:
         str: Preprocessed HTML content
     """
-    # Apply CSS selectors first if provided - this should ALWAYS happen regardless of debug mode
-    if css_selectors and css_selectors.strip():
-        try:
-            logger.info(f"Applying CSS selectors: {css_selectors}")
-            html_content = extract_elements_by_css_selectors(html_content, css_selectors)
-            logger.info(f"After CSS selector extraction: {len(html_content)} bytes")
-        except Exception as e:
-            logger.error(f"Error applying CSS selectors: {str(e)}")
-            # Continue with full HTML if selector extraction fails
-    
     try:
-        # Parse HTML with BeautifulSoup
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Extract only the body content
-        body = soup.body
-        if not body:
-            logger.warning("No body tag found in HTML, using full content")
-            body = soup
-            
-        # Remove unnecessary elements
-        for element in body.select('script, style, iframe, noscript, [style*="display:none"], [style*="display: none"]'):
-            element.decompose()
-            
-        # Remove comments
-        for comment in body.find_all(text=lambda text: isinstance(text, Comment)):
-            comment.extract()
-            
-        # Get the HTML as string
-        processed_html = str(body)
-        
-        # First, protect <br> and <br/> tags by replacing them with a unique placeholder
-        processed_html = re.sub(r'<br\s*/?>', '{{BR_TAG}}', processed_html, flags=re.IGNORECASE)
-        
-        # Remove excess whitespace
-        processed_html = re.sub(r'\s+', ' ', processed_html)
-        processed_html = re.sub(r'>\s+<', '><', processed_html)
-        
-        # Restore the <br> tags
-        processed_html = processed_html.replace('{{BR_TAG}}', '<br>')
-        
+        processed_html = preprocess(html_content, css_selectors, parser=parser, soup=soup)
         logger.info(f"HTML preprocessing reduced size from {len(html_content)} to {len(processed_html)} bytes")
         return processed_html
-        
     except Exception as e:
         logger.warning(f"Error preprocessing HTML: {str(e)}")
         return html_content  # Return original content if preprocessing fails
 
-def extract_elements_by_css_selectors(html_content, css_selectors):
-    """Extract HTML elements matching the provided CSS selectors.
-    
-    Args:
-        html_content (str): The raw HTML content
-        css_selectors (str): Comma-separated CSS selectors
-        
-    Returns:
-        str: HTML content containing only the matched elements
-    """
-    try:
-        # Parse original HTML
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Create a new soup with just html and body tags
-        new_soup = BeautifulSoup('<html><head><meta charset="utf-8"></head><body></body></html>', 'html.parser')
-        
-        # Split and clean selectors - trim whitespace and remove empty ones
-        selectors = [s.strip() for s in css_selectors.split(',') if s.strip()]
-        
-        if not selectors:
-            logger.warning("No valid CSS selectors provided, returning full HTML")
-            return html_content
-            
-        logger.info(f"Extracting elements with {len(selectors)} CSS selectors: {selectors}")
-        
-        # First collect all matching elements to avoid modifying the DOM structure
-        # which can break complex selectors like nth-child
-        all_matching_elements = []
-        
-        # Extract and collect each matching element
-        elements_found = False
-        for selector in selectors:
-            try:
-                # Log the selector for debugging
-                logger.info(f"Applying selector: '{selector}'")
-                
-                # Try to select elements with this selector
-                matches = soup.select(selector)
-                
-                if matches:
-                    elements_found = True
-                    logger.info(f"Found {len(matches)} elements matching selector '{selector}'")
-                    
-                    # Log a sample of each matched element
-                    for i, element in enumerate(matches):
-                        # Store a deep copy of the element to avoid modifying the original
-                        # Deep copy ensures we get the entire subtree
-                        element_copy = str(element)  # Convert to string to ensure we get a complete copy
-                        all_matching_elements.append((selector, element_copy, i))
-                        
-                        # Log a preview
-                        element_preview = element_copy[:100] + "..." if len(element_copy) > 100 else element_copy
-                        logger.info(f"Match {i+1} for '{selector}': {element_preview}")
-                else:
-                    logger.warning(f"No elements found matching selector '{selector}'")
-                    # Try to find elements that might be similar for debugging
-                    if '>' in selector:
-                        parts = selector.split('>')
-                        parent_selector = parts[0].strip()
-                        logger.info(f"Checking parent selector: '{parent_selector}'")
-                        parent_matches = soup.select(parent_selector)
-                        if parent_matches:
-                            logger.info(f"Found {len(parent_matches)} potential parent elements matching '{parent_selector}'")
-                            
-                            # Check if any nth-child selectors
-                            if any('nth-child' in part for part in parts):
-                                logger.info("Selector contains nth-child - showing parent's children:")
-                                for pm_idx, pm in enumerate(parent_matches[:2]):  # Show for first two parents only
-                                    children = pm.findChildren(recursive=False)
-                                    logger.info(f"Parent {pm_idx+1} has {len(children)} direct children")
-                        else:
-                            logger.info(f"No parent elements found for '{parent_selector}'")
-            except Exception as e:
-                logger.error(f"Error applying selector '{selector}': {str(e)}")
-                logger.exception("Selector error traceback:")
-        
-        # If no elements were found with any selector, return the original HTML
-        if not elements_found:
-            logger.warning("No elements matched any of the provided selectors, returning full HTML")
-            return html_content
-            
-        # Now add all collected elements to the new soup
-        logger.info(f"Adding {len(all_matching_elements)} matched elements to new document")
-        for selector, element_str, idx in all_matching_elements:
-            # Parse the string back to a soup element
-            element_soup = BeautifulSoup(element_str, 'html.parser')
-            # Get the root element
-            element = next(element_soup.children)
-            # Add to the new body
-            new_soup.body.append(element)
-            
-        # Get the final HTML with extracted elements
-        extracted_html = str(new_soup)
-        logger.info(f"CSS selector extraction reduced HTML from {len(html_content)} to {len(extracted_html)} bytes")
-        
-        # Log a small preview of the extracted content
-        preview = extracted_html[:200] + "..." if len(extracted_html) > 200 else extracted_html
-        logger.info(f"Extracted content preview: {preview}")
-        
-        return extracted_html
-        
-    except Exception as e:
-        logger.error(f"Error extracting elements with CSS selectors: {str(e)}")
-        logger.exception("Full traceback:")
-        return html_content  # Return original content if extraction fails
-
 def get_categorized_tags():
     """Get existing tags from the database.
     
@@ -224,7 +89,7 @@ def validate_url(url):
         tuple: (is_valid, error_message)
     """
     try:
-        response = requests.head(url, timeout=10)
+        response = page_fetcher.head(url)
         response.raise_for_status()
         
         # Check if content is HTML (based on Content-Type header)
@@ -236,45 +101,129 @@ def validate_url(url):
     except requests.exceptions.RequestException as e:
         return False, f"URL validation error: {str(e)}"
 
-def get_bedrock_client():
-    """
-    Get an AWS Bedrock client using credentials from environment variables.
+def check_url_syntax(url):
+    """Check that a URL is well formed, without requesting it.
+    
+    Batches use this instead of validate_url: the page is downloaded once when the
+    request is processed, and a URL that cannot be fetched marks its request failed.
+    
+    Args:
+        url (str): The URL to check
+        
+    Returns:
+        tuple: (is_valid, error_message)
     """
     try:
-        # First try to get credentials from environment variables
-        aws_access_key_id = os.environ.get('AWS_ACCESS_KEY_ID')
-        aws_secret_access_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
-        aws_region = os.environ.get('AWS_REGION', 'us-east-1')
-        
-        # If not found in environment, try to get from Django settings as fallback
-        if not aws_access_key_id:
-            aws_access_key_id = getattr(settings, 'AWS_ACCESS_KEY_ID', None)
-        if not aws_secret_access_key:
-            aws_secret_access_key = getattr(settings, 'AWS_SECRET_ACCESS_KEY', None)
-        if not aws_region:
-            aws_region = getattr(settings, 'AWS_REGION', 'us-east-1')
+        URLValidator(schemes=['http', 'https'])(url)
+    except ValidationError:
+        return False, f"Invalid URL: {url}"
+    return True, None
 
-        # Check if credentials are available
-        if not aws_access_key_id or not aws_secret_access_key:
-            raise NoCredentialsError("AWS credentials not found in environment variables or Django settings")
+class BedrockClientProvider:
+    """
+    A thread-safe, process-wide provider of the bedrock-runtime client.
 
-        # Log the status of credentials (without revealing the actual values)
-        logger.info(f"AWS credentials loaded successfully. Using region: {aws_region}")
-        logger.info(f"AWS_ACCESS_KEY_ID present: {bool(aws_access_key_id)}")
-        logger.info(f"AWS_SECRET_ACCESS_KEY present: {bool(aws_secret_access_key)}")
+    boto3 clients are thread-safe, and building one resolves credentials and endpoints
+    and opens a new connection pool, so the client is built once and shared. Its
+    connection pool, keep-alive, retries and timeouts come from the AI_BEDROCK_*
+    settings. A fake client can be injected with set_client() or override() to run
+    the processing pipeline offline.
+    """
 
-        # Create a Bedrock client
-        client = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=aws_region,
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-        )
+    def __init__(self):
+        self._client = None
+        self._override = None
+        self._lock = threading.Lock()
 
+    def get(self):
+        """Return the injected client, or the shared client, building it on first use."""
+        if self._override is not None:
+            return self._override
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._build()
+                client = self._client
         return client
-    except (NoCredentialsError, ClientError) as e:
-        logger.error(f"Error creating Bedrock client: {str(e)}")
-        raise
+
+    def set_client(self, client):
+        """Inject a client (e.g. a fake one) returned by get() until cleared with None."""
+        self._override = client
+
+    @contextmanager
+    def override(self, client):
+        """Context manager injecting client for the duration of the block."""
+        previous = self._override
+        self._override = client
+        try:
+            yield client
+        finally:
+            self._override = previous
+
+    def reset(self):
+        """Drop the shared client, e.g. after the credentials changed."""
+        with self._lock:
+            self._client = None
+
+    def _build(self):
+        try:
+            # First try to get credentials from environment variables
+            aws_access_key_id = os.environ.get('AWS_ACCESS_KEY_ID')
+            aws_secret_access_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
+            aws_region = os.environ.get('AWS_REGION', 'us-east-1')
+
+            # If not found in environment, try to get from Django settings as fallback
+            if not aws_access_key_id:
+                aws_access_key_id = getattr(settings, 'AWS_ACCESS_KEY_ID', None)
+            if not aws_secret_access_key:
+                aws_secret_access_key = getattr(settings, 'AWS_SECRET_ACCESS_KEY', None)
+            if not aws_region:
+                aws_region = getattr(settings, 'AWS_REGION', 'us-east-1')
+
+            # Check if credentials are available
+            if not aws_access_key_id or not aws_secret_access_key:
+                raise NoCredentialsError("AWS credentials not found in environment variables or Django settings")
+
+            config = Config(
+                max_pool_connections=getattr(settings, 'AI_BEDROCK_MAX_POOL_CONNECTIONS', 10),
+                tcp_keepalive=getattr(settings, 'AI_BEDROCK_TCP_KEEPALIVE', True),
+                connect_timeout=getattr(settings, 'AI_BEDROCK_CONNECT_TIMEOUT', 10),
+                read_timeout=getattr(settings, 'AI_BEDROCK_READ_TIMEOUT', 300),
+                retries={
+                    'max_attempts': getattr(settings, 'AI_BEDROCK_MAX_ATTEMPTS', 3),
+                    'mode': 'standard',
+                },
+            )
+
+            # Create a Bedrock client
+            client = boto3.client(
+                service_name='bedrock-runtime',
+                region_name=aws_region,
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key,
+                config=config,
+            )
+
+            logger.info(
+                f"Created shared Bedrock client for region {aws_region} "
+                f"(pool size: {config.max_pool_connections})"
+            )
+            return client
+        except (NoCredentialsError, ClientError) as e:
+            logger.error(f"Error creating Bedrock client: {str(e)}")
+            raise
+
+
+# The provider shared by the whole process
+bedrock_client_provider = BedrockClientProvider()
+
+
+def get_bedrock_client():
+    """
+    Get the shared AWS Bedrock client, using credentials from environment variables.
+    """
+    return bedrock_client_provider.get()
 
 def process_element_with_spacing(element, keep_newlines=True):
     """
@@ -315,7 +264,7 @@ def process_element_with_spacing(element, keep_newlines=True):
         text = element.get_text(separator=' ', strip=True)
         return re.sub(r'\s+', ' ', text)
 
-def extract_content_with_selectors(url, selectors_config, keep_newlines=True, add_extra_spacing=True):
+def extract_content_with_selectors(url, selectors_config, keep_newlines=True, add_extra_spacing=True, parser=None, page=None):
     """
     Extract text content from a webpage using CSS selectors with names and notes
     
@@ -328,22 +277,19 @@ def extract_content_with_selectors(url, selectors_config, keep_newlines=True, ad
             - preserve_html: If True, preserves the full HTML of the element instead of just the text
         keep_newlines (bool): Whether to preserve newlines in the extracted text
         add_extra_spacing (bool): Add extra spacing between top-level elements
+        parser (str, optional): HTML parser backend; defaults to the SCRAPER_HTML_PARSER setting
+        page (FetchedPage, optional): Already downloaded page; fetched if not given
         
     Returns:
         str: Extracted text content
     """
     try:
-        # Send a GET request to the URL
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        logger.info(f"Fetching {url}...")
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
+        if page is None:
+            page = fetch_page(url)
         
-        # Parse the HTML content
+        # Parse the HTML content (once per page)
         logger.info("Parsing HTML...")
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = page.soup(parser)
         
         # Extract text from each CSS selector
         all_sections = []
@@ -428,7 +374,7 @@ def extract_content_with_selectors(url, selectors_config, keep_newlines=True, ad
         logger.error(f"Error extracting content: {str(e)}")
         return f"Error extracting content: {str(e)}"
 
-def simplify_html_content(url, selectors_config=None):
+def simplify_html_content(url, selectors_config=None, page=None):
     """
     Use the HTML simplifier functionality to extract content from a webpage using CSS selectors
     
@@ -436,6 +382,7 @@ def simplify_html_content(url, selectors_config=None):
         url (str): URL of the webpage
         selectors_config (list, optional): List of selector configuration dictionaries
             If None, default AirScience selectors will be used
+        page (FetchedPage, optional): Already downloaded page; fetched if not given
             
     Returns:
         str: Simplified HTML content
@@ -484,26 +431,15 @@ def simplify_html_content(url, selectors_config=None):
             url, 
             selectors_config,
             keep_newlines=True,
-            add_extra_spacing=True
+            add_extra_spacing=True,
+            page=page
         )
         
         logger.info(f"Simplified HTML content size: {len(simplified_html)} bytes")
         
-        # TEMPORARY: Save the simplified HTML to a file for inspection
-        timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-        domain = urlparse(url).netloc.replace(".", "_")
-        debug_filename = f"simplified_html_{domain}_{timestamp}.txt"
-        debug_filepath = os.path.join(settings.MEDIA_ROOT, "temp", debug_filename)
-        
-        # Make sure the directory exists
-        os.makedirs(os.path.dirname(debug_filepath), exist_ok=True)
-        
-        # Save the simplified HTML
-        with open(debug_filepath, 'w', encoding='utf-8') as f:
-            f.write(simplified_html)
-            
-        logger.info(f"SAVED SIMPLIFIED HTML FOR INSPECTION AT: {debug_filepath}")
-        logger.info(f"Content sample: {simplified_html[:200]}...")
+        # Keep a copy for inspection if debug artifacts are enabled
+        capture_artifact('simplified_html', url, simplified_html)
+        logger.debug(f"Content sample: {simplified_html[:200]}...")
         
         return simplified_html
             
@@ -525,32 +461,25 @@ def process_url_content(url, css_selectors=None):
     try:
         logger.info(f"Processing URL content: {url}")
         
+        # Download the page once for both the simplifier and the fallback
+        page = fetch_page(url)
+        
         # Try to use the integrated HTML simplifier
         try:
             logger.info("Using integrated HTML simplifier to extract content")
-            simplified_html = simplify_html_content(url)
+            simplified_html = simplify_html_content(url, page=page)
             logger.info(f"HTML simplifier successfully extracted content: {len(simplified_html)} bytes")
             return simplified_html
         except Exception as e:
             logger.warning(f"HTML simplifier failed, falling back to standard method: {str(e)}")
         
         # Fallback to standard method
-        # Set a user agent to avoid being blocked
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        # Fetch content
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()  # Raise exception for 4XX/5XX responses
-        
         # Check if content is HTML
-        content_type = response.headers.get('Content-Type', '').lower()
-        if 'text/html' not in content_type:
-            raise ValueError(f"URL does not contain HTML content. Content-Type: {content_type}")
+        if not page.is_html:
+            raise ValueError(f"URL does not contain HTML content. Content-Type: {page.content_type}")
         
         # Get HTML content
-        html_content = response.text
+        html_content = page.text
         
         # Log the original content for debugging (first 200 chars)
         logger.info(f"Original HTML content snippet: {html_content[:200]}...")
@@ -561,7 +490,8 @@ def process_url_content(url, css_selectors=None):
             logger.info(f"CSS selectors to apply: {css_selectors}")
         
         # Apply HTML preprocessing to reduce size while preserving important formatting
-        processed_html = preprocess_html(html_content, css_selectors)
+        # Reuse the parse tree the simplifier built
+        processed_html = preprocess_html(html_content, css_selectors, soup=page.soup())
         
         logger.info(f"HTML processing: Original size: {len(html_content)} bytes, Processed size: {len(processed_html)} bytes")
         
@@ -11,6 +11,7 @@ from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import permission_required
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 from django.conf import settings
@@ -24,12 +25,24 @@ from .utils import (
     get_bedrock_client, 
     extract_structured_data,
     validate_url,
-    get_categorized_tags,
+    check_url_syntax,
     transform_bedrock_data_to_api_format,
     simplify_html_content
 )
-from apps.categorized_tags.models import CategorizedTag
-from apps.base_site.api import create_or_update_lab_equipment, process_tags
+from .batch import NO_LIMITS, BatchExecutor
+from .payload import PayloadBuilder
+from .result_cache import get_result_cache, result_cache_key
+from .status_counts import (
+    BATCH_STATUSES,
+    REQUEST_STATUSES,
+    batch_status_counts,
+    histogram,
+    invalidate_status_counts,
+    request_status_counts,
+)
+from .work_queue import WorkQueue
+from apps.base_site.api import create_or_update_lab_equipment
+from apps.categorized_tags.resolver import resolve_tag_ids, tag_resolver
 from apps.base_site.models import LabEquipmentPage
 
 logger = logging.getLogger(__name__)
@@ -105,13 +118,11 @@ def processing_status_view(request, request_id):
             url_request.mark_as_failed("Processing timed out after 5 minutes")
             messages.warning(request, "Processing timed out. Please try again or check your URL.")
     
-    # Initiate processing if the request is still pending
-    if url_request.status == 'pending':
+    # Initiate processing if the request is still pending and no queue worker claimed it
+    if url_request.status == 'pending' and WorkQueue().claim_request(request_id):
         try:
             logger.info(f"Starting to process request {request_id} for URL: {url_request.url}")
-            
-            # Mark as processing
-            url_request.mark_as_processing()
+            url_request.refresh_from_db()
             
             # Start processing in the background - in a real production app, use Celery or similar
             # For now, we'll process it directly in the request (may cause timeout for larger pages)
@@ -154,8 +165,7 @@ def create_lab_equipment_view(request, request_id):
         
         # Process tags
         if 'tags' in api_data and api_data['tags']:
-            processed_tags = process_tags(api_data['tags'])
-            api_data['processed_tag_ids'] = [tag.id for tag in processed_tags]
+            api_data['processed_tag_ids'] = resolve_tag_ids(api_data['tags'])
         
         # Ensure the page is created as a draft (not published)
         api_data['is_published'] = False
@@ -287,12 +297,16 @@ def process_url_ajax(request, request_id):
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 
-def process_url_request(request_id):
+def process_url_request(request_id, client=None, limits=None):
     """Process a URL request using the AWS Bedrock client.
     
     Args:
         request_id (int): The ID of the URLProcessingRequest to process
+        client: Optional Bedrock client to use instead of creating one
+        limits: Optional ProcessingLimits bounding the page download and the
+                Bedrock call (used by the batch executor)
     """
+    limits = limits or NO_LIMITS
     url_request = get_object_or_404(URLProcessingRequest, id=request_id)
     
     try:
@@ -302,29 +316,23 @@ def process_url_request(request_id):
         # Mark the request as processing
         url_request.mark_as_processing()
         
-        # Get AWS Bedrock client
-        client = get_bedrock_client()
-        
         # Process URL content (fetch and preprocess HTML)
         logger.info(f"Fetching and preprocessing HTML from {url_request.url}")
         
         # Determine which processing method to use
-        if url_request.selector_configuration:
-            # Use the simplify_html_content function with the selector configuration
-            logger.info(f"Using selector configuration: {url_request.selector_configuration.name}")
-            html_content = simplify_html_content(url_request.url, url_request.selector_configuration.selector_config)
-        elif url_request.css_selectors:
-            # Use the existing process with CSS selectors
-            logger.info(f"Using CSS selectors: {url_request.css_selectors}")
-            html_content = process_url_content(url_request.url, url_request.css_selectors)
-        else:
-            # No selectors provided at all, process the entire HTML
-            logger.info("No selectors or configuration provided, processing entire HTML")
-            html_content = process_url_content(url_request.url)
-        
-        # Prepare a comprehensive prompt for extracting information from the HTML
-        # Include any existing tags for context
-        existing_tags = get_categorized_tags()
+        with limits.fetching():
+            if url_request.selector_configuration:
+                # Use the simplify_html_content function with the selector configuration
+                logger.info(f"Using selector configuration: {url_request.selector_configuration.name}")
+                html_content = simplify_html_content(url_request.url, url_request.selector_configuration.selector_config)
+            elif url_request.css_selectors:
+                # Use the existing process with CSS selectors
+                logger.info(f"Using CSS selectors: {url_request.css_selectors}")
+                html_content = process_url_content(url_request.url, url_request.css_selectors)
+            else:
+                # No selectors provided at all, process the entire HTML
+                logger.info("No selectors or configuration provided, processing entire HTML")
+                html_content = process_url_content(url_request.url)
         
         # Extracted content length for logging
         html_length = len(html_content)
@@ -357,24 +365,15 @@ def process_url_request(request_id):
             br_context = html_content[start_index:end_index]
             logger.info(f"Content around <br> tag: {br_context}")
         
-        # Limit the size of HTML content to avoid exceeding Bedrock API limits
-        max_size = 100000  # 100KB, increased from 50KB for better coverage
-        if len(html_content) > max_size:
-            logger.warning(f"HTML content too large ({len(html_content)} bytes), truncating to {max_size} bytes")
-            html_content = html_content[:max_size]
-        
         # Get existing tags for context
         logger.info("Fetching existing tags for context")
-        existing_tags = CategorizedTag.objects.all().values('category', 'name')
-        existing_tags_list = [{'category': tag['category'], 'name': tag['name']} for tag in existing_tags]
+        existing_tags_list = tag_resolver.existing_tags()
         logger.info(f"Found {len(existing_tags_list)} existing tags")
         
-        # Prepare input variables for Bedrock
-        input_variables = {
-            'site_html': {'text': html_content},
-            'page_url': {'text': url_request.url},
-            'existing_tags': {'text': json.dumps(existing_tags_list) if existing_tags_list else ''}
-        }
+        # Fit the page and the tags relevant to it into the token budget,
+        # leaving out whole sections or elements rather than cutting the HTML
+        payload = PayloadBuilder().build(url_request.url, html_content, existing_tags_list)
+        input_variables = payload.prompt_variables()
         
         # Call AWS Bedrock
         logger.info("Calling AWS Bedrock API...")
@@ -386,21 +385,41 @@ def process_url_request(request_id):
         
         logger.info(f"Using prompt ARN: {prompt_arn}")
         
-        bedrock_response = client.converse(
-            modelId=prompt_arn,
-            promptVariables=input_variables
-        )
-        
-        logger.info("Received response from AWS Bedrock")
-        
-        # Extract the structured data
-        logger.info("Extracting structured data from response")
-        result = bedrock_response.get('output', {})
+        # Reuse the result of an identical earlier request if there is one
+        result_cache = get_result_cache()
+        cache_key = result_cache_key(prompt_arn, payload.site_html, payload.tags)
+        structured_data = result_cache.get(cache_key) if result_cache else None
+        from_cache = structured_data is not None
         
-        # Log result keys and structure for debugging
-        logger.info(f"Bedrock output keys: {list(result.keys()) if isinstance(result, dict) else 'Not a dict'}")
-        
-        structured_data = extract_structured_data(result)
+        if from_cache:
+            logger.info(f"Using cached Bedrock result {cache_key}")
+            url_request.record_usage(payload.tokens)
+            result = None
+        else:
+            # Get AWS Bedrock client
+            if client is None:
+                client = get_bedrock_client()
+            
+            bedrock_response = limits.converse(
+                client,
+                modelId=prompt_arn,
+                promptVariables=input_variables
+            )
+            
+            logger.info("Received response from AWS Bedrock")
+            url_request.record_usage(payload.tokens, bedrock_response)
+            
+            # Extract the structured data
+            logger.info("Extracting structured data from response")
+            result = bedrock_response.get('output', {})
+            
+            # Log result keys and structure for debugging
+            logger.info(f"Bedrock output keys: {list(result.keys()) if isinstance(result, dict) else 'Not a dict'}")
+            
+            structured_data = extract_structured_data(result)
+            
+            if structured_data and result_cache:
+                result_cache.set(cache_key, prompt_arn, structured_data)
         
         if structured_data:
             logger.info("Successfully extracted structured data")
@@ -421,7 +440,7 @@ def process_url_request(request_id):
             logger.info(f"Full description snippet: {full_description[:200]}")
             
             # Mark as completed
-            url_request.mark_as_completed(structured_data)
+            url_request.mark_as_completed(structured_data, from_cache=from_cache)
             logger.info(f"Request {request_id} marked as completed")
             
             # Set the name field based on response title
@@ -436,8 +455,7 @@ def process_url_request(request_id):
                 
                 # Process tags
                 if 'tags' in api_data and api_data['tags']:
-                    processed_tags = process_tags(api_data['tags'])
-                    api_data['processed_tag_ids'] = [tag.id for tag in processed_tags]
+                    api_data['processed_tag_ids'] = resolve_tag_ids(api_data['tags'])
                 
                 # Ensure the page is created as a draft (not published)
                 api_data['is_published'] = False
@@ -489,11 +507,13 @@ def dashboard_view(request):
         status_filter = request.GET.get('status', '')
         search_query = request.GET.get('search', '')
         
+        counts = batch_status_counts()
+        
         # Start with all batches
         batches = BatchURLProcessingRequest.objects.all()
         
         # Apply status filter if specified
-        if status_filter and status_filter in ['pending', 'processing', 'completed', 'failed', 'partial']:
+        if status_filter and status_filter in BATCH_STATUSES:
             batches = batches.filter(status=status_filter)
         
         # Apply search filter if specified
@@ -501,10 +521,13 @@ def dashboard_view(request):
             batches = batches.filter(name__icontains=search_query)
         
         # Sort by created_at (newest first)
-        batches = batches.order_by('-created_at')
+        batches = batches.order_by('-created_at', '-id')
         
         # Paginate the results
         paginator = Paginator(batches, 20)  # Show 20 batches per page
+        if not search_query:
+            # The status histogram already counts these batches
+            paginator.count = counts[status_filter] if status_filter in BATCH_STATUSES else counts['total']
         page = request.GET.get('page')
         
         try:
@@ -522,12 +545,12 @@ def dashboard_view(request):
             'batches': paginated_batches,
             'status_filter': status_filter,
             'search_query': search_query,
-            'total_count': batches.count(),
-            'pending_count': BatchURLProcessingRequest.objects.filter(status='pending').count(),
-            'processing_count': BatchURLProcessingRequest.objects.filter(status='processing').count(),
-            'completed_count': BatchURLProcessingRequest.objects.filter(status='completed').count(),
-            'failed_count': BatchURLProcessingRequest.objects.filter(status='failed').count(),
-            'partial_count': BatchURLProcessingRequest.objects.filter(status='partial').count(),
+            'total_count': paginator.count,
+            'pending_count': counts['pending'],
+            'processing_count': counts['processing'],
+            'completed_count': counts['completed'],
+            'failed_count': counts['failed'],
+            'partial_count': counts['partial'],
         }
         
     else:  # Individual view (default)
@@ -536,11 +559,13 @@ def dashboard_view(request):
         search_query = request.GET.get('search', '')
         batch_filter = request.GET.get('batch', '')
         
+        counts = request_status_counts()
+        
         # Start with all requests
         requests = URLProcessingRequest.objects.all()
         
         # Apply status filter if specified
-        if status_filter and status_filter in ['pending', 'processing', 'completed', 'failed']:
+        if status_filter and status_filter in REQUEST_STATUSES:
             requests = requests.filter(status=status_filter)
         
         # Apply search filter if specified
@@ -548,6 +573,7 @@ def dashboard_view(request):
             requests = requests.filter(url__icontains=search_query)
             
         # Apply batch filter if specified
+        selected_batch = None
         if batch_filter:
             if batch_filter == 'nobatch':
                 requests = requests.filter(batch__isnull=True)
@@ -555,14 +581,18 @@ def dashboard_view(request):
                 try:
                     batch_id = int(batch_filter)
                     requests = requests.filter(batch_id=batch_id)
+                    selected_batch = BatchURLProcessingRequest.objects.filter(id=batch_id).only('id', 'name').first()
                 except ValueError:
-                    pass
+                    batch_filter = ''
         
         # Sort by created_at (newest first)
         requests = requests.order_by('-created_at')
         
         # Paginate the results
         paginator = Paginator(requests, 20)  # Show 20 requests per page
+        if not search_query and not batch_filter:
+            # The status histogram already counts these requests
+            paginator.count = counts[status_filter] if status_filter in REQUEST_STATUSES else counts['total']
         page = request.GET.get('page')
         
         try:
@@ -574,26 +604,63 @@ def dashboard_view(request):
             # If page is out of range, deliver last page of results
             paginated_requests = paginator.page(paginator.num_pages)
         
-        # Get all batches for the batch filter dropdown
-        batches = BatchURLProcessingRequest.objects.all().order_by('-created_at')
-        
-        # Prepare context for template
+        # Prepare context for template. The batch filter only renders the selected
+        # batch; the others are loaded page by page from batch_options_view
         context = {
             'view_type': 'individual',
             'requests': paginated_requests,
-            'batches': batches,
+            'selected_batch': selected_batch,
             'status_filter': status_filter,
             'search_query': search_query,
             'batch_filter': batch_filter,
-            'total_count': requests.count(),
-            'pending_count': URLProcessingRequest.objects.filter(status='pending').count(),
-            'processing_count': URLProcessingRequest.objects.filter(status='processing').count(),
-            'completed_count': URLProcessingRequest.objects.filter(status='completed').count(),
-            'failed_count': URLProcessingRequest.objects.filter(status='failed').count(),
+            'total_count': paginator.count,
+            'pending_count': counts['pending'],
+            'processing_count': counts['processing'],
+            'completed_count': counts['completed'],
+            'failed_count': counts['failed'],
+            'cached_count': counts['cached'],
         }
     
     return render(request, 'wagtailadmin/ai_processing/dashboard.html', context)
 
+@permission_required('ai_processing.view_urlprocessingrequest')
+def batch_options_view(request):
+    """
+    JSON page of batches for the dashboard's batch filter, newest first.
+    
+    Uses keyset pagination: the `after` parameter is the ID of the last batch of the
+    previous page, so a page costs the same however many batches there are.
+    Accepts an optional `q` to search batch names.
+    
+    Returns JSON with:
+    - results: list of {id, name} objects
+    - next: the `after` value of the next page, or null
+    """
+    page_size = getattr(settings, 'AI_DASHBOARD_BATCH_OPTIONS_PAGE_SIZE', 50)
+    batches = BatchURLProcessingRequest.objects.order_by('-created_at', '-id')
+    
+    search_query = request.GET.get('q', '')
+    if search_query:
+        batches = batches.filter(name__icontains=search_query)
+    
+    after = request.GET.get('after')
+    if after:
+        try:
+            last = BatchURLProcessingRequest.objects.values('id', 'created_at').get(id=int(after))
+        except (ValueError, BatchURLProcessingRequest.DoesNotExist):
+            return JsonResponse({'results': [], 'next': None, 'message': 'Invalid cursor'}, status=400)
+        batches = batches.filter(
+            Q(created_at__lt=last['created_at']) | Q(created_at=last['created_at'], id__lt=last['id'])
+        )
+    
+    results = list(batches.values('id', 'name')[:page_size + 1])
+    has_next = len(results) > page_size
+    results = results[:page_size]
+    return JsonResponse({
+        'results': results,
+        'next': results[-1]['id'] if has_next else None,
+    })
+
 @require_POST
 @permission_required('ai_processing.delete_urlprocessingrequest')
 def delete_request_view(request, request_id):
@@ -602,6 +669,7 @@ def delete_request_view(request, request_id):
     """
     url_request = get_object_or_404(URLProcessingRequest, id=request_id)
     url_request.delete()
+    invalidate_status_counts()
     messages.success(request, f'Request for {url_request.url} has been deleted.')
     return redirect(reverse('ai_processing:dashboard'))
 
@@ -619,9 +687,7 @@ def retry_request_view(request, request_id):
         return redirect(reverse('ai_processing:dashboard'))
     
     # Reset the request status to pending
-    url_request.status = 'pending'
-    url_request.error_message = None
-    url_request.save(update_fields=['status', 'error_message'])
+    url_request.mark_as_pending()
     
     messages.success(request, f'Request for {url_request.url} has been queued for retry.')
     return redirect(reverse('ai_processing:processing_status', args=[url_request.id]))
@@ -657,10 +723,10 @@ def batch_process_view(request):
             elif css_selectors:
                 logger.info(f"Batch created with CSS selectors: {css_selectors}")
             
-            # Create URL processing requests for each URL
+            # Create URL processing requests for each URL; the form has checked the
+            # URL syntax, and unreachable pages fail when they are fetched
             for url in urls:
-                # Validate URL first
-                is_valid, error_message = validate_url(url)
+                is_valid, error_message = check_url_syntax(url)
                 if is_valid:
                     URLProcessingRequest.objects.create(
                         url=url,
@@ -671,8 +737,8 @@ def batch_process_view(request):
                 else:
                     logger.warning(f"Skipping invalid URL in batch: {url} - {error_message}")
             
-            # Update batch status
-            batch.update_status()
+            # Count the requests actually created
+            batch.reconcile()
             
             # Start processing the batch in a background thread
             thread = threading.Thread(target=process_batch_urls, args=(batch.id,))
@@ -698,11 +764,15 @@ def batch_status_view(request, batch_id):
     
     # Apply filters if provided
     status_filter = request.GET.get('status', '')
-    if status_filter and status_filter in ['pending', 'processing', 'completed', 'failed']:
+    if status_filter and status_filter in REQUEST_STATUSES:
         url_requests = url_requests.filter(status=status_filter)
     
+    # Count the batch's requests per status in one query
+    counts = histogram(batch.url_requests.all(), REQUEST_STATUSES)
+    
     # Paginate the URL requests
     paginator = Paginator(url_requests, 20)  # Show 20 requests per page
+    paginator.count = counts[status_filter] if status_filter in REQUEST_STATUSES else counts['total']
     page = request.GET.get('page')
     
     try:
@@ -717,58 +787,33 @@ def batch_status_view(request, batch_id):
         'batch': batch,
         'url_requests': paginated_requests,
         'status_filter': status_filter,
-        'pending_count': batch.url_requests.filter(status='pending').count(),
-        'processing_count': batch.url_requests.filter(status='processing').count(),
-        'completed_count': batch.url_requests.filter(status='completed').count(),
-        'failed_count': batch.url_requests.filter(status='failed').count(),
+        'pending_count': counts['pending'],
+        'processing_count': counts['processing'],
+        'completed_count': counts['completed'],
+        'failed_count': counts['failed'],
     }
     
     return render(request, 'wagtailadmin/ai_processing/batch_status.html', context)
 
-def process_batch_urls(batch_id, rate_limit_delay=2):
+def process_batch_urls(batch_id, executor=None):
     """
-    Process all URLs in a batch sequentially (one at a time).
+    Process all URLs in a batch concurrently with a BatchExecutor.
     This function is designed to be run in a background thread.
     
     Args:
         batch_id: ID of the BatchURLProcessingRequest
-        rate_limit_delay: Delay between processing requests (in seconds)
+        executor: Optional BatchExecutor (default: one configured from the AI_BATCH_* settings)
     """
-    logger.info(f"Starting sequential batch processing for batch ID: {batch_id}")
-    
-    try:
-        batch = BatchURLProcessingRequest.objects.get(id=batch_id)
-    except BatchURLProcessingRequest.DoesNotExist:
-        logger.error(f"Batch ID {batch_id} not found")
-        return
-    
-    # Update batch status to processing
-    batch.status = 'processing'
-    batch.save(update_fields=['status'])
-    
-    # Get all pending requests for this batch
-    pending_requests = URLProcessingRequest.objects.filter(
-        batch_id=batch_id,
-        status='pending'
-    ).order_by('created_at')  # Process in order of creation
-    
-    logger.info(f"Found {pending_requests.count()} pending requests in batch {batch_id}")
-    
-    # Process each URL one at a time
-    for request in pending_requests:
-        logger.info(f"Processing URL: {request.url} (Request ID: {request.id})")
-        
-        # Process this URL
-        process_url_request(request.id)
-        
-        # Update batch status after each request
-        batch.refresh_from_db()
-        batch.update_status()
-        
-        # Rate limiting delay between requests
-        time.sleep(rate_limit_delay)
+    logger.info(f"Starting batch processing for batch ID: {batch_id}")
+    (executor or BatchExecutor()).run(batch_id)
+
+def create_pages_for_completed_requests(batch_id):
+    """
+    Create draft pages for the completed requests of a batch that don't have one yet.
     
-    # Auto-create pages for completed requests that don't have pages yet
+    Args:
+        batch_id: ID of the BatchURLProcessingRequest
+    """
     completed_requests = URLProcessingRequest.objects.filter(
         batch_id=batch_id,
         status='completed',
@@ -784,8 +829,7 @@ def process_batch_urls(batch_id, rate_limit_delay=2):
             
             # Process tags
             if 'tags' in api_data and api_data['tags']:
-                processed_tags = process_tags(api_data['tags'])
-                api_data['processed_tag_ids'] = [tag.id for tag in processed_tags]
+                api_data['processed_tag_ids'] = resolve_tag_ids(api_data['tags'])
             
             # Ensure the page is created as a draft (not published)
             api_data['is_published'] = False
@@ -804,12 +848,6 @@ def process_batch_urls(batch_id, rate_limit_delay=2):
                 logger.error(f"Failed to auto-create page for URL {request.url}: {result.get('error', 'Unknown error')}")
         except Exception as e:
             logger.exception(f"Error auto-creating page for request {request.id}")
-    
-    # Update the batch status one final time
-    batch.refresh_from_db()
-    batch.update_status()
-    
-    logger.info(f"Batch processing complete for batch ID: {batch_id}")
 
 @require_POST
 @permission_required('ai_processing.delete_batchurlprocessingrequest')
@@ -845,12 +883,10 @@ def retry_batch_view(request, batch_id):
         messages.info(request, f'No failed requests to retry in batch "{batch.name}".')
         return redirect(reverse('ai_processing:batch_status', args=[batch_id]))
     
-    # Reset failed requests to pending
-    failed_requests.update(status='pending', error_message=None)
-    
-    # Update batch status
-    batch.status = 'processing'
-    batch.save(update_fields=['status'])
+    # Reset failed requests to pending and take them out of the batch counters
+    with transaction.atomic():
+        count = failed_requests.update(status='pending', error_message=None, attempts=0, available_at=timezone.now())
+        BatchURLProcessingRequest.record_transition(batch.id, 'failed', 'pending', count)
     
     # Start processing in a background thread
     thread = threading.Thread(target=process_batch_urls, args=(batch.id,))
@@ -935,8 +971,8 @@ def api_batch_process(request):
         invalid_urls = []
         
         for url in urls:
-            # Validate URL
-            is_valid, error_message = validate_url(url)
+            # Check the URL syntax; the page itself is only fetched once, when processed
+            is_valid, error_message = check_url_syntax(url)
             
             if is_valid:
                 URLProcessingRequest.objects.create(
@@ -947,8 +983,8 @@ def api_batch_process(request):
             else:
                 invalid_urls.append({'url': url, 'error': error_message})
         
-        # Update batch status
-        batch.update_status()
+        # Count the requests actually created
+        batch.reconcile()
         
         # No valid URLs
         if valid_count == 0:
@@ -0,0 +1,366 @@
+"""
+Database-backed work queue of URL processing requests.
+
+The queue is the URLProcessingRequest table itself: a request is claimable when it
+is pending and its available_at time has passed, or when it is processing but the
+lease of the worker holding it has expired (the worker died). Claiming a request
+moves it to processing, counts an attempt and gives the worker a lease, which the
+worker extends with heartbeats while it processes the request.
+
+Claims use SELECT ... FOR UPDATE SKIP LOCKED where the database supports it, so
+concurrent workers never wait for each other. Elsewhere (SQLite) each candidate is
+claimed with a conditional UPDATE that only succeeds for one worker.
+
+A failed request is retried with exponential backoff until it has been attempted
+max_attempts times. Lease length, attempts and backoff come from the AI_QUEUE_*
+settings; `python manage.py run_workers` runs worker processes.
+"""
+
+import logging
+import os
+import signal
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BACKOFF = 60
+DEFAULT_RETRY_BACKOFF_MAX = 60 * 60
+DEFAULT_POLL_INTERVAL = 5
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class WorkQueue:
+    """Claims, leases and retries URLProcessingRequests."""
+
+    def __init__(self, lease_seconds=None, max_attempts=None, retry_backoff=None, retry_backoff_max=None,
+                 worker_id=None):
+        """
+        Args:
+            lease_seconds: How long a claim holds without a heartbeat
+            max_attempts: Attempts before a request stays failed
+            retry_backoff: Delay in seconds before the first retry, doubled for each further one
+            retry_backoff_max: Maximum delay between retries
+            worker_id: Name of the lease holder (default: host, process and a random suffix)
+        """
+        self.lease_seconds = lease_seconds or getattr(settings, 'AI_QUEUE_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+        self.max_attempts = max_attempts or getattr(settings, 'AI_QUEUE_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+        if retry_backoff is None:
+            retry_backoff = getattr(settings, 'AI_QUEUE_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF)
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max or getattr(settings, 'AI_QUEUE_RETRY_BACKOFF_MAX',
+                                                              DEFAULT_RETRY_BACKOFF_MAX)
+        self.worker_id = worker_id or default_worker_id()
+
+    @staticmethod
+    def _claimable(now, status):
+        if status == 'pending':
+            return Q(status='pending', available_at__lte=now)
+        return Q(status='processing', lease_expires_at__lt=now)
+
+    def _lease(self, now):
+        return {
+            'status': 'processing',
+            'attempts': F('attempts') + 1,
+            'leased_by': self.worker_id,
+            'lease_expires_at': now + timedelta(seconds=self.lease_seconds),
+        }
+
+    def claim(self, limit=1, batch_id=None):
+        """
+        Claim up to limit requests, oldest available first.
+
+        Args:
+            limit: Maximum number of requests to claim
+            batch_id: Only claim requests of this batch
+
+        Returns:
+            list: The claimed URLProcessingRequests
+        """
+        from .models import URLProcessingRequest, invalidate_status_counts_on_commit
+
+        now = timezone.now()
+        self.fail_abandoned(now)
+
+        requests = URLProcessingRequest.objects.filter(
+            self._claimable(now, 'pending') | self._claimable(now, 'processing')
+        )
+        if batch_id is not None:
+            requests = requests.filter(batch_id=batch_id)
+        candidates = requests.order_by('available_at', 'id').values_list('id', 'status', 'batch_id')
+
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                claimed_ids = self._lease_candidates(candidates.select_for_update(skip_locked=True)[:limit], now)
+        else:
+            # Candidates are read outside a transaction (SQLite cannot upgrade a read
+            # lock while other workers write) and leased one by one; read again if
+            # other workers won all of them
+            claimed_ids = []
+            while not claimed_ids:
+                rows = list(candidates[:limit])
+                if not rows:
+                    break
+                claimed_ids = self._lease_candidates(rows, now)
+
+        if not claimed_ids:
+            return []
+        invalidate_status_counts_on_commit()
+        logger.info(f"Worker {self.worker_id} claimed requests {claimed_ids}")
+        return list(URLProcessingRequest.objects.filter(id__in=claimed_ids).order_by('available_at', 'id'))
+
+    def _lease_candidates(self, candidates, now):
+        from .models import BatchURLProcessingRequest, URLProcessingRequest
+
+        claimed_ids = []
+        for request_id, status, batch_id in candidates:
+            with transaction.atomic():
+                # Without row locks another worker may have claimed the request since
+                # it was read; the conditional update lets only one of them win
+                claimed = URLProcessingRequest.objects.filter(
+                    self._claimable(now, status), pk=request_id
+                ).update(**self._lease(now))
+                if not claimed:
+                    continue
+                if batch_id:
+                    BatchURLProcessingRequest.record_transition(batch_id, status, 'processing')
+            claimed_ids.append(request_id)
+        return claimed_ids
+
+    def claim_request(self, request_id):
+        """
+        Claim one pending request for immediate processing.
+
+        Returns:
+            bool: True if the request was claimed, False if it is not pending or
+                  another worker claimed it first
+        """
+        from .models import BatchURLProcessingRequest, URLProcessingRequest, invalidate_status_counts_on_commit
+
+        now = timezone.now()
+        with transaction.atomic():
+            claimed = URLProcessingRequest.objects.filter(pk=request_id, status='pending').update(**self._lease(now))
+            if claimed:
+                batch_id = URLProcessingRequest.objects.filter(pk=request_id).values_list('batch_id', flat=True)[0]
+                if batch_id:
+                    BatchURLProcessingRequest.record_transition(batch_id, 'pending', 'processing')
+                invalidate_status_counts_on_commit()
+        return bool(claimed)
+
+    def heartbeat(self, request_ids):
+        """
+        Extend the leases this worker holds on requests.
+
+        Returns:
+            int: Number of leases extended; fewer than requested means a lease was lost
+        """
+        from .models import URLProcessingRequest
+
+        return URLProcessingRequest.objects.filter(
+            id__in=request_ids, status='processing', leased_by=self.worker_id
+        ).update(lease_expires_at=timezone.now() + timedelta(seconds=self.lease_seconds))
+
+    @contextmanager
+    def heartbeating(self, request_ids, interval=None):
+        """Extend the leases on request_ids from a background thread while the block runs."""
+        interval = interval or self.lease_seconds / 3
+        done = threading.Event()
+
+        def beat():
+            try:
+                while not done.wait(interval):
+                    if self.heartbeat(request_ids) < len(request_ids):
+                        logger.warning(f"Worker {self.worker_id} lost the lease on one of {request_ids}")
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=beat, name='ai-queue-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    def retry_delay(self, attempts):
+        """Seconds to wait before retrying a request that failed attempts times."""
+        return min(self.retry_backoff * 2 ** max(attempts - 1, 0), self.retry_backoff_max)
+
+    def finish(self, request_id):
+        """
+        Schedule a retry if the request failed and has attempts left.
+
+        Returns:
+            bool: True if a retry was scheduled
+        """
+        from .models import URLProcessingRequest
+
+        url_request = URLProcessingRequest.objects.get(pk=request_id)
+        if url_request.status != 'failed' or url_request.attempts >= self.max_attempts:
+            return False
+
+        delay = self.retry_delay(url_request.attempts)
+        url_request.schedule_retry(timezone.now() + timedelta(seconds=delay))
+        logger.info(f"Request {request_id} failed (attempt {url_request.attempts}), retrying in {delay}s")
+        return True
+
+    def next_retry_at(self, batch_id):
+        """
+        Return when the next scheduled retry of a batch becomes claimable.
+
+        Returns:
+            datetime: available_at of the earliest pending request of the batch, or
+                      None if it has no pending requests
+        """
+        from .models import URLProcessingRequest
+
+        return URLProcessingRequest.objects.filter(batch_id=batch_id, status='pending').order_by(
+            'available_at').values_list('available_at', flat=True).first()
+
+    def fail_abandoned(self, now=None):
+        """
+        Fail requests whose worker died during their last attempt.
+
+        Returns:
+            int: Number of requests failed
+        """
+        from .models import URLProcessingRequest
+
+        now = now or timezone.now()
+        abandoned = URLProcessingRequest.objects.filter(
+            self._claimable(now, 'processing'), attempts__gte=self.max_attempts
+        )
+        count = 0
+        for url_request in abandoned:
+            url_request.mark_as_failed(f"Worker lease expired during attempt {url_request.attempts}")
+            count += 1
+        return count
+
+    def enqueue(self, urls, batch=None, **fields):
+        """
+        Add pending requests for urls, skipping URLs the batch already has.
+
+        Args:
+            urls: URLs to process
+            batch: Optional BatchURLProcessingRequest the requests belong to
+            **fields: Other URLProcessingRequest fields (css_selectors, ...)
+
+        Returns:
+            int: Number of requests added
+        """
+        from .models import URLProcessingRequest, invalidate_status_counts_on_commit
+
+        if batch is not None:
+            existing = set(batch.url_requests.values_list('url', flat=True))
+            urls = [url for url in dict.fromkeys(urls) if url not in existing]
+
+        URLProcessingRequest.objects.bulk_create(
+            [URLProcessingRequest(url=url, batch=batch, **fields) for url in urls],
+            batch_size=500,
+        )
+        invalidate_status_counts_on_commit()
+        if batch is not None:
+            batch.reconcile()
+        return len(urls)
+
+
+class Worker:
+    """Claims queued requests one at a time and processes them."""
+
+    def __init__(self, queue=None, process=None, batch_id=None, poll_interval=None):
+        """
+        Args:
+            queue: WorkQueue to claim from
+            process: Function called with a request ID (default: process_url_request)
+            batch_id: Only process requests of this batch
+            poll_interval: Seconds to wait when the queue is empty
+        """
+        self.queue = queue or WorkQueue()
+        self.process = process
+        self.batch_id = batch_id
+        self.poll_interval = poll_interval or getattr(settings, 'AI_QUEUE_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        self.stop_event = threading.Event()
+
+    def process_next(self):
+        """
+        Claim and process one request.
+
+        Returns:
+            bool: False if there was nothing to claim
+        """
+        if self.process is None:
+            from .views import process_url_request
+            self.process = process_url_request
+
+        claimed = self.queue.claim(batch_id=self.batch_id)
+        if not claimed:
+            return False
+
+        url_request = claimed[0]
+        with self.queue.heartbeating([url_request.id]):
+            try:
+                self.process(url_request.id)
+            except Exception:
+                logger.exception(f"Error processing request {url_request.id}")
+        self.queue.finish(url_request.id)
+        return True
+
+    def run(self, max_items=None, burst=False, delay=0):
+        """
+        Process requests until stopped.
+
+        Args:
+            max_items: Stop after processing this many requests
+            burst: Stop when no request is claimable instead of polling
+            delay: Seconds to wait between requests
+
+        Returns:
+            int: Number of requests processed
+        """
+        processed = 0
+        while not self.stop_event.is_set() and (max_items is None or processed < max_items):
+            if self.process_next():
+                processed += 1
+                if delay:
+                    self.stop_event.wait(delay)
+            elif burst:
+                break
+            else:
+                self.stop_event.wait(self.poll_interval)
+        logger.info(f"Worker {self.queue.worker_id} stopped after {processed} requests")
+        return processed
+
+    def stop(self):
+        """Stop after the current request."""
+        self.stop_event.set()
+
+
+def run_worker_process(batch_id=None, max_items=None, burst=False, delay=0):
+    """Entry point of a worker process started by the run_workers command."""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+    worker = Worker(batch_id=batch_id)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    try:
+        return worker.run(max_items=max_items, burst=burst, delay=delay)
+    except KeyboardInterrupt:
+        logger.info(f"Worker {worker.queue.worker_id} interrupted")
+    finally:
+        connections.close_all()
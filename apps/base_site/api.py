@@ -1,17 +1,21 @@
+import hashlib
 import json
 import logging
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import prefetch_related_objects
 from wagtail.models import Page
+from wagtail.signal_handlers import disable_reference_index_auto_update
 
 from .auth import token_required
 from .models import (
     LabEquipmentPage, EquipmentModel, LabEquipmentPageSpecGroup,
-    Spec, EquipmentFeature, LabEquipmentGalleryImage, EquipmentModelSpecGroup
+    Spec, SpecGroup, EquipmentFeature, LabEquipmentGalleryImage, EquipmentModelSpecGroup
 )
-from apps.categorized_tags.models import CategorizedTag
+from apps.categorized_tags.models import CategorizedPageTag, CategorizedTag
+from apps.categorized_tags.resolver import resolve_tag_ids, tag_resolver
 from apps.ai_processing.utils import fix_rich_text_html
 
 logger = logging.getLogger(__name__)
@@ -24,215 +28,28 @@ def process_tags(tags_data):
     1. Array of objects with category and name: [{"category": "Manufacturer", "name": "Horiba"}, ...]
     2. Array of strings (legacy): ["Manufacturer: Horiba", ...] - these will be parsed
     
+    Existing tags are matched case-insensitively and missing ones are created; see
+    apps.categorized_tags.resolver. Callers that only need IDs should use resolve_tag_ids.
+    
     Returns a list of CategorizedTag objects.
     """
-    processed_tags = []
-    
-    for tag_data in tags_data:
-        if isinstance(tag_data, dict) and 'category' in tag_data and 'name' in tag_data:
-            # Process structured tag data
-            category = tag_data['category'].strip()
-            name = tag_data['name'].strip()
-            
-            # Additional check - if name contains category, split it
-            if ':' in name and not category:
-                parts = name.split(':', 1)
-                if len(parts) == 2:
-                    category = parts[0].strip()
-                    name = parts[1].strip()
-                    logger.info(f"Extracted category from name: '{category}' and '{name}'")
-            
-            # Check if tag exists (ignoring case)
-            existing_tag = CategorizedTag.objects.filter(
-                category__iexact=category,
-                name__iexact=name
-            ).first()
-            
-            if existing_tag:
-                # Use existing tag
-                processed_tags.append(existing_tag)
-                logger.info(f"Using existing tag: {existing_tag}")
-            else:
-                # Check if a malformed version of this tag exists (full string in name, empty category)
-                potential_malformed = None
-                if ':' in tag_data['name']:
-                    # Try to find a tag with the entire string as name and empty category
-                    potential_malformed = CategorizedTag.objects.filter(
-                        name__iexact=tag_data['name'].strip(),
-                        category__exact=''
-                    ).first()
-                
-                if potential_malformed:
-                    # Fix and use the malformed tag
-                    potential_malformed.category = category
-                    potential_malformed.name = name
-                    potential_malformed.save()
-                    processed_tags.append(potential_malformed)
-                    logger.info(f"Fixed and using tag: {potential_malformed}")
-                else:
-                    # Create new tag
-                    try:
-                        tag = CategorizedTag.objects.create(
-                            category=category,
-                            name=name
-                        )
-                        processed_tags.append(tag)
-                        logger.info(f"Created new tag: {tag}")
-                    except Exception as e:
-                        logger.warning(f"Error creating tag {category}:{name} - {e}")
-                        # If we can't create it, try to get it again (in case of race condition or slug collision)
-                        existing_tag = CategorizedTag.objects.filter(
-                            category__iexact=category,
-                            name__iexact=name
-                        ).first()
-                        
-                        if existing_tag:
-                            processed_tags.append(existing_tag)
-                            logger.info(f"Using existing tag after creation failed: {existing_tag}")
-                        else:
-                            # Try creating with a modified slug if it might be a slug collision
-                            try:
-                                import random
-                                # Generate a unique suffix for the slug
-                                suffix = ''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=5))
-                                # Pre-generate the slug to avoid collision
-                                from django.utils.text import slugify
-                                slug = f"{slugify(f'{category}-{name}')}-{suffix}"
-                                
-                                tag = CategorizedTag.objects.create(
-                                    category=category,
-                                    name=name,
-                                    slug=slug
-                                )
-                                processed_tags.append(tag)
-                                logger.info(f"Created new tag with modified slug: {tag}")
-                            except Exception as e2:
-                                logger.error(f"Failed to create tag even with modified slug: {category}:{name} - {e2}")
-        elif isinstance(tag_data, str):
-            # Legacy string format (for backward compatibility)
-            if ':' in tag_data:
-                category, name = [part.strip() for part in tag_data.split(':', 1)]
-                
-                # Additional check - handle Manufacturer-style tags that might already exist
-                # Check first if there's an existing tag with the full string as name and empty category
-                potential_malformed_tag = CategorizedTag.objects.filter(
-                    name__iexact=tag_data.strip(),
-                    category__exact=''
-                ).first()
-                
-                if potential_malformed_tag:
-                    # Update the malformed tag to have proper category/name structure
-                    potential_malformed_tag.category = category
-                    potential_malformed_tag.name = name
-                    potential_malformed_tag.save()
-                    processed_tags.append(potential_malformed_tag)
-                    logger.info(f"Fixed and using tag: {potential_malformed_tag}")
-                    continue
-                
-                # Check if a proper tag exists (ignoring case)
-                existing_tag = CategorizedTag.objects.filter(
-                    category__iexact=category,
-                    name__iexact=name
-                ).first()
-                
-                if existing_tag:
-                    # Use existing tag
-                    processed_tags.append(existing_tag)
-                    logger.info(f"Using existing tag: {existing_tag}")
-                else:
-                    # Create new tag
-                    try:
-                        tag = CategorizedTag.objects.create(
-                            category=category,
-                            name=name
-                        )
-                        processed_tags.append(tag)
-                        logger.info(f"Created new tag: {tag}")
-                    except Exception as e:
-                        logger.warning(f"Error creating tag {category}:{name} - {e}")
-                        # If we can't create it, try to get it again (in case of race condition or slug collision)
-                        existing_tag = CategorizedTag.objects.filter(
-                            category__iexact=category,
-                            name__iexact=name
-                        ).first()
-                        
-                        if existing_tag:
-                            processed_tags.append(existing_tag)
-                            logger.info(f"Using existing tag after creation failed: {existing_tag}")
-                        else:
-                            # Try creating with a modified slug if it might be a slug collision
-                            try:
-                                import random
-                                # Generate a unique suffix for the slug
-                                suffix = ''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=5))
-                                # Pre-generate the slug to avoid collision
-                                from django.utils.text import slugify
-                                slug = f"{slugify(f'{category}-{name}')}-{suffix}"
-                                
-                                tag = CategorizedTag.objects.create(
-                                    category=category,
-                                    name=name,
-                                    slug=slug
-                                )
-                                processed_tags.append(tag)
-                                logger.info(f"Created new tag with modified slug: {tag}")
-                            except Exception as e2:
-                                logger.error(f"Failed to create tag even with modified slug: {category}:{name} - {e2}")
-            else:
-                # If no category is specified, use "General" as default
-                name = tag_data.strip()
-                
-                # Check if tag exists (ignoring case)
-                existing_tag = CategorizedTag.objects.filter(
-                    category__iexact="General",
-                    name__iexact=name
-                ).first()
-                
-                if existing_tag:
-                    # Use existing tag
-                    processed_tags.append(existing_tag)
-                    logger.info(f"Using existing tag: {existing_tag}")
-                else:
-                    # Create new tag
-                    try:
-                        tag = CategorizedTag.objects.create(
-                            category="General",
-                            name=name
-                        )
-                        processed_tags.append(tag)
-                        logger.info(f"Created new tag: {tag}")
-                    except Exception as e:
-                        logger.warning(f"Error creating tag General:{name} - {e}")
-                        # If we can't create it, try to get it again (in case of race condition or slug collision)
-                        existing_tag = CategorizedTag.objects.filter(
-                            category__iexact="General",
-                            name__iexact=name
-                        ).first()
-                        
-                        if existing_tag:
-                            processed_tags.append(existing_tag)
-                            logger.info(f"Using existing tag after creation failed: {existing_tag}")
-                        else:
-                            # Try creating with a modified slug if it might be a slug collision
-                            try:
-                                import random
-                                # Generate a unique suffix for the slug
-                                suffix = ''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=5))
-                                # Pre-generate the slug to avoid collision
-                                from django.utils.text import slugify
-                                slug = f"{slugify(f'General-{name}')}-{suffix}"
-                                
-                                tag = CategorizedTag.objects.create(
-                                    category="General",
-                                    name=name,
-                                    slug=slug
-                                )
-                                processed_tags.append(tag)
-                                logger.info(f"Created new tag with modified slug: {tag}")
-                            except Exception as e2:
-                                logger.error(f"Failed to create tag even with modified slug: General:{name} - {e2}")
-    
-    return processed_tags
+    tag_ids = resolve_tag_ids(tags_data)
+    tags = CategorizedTag.objects.in_bulk(tag_ids)
+    return [tags[tag_id] for tag_id in tag_ids if tag_id in tags]
+
+REQUIRED_FIELDS = ['title', 'short_description']
+
+def validate_lab_equipment_data(data):
+    """
+    Check a product payload for required fields.
+    Returns an error message, or None if the data is valid.
+    """
+    if not isinstance(data, dict):
+        return 'Each item must be a JSON object'
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in data]
+    if missing_fields:
+        return f'Missing required fields: {", ".join(missing_fields)}'
+    return None
 
 @csrf_exempt
 @token_required
@@ -245,13 +62,11 @@ def create_or_update_lab_equipment(request):
         data = json.loads(request.body)
         
         # Validate required fields
-        required_fields = ['title', 'short_description']
-        missing_fields = [field for field in required_fields if field not in data]
-        
-        if missing_fields:
+        error = validate_lab_equipment_data(data)
+        if error:
             return JsonResponse({
                 'success': False,
-                'error': f'Missing required fields: {", ".join(missing_fields)}'
+                'error': error
             }, status=400)
         
         # Check if we're updating an existing page or creating a new one
@@ -267,9 +82,8 @@ def create_or_update_lab_equipment(request):
         # Process tags separately before entering transaction
         if 'tags' in data and data['tags']:
             try:
-                processed_tags = process_tags(data['tags'])
                 # Replace original tags data with processed tag IDs
-                data['processed_tag_ids'] = [tag.id for tag in processed_tags]
+                data['processed_tag_ids'] = resolve_tag_ids(data['tags'])
             except Exception as e:
                 logger.exception("Error processing tags")
                 return JsonResponse({
@@ -280,10 +94,10 @@ def create_or_update_lab_equipment(request):
         # Begin transaction to ensure data consistency
         with transaction.atomic():
             if existing_page:
-                # Update existing page
+                # Update existing page ("updated", or "unchanged" for identical data)
                 result = update_lab_equipment_page(existing_page, data)
                 status_code = 200
-                action = "updated"
+                action = result.get('action', 'updated')
             else:
                 # Create new page
                 result = create_lab_equipment_page(data)
@@ -295,6 +109,7 @@ def create_or_update_lab_equipment(request):
             
             return JsonResponse({
                 'success': True,
+                'action': action,
                 'message': f'Lab equipment page {action} successfully',
                 'page_id': result['page_id'],
                 'page_slug': result['page_slug']
@@ -312,6 +127,196 @@ def create_or_update_lab_equipment(request):
             'error': f'An error occurred: {str(e)}'
         }, status=500)
 
+# Items per transaction in bulk requests; each item also runs in its own savepoint
+BULK_CHUNK_SIZE = 50
+BULK_MAX_CHUNK_SIZE = 500
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonlines')
+
+class BulkItemError(Exception):
+    """Raised inside an item's savepoint to roll back a product that failed to save"""
+
+def parse_bulk_items(request):
+    """
+    Parse the body of a bulk request into a list of (data, error) pairs.
+    
+    Accepts a JSON array of products, an object with an "items" array, or NDJSON
+    (one product per line). NDJSON lines that are not valid JSON become per-item
+    errors instead of failing the whole request.
+    
+    Raises ValueError if the body cannot be parsed at all.
+    """
+    body = request.body.decode('utf-8')
+    
+    if request.content_type not in NDJSON_CONTENT_TYPES:
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            # Not a single JSON document - try NDJSON below
+            payload = None
+        else:
+            if isinstance(payload, dict) and isinstance(payload.get('items'), list):
+                payload = payload['items']
+            elif isinstance(payload, dict):
+                payload = [payload]
+            if not isinstance(payload, list):
+                raise ValueError('Request body must be a JSON array, an object with an "items" array, or NDJSON')
+            return [(item, None) for item in payload]
+    
+    items = []
+    for line_number, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            items.append((json.loads(line), None))
+        except json.JSONDecodeError as e:
+            items.append((None, f'Invalid JSON on line {line_number}: {e.msg}'))
+    
+    if items and all(error for _, error in items):
+        raise ValueError('Invalid JSON format in request body')
+    return items
+
+def ingest_lab_equipment_batch(items, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Create or update lab equipment pages for a batch of products.
+    
+    The parent page, existing pages (by slug) and tags are looked up once for the
+    whole batch. Products are saved in transactions of chunk_size items, each in its
+    own savepoint, so a failing product is rolled back without affecting the others.
+    
+    Args:
+        items: List of (data, error) pairs as returned by parse_bulk_items();
+            items whose tags fail to resolve are marked with an error in place
+        chunk_size: Number of products per transaction
+    
+    Returns:
+        list: One result dict per item, in input order
+    """
+    slugs = {data['slug'] for data, error in items
+             if error is None and isinstance(data, dict) and data.get('slug')}
+    existing_pages = {}
+    for page in LabEquipmentPage.objects.filter(slug__in=slugs).order_by('id'):
+        existing_pages.setdefault(page.slug, page)
+    
+    # Resolve tags for the whole batch up front, outside the item transactions as in
+    # create_or_update_lab_equipment, with one set of queries for all products
+    tagged = [index for index, (data, error) in enumerate(items)
+              if error is None and isinstance(data, dict) and data.get('tags')]
+    tag_ids = {}
+    try:
+        resolved = tag_resolver.resolve_many([items[index][0]['tags'] for index in tagged])
+        tag_ids = dict(zip(tagged, resolved))
+    except Exception as e:
+        logger.exception("Error processing tags for bulk request")
+        for index in tagged:
+            items[index] = (items[index][0], f'Error processing tags: {str(e)}')
+    
+    # Pages created earlier in this batch, by slug, in case a later item updates them
+    created_page_ids = {}
+    parent_page = None
+    
+    results = []
+    for start in range(0, len(items), chunk_size):
+        with transaction.atomic():
+            for index, (data, error) in enumerate(items[start:start + chunk_size], start=start):
+                result = {'index': index}
+                results.append(result)
+                
+                error = error or validate_lab_equipment_data(data)
+                if error:
+                    result.update(success=False, error=error)
+                    continue
+                
+                data = dict(data)
+                slug = data.get('slug')
+                if index in tag_ids:
+                    data['processed_tag_ids'] = tag_ids[index]
+                try:
+                    existing_page = existing_pages.get(slug) if slug else None
+                    if existing_page is None and slug in created_page_ids:
+                        existing_page = existing_pages[slug] = LabEquipmentPage.objects.get(id=created_page_ids[slug])
+                    
+                    with transaction.atomic():
+                        if existing_page:
+                            outcome = update_lab_equipment_page(existing_page, data)
+                            action = outcome.get('action', 'updated')
+                        else:
+                            if parent_page is None:
+                                parent_page = find_parent_page()
+                            outcome = create_lab_equipment_page(data, parent_page=parent_page)
+                            action = 'created'
+                        
+                        if not outcome['success']:
+                            raise BulkItemError(outcome['error'])
+                except BulkItemError as e:
+                    result.update(success=False, error=str(e))
+                    continue
+                except Exception as e:
+                    logger.exception(f"Error processing bulk item {index}")
+                    result.update(success=False, error=f'An error occurred: {str(e)}')
+                    continue
+                
+                if action == 'created':
+                    created_page_ids[outcome['page_slug']] = outcome['page_id']
+                result.update(
+                    success=True,
+                    action=action,
+                    page_id=outcome['page_id'],
+                    page_slug=outcome['page_slug']
+                )
+    
+    return results
+
+@csrf_exempt
+@token_required
+@require_http_methods(["POST"])
+def bulk_create_or_update_lab_equipment(request):
+    """
+    Create or update many lab equipment pages from a JSON array or NDJSON body
+    """
+    try:
+        items = parse_bulk_items(request)
+    except (UnicodeDecodeError, ValueError) as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+    
+    if not items:
+        return JsonResponse({
+            'success': False,
+            'error': 'No items in request body'
+        }, status=400)
+    
+    try:
+        chunk_size = int(request.GET.get('chunk_size', BULK_CHUNK_SIZE))
+    except ValueError:
+        chunk_size = BULK_CHUNK_SIZE
+    chunk_size = max(1, min(chunk_size, BULK_MAX_CHUNK_SIZE))
+    
+    try:
+        results = ingest_lab_equipment_batch(items, chunk_size=chunk_size)
+    except Exception as e:
+        logger.exception("Error processing bulk lab equipment data")
+        return JsonResponse({
+            'success': False,
+            'error': f'An error occurred: {str(e)}'
+        }, status=500)
+    
+    created = sum(1 for r in results if r.get('action') == 'created')
+    updated = sum(1 for r in results if r.get('action') == 'updated')
+    unchanged = sum(1 for r in results if r.get('action') == 'unchanged')
+    failed = sum(1 for r in results if not r['success'])
+    
+    return JsonResponse({
+        'success': failed == 0,
+        'total': len(results),
+        'created': created,
+        'updated': updated,
+        'unchanged': unchanged,
+        'failed': failed,
+        'results': results
+    })
+
 @csrf_exempt
 @token_required
 @require_http_methods(["POST"])
@@ -432,25 +437,33 @@ def evaluate_data_quality(data):
     
     return quality_metrics
 
-def create_lab_equipment_page(data):
+def find_parent_page():
+    """
+    Find the page new lab equipment pages are added under:
+    the first live MultiProductPage, or the site root if there is none
+    """
+    from .models import MultiProductPage
+    parent_page = MultiProductPage.objects.live().first()
+    if parent_page is None:
+        from wagtail.models import Site
+        parent_page = Site.objects.first().root_page
+    return parent_page
+
+def create_lab_equipment_page(data, parent_page=None):
     """
     Create a new lab equipment page from the provided data
+
+    Child objects are written in a fixed number of queries. Publishing (is_published)
+    is not: Wagtail rebuilds the page and every child object from the revision and
+    saves them one by one, so its cost grows with the number of specs and models.
+    
+    Args:
+        data: The product data
+        parent_page: The page to add it under; looked up with find_parent_page() if not given
     """
     try:
-        # Find the parent page - assuming the first MultiProductPage as parent
-        from wagtail.models import Site
-        site = Site.objects.first()
-        root_page = site.root_page
-        
-        # Try to find a MultiProductPage to use as parent
-        from .models import MultiProductPage
-        parent_pages = MultiProductPage.objects.live()
-        
-        if not parent_pages.exists():
-            # Fallback to the root page if no MultiProductPage exists
-            parent_page = root_page
-        else:
-            parent_page = parent_pages.first()
+        if parent_page is None:
+            parent_page = find_parent_page()
             
         # Evaluate data quality if not already provided
         quality_metrics = evaluate_data_quality(data)
@@ -509,6 +522,7 @@ def create_lab_equipment_page(data):
             add_gallery_images(page, data['images'])
         
         # Final save - make sure to NOT publish
+        prefetch_child_objects(page)
         rev = page.save_revision()
         if is_published:
             rev.publish()
@@ -517,6 +531,8 @@ def create_lab_equipment_page(data):
             if page.live:
                 page.live = False
                 page.save()
+
+        record_import(page, content_fingerprint(data))
         
         return {
             'success': True,
@@ -534,118 +550,85 @@ def create_lab_equipment_page(data):
 def update_lab_equipment_page(page, data):
     """
     Update an existing lab equipment page with the provided data
+
+    Re-imports usually send identical data, so the page is left untouched when the
+    content fingerprint of the payload matches the one stored on the last import and
+    the page has not been saved, published or unpublished since (see record_import).
+    Otherwise only the fields and child rows that differ are written, and a single
+    revision is saved if anything changed.
+
+    Whatever changed, the page ends up live if the payload is published and as a
+    draft otherwise. The payload is compared with the page's live fields: a draft
+    saved in the admin is replaced when the payload changes the page or publishes
+    it, and kept otherwise.
+
+    Returns:
+        dict: success, page_id, page_slug and action ('updated' or 'unchanged'),
+              or success and error
     """
     try:
-        # Evaluate data quality if not already provided
-        quality_metrics = evaluate_data_quality(data)
-        
-        # Update basic fields
-        if 'title' in data:
-            page.title = data['title']
-        
-        if 'short_description' in data:
-            page.short_description = data['short_description']
-        
-        if 'full_description' in data:
-            # Fix any HTML issues in the full description
-            fixed_description = fix_rich_text_html(data['full_description'])
-            page.full_description = fixed_description
-            
-        if 'source_url' in data:
-            page.source_url = data['source_url']
-            
-        # Update quality fields
-        if 'source_type' in data:
-            page.source_type = data['source_type']
-        else:
-            page.source_type = quality_metrics['source_type']
-            
-        if 'data_completeness' in data:
-            page.data_completeness = data['data_completeness']
-        else:
-            page.data_completeness = quality_metrics['data_completeness']
-            
-        if 'specification_confidence' in data:
-            page.specification_confidence = data['specification_confidence']
-        else:
-            page.specification_confidence = quality_metrics['specification_confidence']
-            
-        if 'needs_review' in data:
-            page.needs_review = data['needs_review']
-        else:
-            page.needs_review = quality_metrics['needs_review']
-
-        # Set the page as draft (not live) unless explicitly requested to publish
+        fingerprint = content_fingerprint(data)
         is_published = data.get('is_published', False)
-        if not is_published:
-            page.live = False
-            
-        # Save the page
-        rev = page.save_revision()
-        
-        # Check if we should publish or keep as draft
-        # Default to draft for AI-created pages (only publish if explicitly requested)
-        if is_published:
-            rev.publish()
-        
+
+        result = {
+            'success': True,
+            'action': 'unchanged',
+            'page_id': page.id,
+            'page_slug': page.slug
+        }
+
+        if page.content_fingerprint == imported_state(page, fingerprint):
+            return result
+
+        changed = update_page_fields(page, data)
+
         # Update categorized tags if provided
         if 'processed_tag_ids' in data and data['processed_tag_ids']:
-            from apps.categorized_tags.models import CategorizedTag
-            
-            # Clear existing tags first
-            page.categorized_tags.clear()
-            
-            # Get tags by pre-processed IDs
-            tags = CategorizedTag.objects.filter(id__in=data['processed_tag_ids'])
-            if tags.exists():
-                page.categorized_tags.add(*tags)
-                page.save()
-        
-        # Clear and re-add specifications
+            changed = sync_tags(page, data['processed_tag_ids']) or changed
+
+        diff = ChildObjectDiff()
+        prefetch_child_objects(page)
+
         if 'specifications' in data:
-            # Clear existing specs
-            for spec_group in page.spec_groups.all():
-                spec_group.delete()
-            
-            # Add new specs
-            if data['specifications']:
-                add_specifications(page, data['specifications'])
-        
-        # Clear and re-add models
+            diff.spec_groups(
+                page.spec_groups.all(),
+                data['specifications'] or [],
+                lambda name: LabEquipmentPageSpecGroup(LabEquipmentPage=page, name=name)
+            )
+
         if 'models' in data:
-            # Clear existing models
-            for model in page.models.all():
-                model.delete()
-            
-            # Add new models
-            if data['models']:
-                add_models(page, data['models'])
-        
-        # Clear and re-add images
+            diff.models(page, page.models.all(), data['models'] or [])
+
         if 'images' in data:
-            # Clear existing images
-            page.gallery_images.all().delete()
-            
-            # Add new images
-            if data['images']:
-                add_gallery_images(page, data['images'])
-        
-        # Final save - make sure it stays as a draft unless explicitly requested to publish
-        rev = page.save_revision()
-        if is_published:
-            rev.publish()
-        else:
-            # Double-check that the page is not live
-            if page.live:
-                page.live = False
-                page.save()
-        
-        return {
-            'success': True,
-            'page_id': page.id,
-            'page_slug': page.slug
-        }
-        
+            diff.gallery_images(page, page.gallery_images.all(), data['images'] or [])
+
+        changed = diff.apply() or changed
+
+        needs_publish = is_published and (not page.live or page.has_unpublished_changes)
+        needs_unpublish = not is_published and page.live
+        if not changed and not needs_publish and not needs_unpublish:
+            record_import(page, fingerprint)
+            return result
+
+        # Set the page as draft (not live) unless explicitly requested to publish
+        if not is_published:
+            page.live = False
+        page.save()
+
+        if changed or needs_publish:
+            # Save a single revision with the final state of the page
+            prefetch_child_objects(page)
+            rev = page.save_revision()
+
+            # Default to draft for AI-created pages (only publish if explicitly requested)
+            if is_published:
+                rev.publish()
+
+        record_import(page, fingerprint)
+
+        result['action'] = 'updated'
+        return result
+
     except Exception as e:
         logger.exception("Error updating lab equipment page")
         return {
@@ -653,111 +636,447 @@ def update_lab_equipment_page(page, data):
             'error': f'Error updating lab equipment page: {str(e)}'
         }
 
-def add_specifications(page, specifications):
-    """Add specification groups and specs to a page"""
-    for group_data in specifications:
+# Payload fields that make up the content fingerprint of a lab equipment page
+FINGERPRINT_FIELDS = (
+    'title', 'short_description', 'full_description', 'source_url', 'source_type',
+    'data_completeness', 'specification_confidence', 'needs_review', 'is_published',
+    'processed_tag_ids', 'specifications', 'models', 'images',
+)
+
+def content_fingerprint(data):
+    """
+    Compute a stable SHA-256 fingerprint of the page content in a payload.
+
+    Only the fields the import writes are included; tags are included as their
+    resolved IDs, in any order.
+    """
+    content = {key: data[key] for key in FINGERPRINT_FIELDS if key in data}
+    if content.get('processed_tag_ids'):
+        content['processed_tag_ids'] = sorted(set(content['processed_tag_ids']))
+    serialized = json.dumps(content, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+def imported_state(page, fingerprint):
+    """
+    Combine the content fingerprint of a payload with the revision and publishing state of the page.
+
+    Saving a revision, publishing or unpublishing the page outside the importer
+    changes the result, so an edit made in the admin is never mistaken for the
+    imported content.
+    """
+    state = f'{fingerprint}:{page.latest_revision_id}:{page.live}:{page.has_unpublished_changes}'
+    return hashlib.sha256(state.encode('utf-8')).hexdigest()
+
+def record_import(page, fingerprint):
+    """
+    Store the imported state of a page once the import has saved and published it.
+
+    The state is read back from the database, as publishing saves a copy of the page
+    rather than page itself, and written with an update so no revision records it.
+
+    Args:
+        page: The imported LabEquipmentPage
+        fingerprint: content_fingerprint() of the payload
+    """
+    page.refresh_from_db(fields=['latest_revision', 'live', 'has_unpublished_changes'])
+    page.content_fingerprint = imported_state(page, fingerprint)
+    LabEquipmentPage.objects.filter(pk=page.pk).update(content_fingerprint=page.content_fingerprint)
+
+def update_page_fields(page, data):
+    """
+    Set the page fields from the payload.
+
+    Returns:
+        bool: True if any field changed
+    """
+    # Evaluate data quality if not already provided
+    quality_metrics = evaluate_data_quality(data)
+
+    values = {}
+    for field in ('title', 'short_description', 'source_url'):
+        if field in data:
+            values[field] = data[field]
+
+    if 'full_description' in data:
+        # Fix any HTML issues in the full description
+        values['full_description'] = fix_rich_text_html(data['full_description'])
+
+    # Update quality fields
+    for field in ('source_type', 'data_completeness', 'specification_confidence', 'needs_review'):
+        values[field] = data[field] if field in data else quality_metrics[field]
+
+    changed = False
+    for field, value in values.items():
+        if getattr(page, field) != value:
+            setattr(page, field, value)
+            changed = True
+    return changed
+
+def sync_tags(page, tag_ids):
+    """
+    Make the page's categorized tags exactly tag_ids, adding and removing only the differences.
+
+    Returns:
+        bool: True if the tags changed
+    """
+    current = set(
+        CategorizedPageTag.objects.filter(content_object_id=page.pk).values_list('tag_id', flat=True)
+    )
+    wanted = set(tag_ids)
+    if current == wanted:
+        return False
+
+    if current - wanted:
+        CategorizedPageTag.objects.filter(content_object_id=page.pk, tag_id__in=current - wanted).delete()
+    CategorizedPageTag.objects.bulk_create(
+        [CategorizedPageTag(content_object_id=page.pk, tag_id=tag_id) for tag_id in wanted - current]
+    )
+    return True
+
+class ChildObjectDiff:
+    """
+    Collects the inserts, updates and deletes that turn a page's stored child objects
+    into the ones in a payload, and applies them with a fixed number of queries.
+
+    Spec groups are matched by name and specs by key within their group, models by
+    name and gallery images by URL; rows that match are only updated if a value
+    differs.
+    """
+
+    def __init__(self):
+        self.new_groups = []
+        self.stale_group_ids = []
+        self.new_specs = []
+        self.changed_specs = []
+        self.stale_spec_ids = []
+        self.new_models = []
+        self.stale_model_ids = []
+        self.new_images = []
+        self.changed_images = []
+        self.stale_image_ids = []
+
+    def spec_groups(self, existing_groups, groups_data, make_group, context=''):
+        """
+        Diff the stored spec groups of a page or model against groups_data.
+
+        Args:
+            existing_groups: The stored spec groups, with their specs prefetched
+            groups_data: Spec groups from the payload
+            make_group: Callable returning an unsaved spec group with the given name
+            context: Description used when logging skipped groups and specs
+        """
+        available = {}
+        for group in existing_groups:
+            available.setdefault(group.name, []).append(group)
+
+        for name, specs in spec_group_rows(groups_data, context):
+            if not available.get(name):
+                self.new_groups.append((make_group(name), specs))
+                continue
+
+            group = available[name].pop(0)
+            stored_specs = {}
+            for spec in group.specs.all():
+                stored_specs.setdefault(spec.key, []).append(spec)
+
+            for key, value in specs:
+                if stored_specs.get(key):
+                    spec = stored_specs[key].pop(0)
+                    if spec.value != value:
+                        spec.value = value
+                        self.changed_specs.append(spec)
+                else:
+                    self.new_specs.append(Spec(spec_group_id=group.pk, key=key, value=value))
+
+            self.stale_spec_ids.extend(spec.pk for remaining in stored_specs.values() for spec in remaining)
+
+        self.stale_group_ids.extend(group.pk for remaining in available.values() for group in remaining)
+
+    def models(self, page, existing_models, models_data):
+        """Diff the stored equipment models of a page, and their spec groups, against models_data."""
+        available = {}
+        for equipment_model in existing_models:
+            available.setdefault(equipment_model.name, []).append(equipment_model)
+
+        for i, model_data in enumerate(models_data):
+            if 'name' not in model_data:
+                logger.warning(f"Skipping model {i+1} because it has no name")
+                continue
+
+            if available.get(model_data['name']):
+                equipment_model = available[model_data['name']].pop(0)
+            else:
+                equipment_model = EquipmentModel(page=page, name=model_data['name'])
+                self.new_models.append(equipment_model)
+
+            self.spec_groups(
+                equipment_model.spec_groups.all() if equipment_model.pk else [],
+                model_data.get('specifications') or [],
+                lambda name, equipment_model=equipment_model: EquipmentModelSpecGroup(
+                    equipment_model=equipment_model, name=name
+                ),
+                f"model {model_data['name']}"
+            )
+
+        for remaining in available.values():
+            for equipment_model in remaining:
+                self.stale_model_ids.append(equipment_model.pk)
+                self.stale_group_ids.extend(group.pk for group in equipment_model.spec_groups.all())
+
+    def gallery_images(self, page, existing_images, images):
+        """Diff the stored gallery images of a page against the images in the payload."""
+        available = {}
+        for gallery_image in existing_images:
+            available.setdefault(gallery_image.external_image_url, []).append(gallery_image)
+
+        for sort_order, url in enumerate(gallery_image_urls(images)):
+            if available.get(url):
+                gallery_image = available[url].pop(0)
+                if gallery_image.sort_order != sort_order:
+                    gallery_image.sort_order = sort_order
+                    self.changed_images.append(gallery_image)
+            else:
+                self.new_images.append(LabEquipmentGalleryImage(page=page, external_image_url=url, sort_order=sort_order))
+
+        self.stale_image_ids.extend(image.pk for remaining in available.values() for image in remaining)
+
+    @property
+    def changed(self):
+        return any((
+            self.new_groups, self.stale_group_ids, self.new_specs, self.changed_specs,
+            self.stale_spec_ids, self.new_models, self.stale_model_ids, self.new_images,
+            self.changed_images, self.stale_image_ids,
+        ))
+
+    def apply(self):
+        """
+        Write the collected changes.
+
+        Returns:
+            bool: True if anything changed
+        """
+        if not self.changed:
+            return False
+
+        if self.stale_spec_ids:
+            Spec.objects.filter(pk__in=self.stale_spec_ids).delete()
+        if self.stale_group_ids:
+            delete_spec_groups(SpecGroup.objects.filter(pk__in=self.stale_group_ids))
+        if self.stale_model_ids:
+            # Their spec groups are among the stale groups deleted above
+            EquipmentModel.objects.filter(pk__in=self.stale_model_ids).delete()
+        if self.stale_image_ids:
+            # References of child objects are recorded under the page and rebuilt when it is
+            # saved; Wagtail's per-object cleanup on delete would take a query per image
+            with disable_reference_index_auto_update():
+                LabEquipmentGalleryImage.objects.filter(pk__in=self.stale_image_ids).delete()
+
+        if self.changed_specs:
+            Spec.objects.bulk_update(self.changed_specs, ['value'])
+        if self.changed_images:
+            LabEquipmentGalleryImage.objects.bulk_update(self.changed_images, ['sort_order'])
+
+        if self.new_models:
+            EquipmentModel.objects.bulk_create(self.new_models)
+            for group, _ in self.new_groups:
+                # Point the groups of new models at the IDs assigned above
+                if isinstance(group, EquipmentModelSpecGroup) and group.equipment_model_id is None:
+                    group.equipment_model_id = group.equipment_model.pk
+        Spec.objects.bulk_create(self.new_specs)
+        bulk_create_spec_groups(self.new_groups)
+        LabEquipmentGalleryImage.objects.bulk_create(self.new_images)
+        return True
+
+# Rows per INSERT when bulk-creating child objects
+BULK_BATCH_SIZE = 500
+
+# Child objects serialized into page revisions
+CHILD_OBJECT_PREFETCH = ('spec_groups__specs', 'models__spec_groups__specs', 'gallery_images', 'features')
+
+def prefetch_child_objects(page):
+    """
+    (Re)load the child objects of a page with one query per relation.
+
+    Revisions serialize the whole child object tree, which otherwise takes a query
+    per spec group and model. Any previously prefetched (possibly stale) objects are
+    discarded.
+    """
+    page._prefetched_objects_cache = {}
+    prefetch_related_objects([page], *CHILD_OBJECT_PREFETCH)
+
+def spec_group_rows(groups_data, context=''):
+    """
+    Yield (name, [(key, value), ...]) for the valid spec groups in groups_data.
+
+    Groups without a name or specs, and specs without a key or value, are skipped.
+    """
+    for group_data in groups_data:
         if 'name' not in group_data or 'specs' not in group_data:
+            if context:
+                logger.warning(f"Skipping spec group in {context} - missing name or specs")
             continue
-            
-        # Create spec group
-        spec_group = LabEquipmentPageSpecGroup.objects.create(
-            LabEquipmentPage=page,
-            name=group_data['name']
-        )
-        
-        # Add specs to the group
+
+        specs = []
         for spec_data in group_data['specs']:
             if 'key' not in spec_data or 'value' not in spec_data:
+                if context:
+                    logger.warning(f"Skipping spec in group {group_data['name']} - missing key or value")
                 continue
-                
-            Spec.objects.create(
-                spec_group=spec_group,
-                key=spec_data['key'],
-                value=spec_data['value']
-            )
+            specs.append((spec_data['key'], spec_data['value']))
+        yield group_data['name'], specs
+
+def bulk_create_spec_groups(groups):
+    """
+    Insert spec groups with their specs using a fixed number of queries.
+
+    The spec group models use multi-table inheritance, which bulk_create() does not
+    support, so the SpecGroup rows are bulk-created first and the rows of the
+    subclass tables are then inserted with the parent IDs, one executemany() per
+    batch. This relies on the database returning IDs from bulk inserts
+    (PostgreSQL, SQLite 3.35+).
+
+    Args:
+        groups: List of (spec group instance, [(key, value), ...]) pairs; the
+                instances are unsaved EquipmentModelSpecGroup or
+                LabEquipmentPageSpecGroup objects
+
+    Returns:
+        int: Number of specs created
+    """
+    if not groups:
+        return 0
+
+    parents = SpecGroup.objects.bulk_create(
+        [SpecGroup(name=group.name) for group, _ in groups], batch_size=BULK_BATCH_SIZE)
+
+    by_model = {}
+    for (group, _), parent in zip(groups, parents):
+        group.pk = group.id = parent.pk
+        by_model.setdefault(type(group), []).append(group)
+
+    for model, instances in by_model.items():
+        insert_subclass_rows(model, instances)
+
+    specs = [
+        Spec(spec_group_id=group.pk, key=key, value=value)
+        for group, group_specs in groups
+        for key, value in group_specs
+    ]
+    Spec.objects.bulk_create(specs, batch_size=BULK_BATCH_SIZE)
+    return len(specs)
+
+def insert_subclass_rows(model, instances):
+    """
+    Insert the rows of a multi-table inherited model whose parent rows already exist.
+
+    This is raw SQL, not a public ORM API: QuerySet.bulk_create() rejects
+    multi-table inherited models, through any manager, and saving the instances one
+    by one costs a query per row. The values are prepared by the model fields, as
+    bulk_create() would do.
+
+    Args:
+        model: The subclass model
+        instances: Unsaved instances with their parent link set
+    """
+    fields = model._meta.local_concrete_fields
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = f'INSERT INTO {table} ({columns}) VALUES ({placeholders})'
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(instances), BULK_BATCH_SIZE):
+            batch = instances[start:start + BULK_BATCH_SIZE]
+            cursor.executemany(sql, [
+                [field.get_db_prep_save(field.pre_save(instance, True), connection) for field in fields]
+                for instance in batch
+            ])
+
+    for instance in instances:
+        instance._state.adding = False
+        instance._state.db = connection.alias
+
+def delete_spec_groups(spec_groups):
+    """
+    Delete a queryset of spec groups with their specs using a fixed number of queries.
+
+    Groups are deleted through their subclass models. Deleting SpecGroup rows would
+    have the deletion collector load the subclass rows with only their keys and
+    then fetch the SpecGroup row of each one separately.
+
+    Args:
+        spec_groups: Queryset of SpecGroup or of one of its subclasses
+    """
+    group_ids = list(spec_groups.values_list('pk', flat=True))
+    if not group_ids:
+        return
+    for model in (LabEquipmentPageSpecGroup, EquipmentModelSpecGroup):
+        model.objects.filter(pk__in=group_ids).delete()
+
+def add_specifications(page, specifications):
+    """Add specification groups and specs to a page"""
+    groups = [
+        (LabEquipmentPageSpecGroup(LabEquipmentPage=page, name=name), specs)
+        for name, specs in spec_group_rows(specifications)
+    ]
+    bulk_create_spec_groups(groups)
 
 def add_models(page, models_data):
-    """Add equipment models to a page"""
+    """Add equipment models, with their specification groups, to a page"""
     logger.info(f"Adding {len(models_data)} models to page '{page.title}' (ID: {page.id})")
-    models_created = 0
-    
+
+    models = []
     for i, model_data in enumerate(models_data):
-        model_name = model_data.get('name', f'[No name {i}]')
-        logger.info(f"Processing model {i+1}: {model_name}")
-        
         if 'name' not in model_data:
             logger.warning(f"Skipping model {i+1} because it has no name")
             continue
-            
-        # Create model
-        try:
-            equipment_model = EquipmentModel.objects.create(
-                page=page,
-                name=model_data['name']
-            )
-            models_created += 1
-            logger.info(f"Created equipment model: {model_data['name']}")
-            
-            # Add specifications if provided
-            if 'specifications' in model_data and model_data['specifications']:
-                spec_groups_created = 0
-                
-                for group_data in model_data['specifications']:
-                    if 'name' not in group_data or 'specs' not in group_data:
-                        logger.warning(f"Skipping spec group in model {model_data['name']} - missing name or specs")
-                        continue
-                        
-                    # Create spec group
-                    spec_group = EquipmentModelSpecGroup.objects.create(
-                        equipment_model=equipment_model,
-                        name=group_data['name']
-                    )
-                    spec_groups_created += 1
-                    
-                    # Add specs to the group
-                    specs_created = 0
-                    for spec_data in group_data['specs']:
-                        if 'key' not in spec_data or 'value' not in spec_data:
-                            logger.warning(f"Skipping spec in group {group_data['name']} - missing key or value")
-                            continue
-                            
-                        Spec.objects.create(
-                            spec_group=spec_group,
-                            key=spec_data['key'],
-                            value=spec_data['value']
-                        )
-                        specs_created += 1
-                    
-                    logger.debug(f"Added {specs_created} specs to group '{group_data['name']}' for model '{model_data['name']}'")
-                
-                logger.info(f"Added {spec_groups_created} specification groups to model '{model_data['name']}'")
-            else:
-                logger.debug(f"No specifications provided for model '{model_data['name']}'")
-        except Exception as e:
-            logger.error(f"Error creating model '{model_data['name']}': {str(e)}")
-    
-    logger.info(f"Created {models_created} models for page '{page.title}' (ID: {page.id})")
-    return models_created
+        models.append((EquipmentModel(page=page, name=model_data['name']), model_data))
 
-def add_gallery_images(page, images):
-    """Add gallery images to a page"""
+    if not models:
+        logger.info(f"Created 0 models for page '{page.title}' (ID: {page.id})")
+        return 0
+
+    EquipmentModel.objects.bulk_create([equipment_model for equipment_model, _ in models])
+
+    groups = []
+    for equipment_model, model_data in models:
+        if model_data.get('specifications'):
+            model_groups = [
+                (EquipmentModelSpecGroup(equipment_model=equipment_model, name=name), specs)
+                for name, specs in spec_group_rows(model_data['specifications'], f"model {model_data['name']}")
+            ]
+            logger.debug(f"Adding {len(model_groups)} specification groups to model '{model_data['name']}'")
+            groups.extend(model_groups)
+        else:
+            logger.debug(f"No specifications provided for model '{model_data['name']}'")
+
+    specs_created = bulk_create_spec_groups(groups)
+
+    logger.info(
+        f"Created {len(models)} models with {len(groups)} specification groups and {specs_created} specs "
+        f"for page '{page.title}' (ID: {page.id})"
+    )
+    return len(models)
+
+def gallery_image_urls(images):
+    """Return the external image URLs in the images of a payload, in order"""
+    urls = []
     for image_data in images:
         # Check if it's an external URL
         if isinstance(image_data, str):
             # It's a URL string
-            LabEquipmentGalleryImage.objects.create(
-                page=page,
-                external_image_url=image_data
-            )
+            urls.append(image_data)
         elif isinstance(image_data, dict):
-            # It's a dict with either internal_image or external_image_url
-            gallery_image = LabEquipmentGalleryImage(page=page)
-            
-            if 'internal_image' in image_data and image_data['internal_image']:
-                # This requires handling the image upload separately
-                # For now, we'll skip internal images in the API
-                pass
-            
+            # It's a dict with either internal_image or external_image_url.
+            # Internal images require handling the image upload separately,
+            # so for now they are skipped in the API
             if 'external_image_url' in image_data and image_data['external_image_url']:
-                gallery_image.external_image_url = image_data['external_image_url']
-                gallery_image.save() 
\ No newline at end of file
+                urls.append(image_data['external_image_url'])
+    return urls
+
+def add_gallery_images(page, images):
+    """Add gallery images to a page"""
+    LabEquipmentGalleryImage.objects.bulk_create([
+        LabEquipmentGalleryImage(page=page, external_image_url=url, sort_order=sort_order)
+        for sort_order, url in enumerate(gallery_image_urls(images))
+    ])
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class BaseSiteConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.base_site'
+
+    def ready(self):
+        # Connect the signal receivers that invalidate cached product pages
+        from . import page_cache  # noqa: F401
@@ -14,7 +14,21 @@ class Migration(migrations.Migration):
     dependencies = [
         ('wagtailcore', '0094_alter_page_locale'),
         ('wagtailimages', '0027_image_description'),
+    ]
 
+    operations = [
+        migrations.CreateModel(
+            name='BasicPage',
+            fields=[
+                ('page_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='wagtailcore.page')),
+                ('intro', models.CharField(max_length=250)),
+                ('body', wagtail.fields.RichTextField(blank=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+            bases=('wagtailcore.page',),
+        ),
         migrations.CreateModel(
             name='CartPage',
             fields=[
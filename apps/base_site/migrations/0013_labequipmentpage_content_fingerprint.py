@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base_site', '0012_remove_equipmentmodel_model_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labequipmentpage',
+            name='content_fingerprint',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 of the last imported payload and the page state it left, used to skip unchanged re-imports', max_length=64),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils.functional import cached_property
 
 from wagtail.models import Page, Orderable, ClusterableModel
 from wagtail.admin.panels import FieldRowPanel, FieldPanel, InlinePanel
@@ -10,6 +11,9 @@ from modelcluster.contrib.taggit import ClusterTaggableManager
 from apps.categorized_tags.models import CategorizedPageTag
 from apps.categorized_tags.forms import CategoryTagForm
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from .product_cards import prefetch_product_cards
+from .page_cache import fragment_cache_context, serve_cached
+from .spec_sheets import load_spec_sheet, merge_spec_groups
 import uuid
 
 
@@ -226,6 +230,9 @@ class MultiProductPage(Page):
         except EmptyPage:
             equipment_pages = paginator.page(paginator.num_pages)
         
+        # Load the images and tags of the listed products in bulk
+        equipment_pages.object_list = prefetch_product_cards(equipment_pages.object_list)
+        
         context['search_results'] = equipment_pages
         
         # Pass a flag to indicate these are not search results
@@ -320,11 +327,12 @@ class EquipmentModel(ClusterableModel):
         InlinePanel('spec_groups', label="Specification Groups"),
     ]
 
-    @property
+    @cached_property
     def merged_spec_groups(self):
         """
         Returns the merged spec groups for this model (default specs overridden
         by model-specific specs). This calls LabEquipmentPage.get_effective_spec_groups.
+        The detail page sets it for all models at once with load_spec_sheet().
         """
         return self.page.get_effective_spec_groups(self)
 
@@ -430,10 +438,25 @@ class LabEquipmentPage(Page):
         help_text="Flag indicating this listing needs manual review"
     )
 
+    content_fingerprint = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text="SHA-256 of the last imported payload and the page state it left, used to skip unchanged re-imports"
+    )
+
     # This field will store our custom tags
     # tags = ClusterTaggableManager(through=CategoryPageTag, blank=True)
     categorized_tags = ClusterTaggableManager(through=CategorizedPageTag, blank=True)
 
+    # Used by the admin's page search. The public search goes through
+    # apps.search.fulltext, which also covers tags, models, specs and features;
+    # indexing those here too would cost queries on every save for no reader
+    search_fields = Page.search_fields + [
+        index.SearchField('short_description'),
+        index.SearchField('full_description'),
+    ]
+
     content_panels = Page.content_panels + [
         FieldPanel('short_description', classname="full"),
         FieldPanel('full_description', classname="full"),
@@ -461,13 +484,17 @@ class LabEquipmentPage(Page):
         verbose_name = "Lab Equipment Page"
 
     def main_image(self):
-        gallery_item = self.gallery_images.first()
+        # Listings load the first gallery image of their pages with prefetch_product_cards()
+        if hasattr(self, 'card_gallery_images'):
+            gallery_item = self.card_gallery_images[0] if self.card_gallery_images else None
+        else:
+            gallery_item = self.gallery_images.first()
         if gallery_item:
             return gallery_item.get_image_url
         else:
             return None
 
-    @property
+    @cached_property
     def spec_group_names(self):
         spec_group_names = set()
         for model in self.models.all():
@@ -483,28 +510,27 @@ class LabEquipmentPage(Page):
         If an equipment_model is passed, then any spec group in that model overrides the default.
         Otherwise, just the page-level spec groups are returned.
         """
-        effective = {}
-
-        # Gather all shared spec groups
-        for group in self.spec_groups.all():
-            effective[group.name] = {
-                'name': group.name,
-                'specs': list(group.specs.all())
-            }
-
-        # If a model is provided, override or add spec groups.
-        if equipment_model:
-            for group in equipment_model.spec_groups.all():
-                if group.name in effective:
-                    effective[group.name]['specs'] += list(group.specs.all())
-                else:
-                    effective[group.name] = {
-                        'name': group.name,
-                        'specs': list(group.specs.all())
-                       }
-
-        # Return as a list – you can sort by name or leave unsorted.
-        return sorted(effective.values(), key=lambda x: x['name'])
+        model_groups = equipment_model.spec_groups.all() if equipment_model else ()
+        return merge_spec_groups(self.spec_groups.all(), model_groups)
+
+    @cached_property
+    def spec_sheet_models(self):
+        """
+        The models of the page, with their merged_spec_groups and the page's
+        spec_group_names loaded once, in a fixed number of queries, by load_spec_sheet().
+        Loaded on first use, so cached specification fragments cost no queries.
+        """
+        load_spec_sheet(self)
+        return list(self.models.all())
+
+    def get_context(self, request, *args, **kwargs):
+        context = super().get_context(request, *args, **kwargs)
+        context.update(fragment_cache_context(self, request))
+        return context
+
+    def serve(self, request, *args, **kwargs):
+        # Anonymous visitors share cached renders; see apps/base_site/page_cache.py
+        return serve_cached(self, request, lambda: super(LabEquipmentPage, self).serve(request, *args, **kwargs))
 
 class LabEquipmentAccessory(ClusterableModel):
     page = ParentalManyToManyField(
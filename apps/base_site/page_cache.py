@@ -0,0 +1,162 @@
+"""
+Caching of rendered lab equipment pages.
+
+The catalogue is read-mostly: product pages only change when they are imported or
+published, and their tag chips when a tag or category changes. Rendered output is
+kept in the 'pages' cache (see CACHES in config/settings/base.py) for
+PAGE_CACHE_TTL seconds:
+
+- Whole pages, for anonymous GET requests without a session (a session may hold a
+  quote cart, whose count is shown in the header). Keys hold a version of the page
+  that changes when it is published or unpublished.
+- Fragments of the page template (gallery, tag chips and specifications), for every
+  other request. Keys hold the page's live revision.
+
+Both keys also hold a version of the tags, which changes when a tag is changed or
+deleted and when a tag category is saved or deleted. Versions change once the
+transaction commits, and are random tokens rather than counters, so a version
+evicted from the cache can never bring back older entries. With the 'locmem'
+backend each process has its own cache and only sees the invalidations made in it,
+so PAGE_CACHE_TTL defaults to one minute there; use 'filesystem' (or a shared
+backend) when serving from several processes.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from wagtail.signals import page_published, page_unpublished
+
+from apps.categorized_tags.models import CategorizedTag, TagCategory
+
+CACHE_ALIAS = 'pages'
+DEFAULT_TTL = 24 * 60 * 60
+
+TAGS_VERSION_KEY = 'page_cache:tags_version'
+PAGE_VERSION_KEY = 'page_cache:page_version:{page_id}'
+
+
+def page_cache():
+    return caches[CACHE_ALIAS]
+
+
+def cache_ttl():
+    return getattr(settings, 'PAGE_CACHE_TTL', DEFAULT_TTL)
+
+
+def _version(key):
+    version = page_cache().get(key)
+    if version is None:
+        page_cache().add(key, uuid.uuid4().hex, None)
+        version = page_cache().get(key)
+    return version
+
+
+def _bump_version(key):
+    transaction.on_commit(lambda: page_cache().set(key, uuid.uuid4().hex, None))
+
+
+def tags_version():
+    return _version(TAGS_VERSION_KEY)
+
+
+def page_version(page_id):
+    return _version(PAGE_VERSION_KEY.format(page_id=page_id))
+
+
+def is_preview(request):
+    return getattr(request, 'is_preview', False)
+
+
+def fragment_cache_context(page, request):
+    """
+    Template variables of the fragment cache of a page.
+
+    Returns:
+        dict: fragment_cache_timeout and fragment_cache_version, for
+              {% cache fragment_cache_timeout <name> page.pk fragment_cache_version using="pages" %}.
+              Previews are never cached.
+    """
+    if is_preview(request):
+        return {'fragment_cache_timeout': 0, 'fragment_cache_version': 'preview'}
+    return {
+        'fragment_cache_timeout': cache_ttl(),
+        'fragment_cache_version': f'{page.live_revision_id}.{tags_version()}',
+    }
+
+
+def is_cacheable(request):
+    """Whether the whole response to request may be cached and shared."""
+    return (
+        request.method in ('GET', 'HEAD')
+        and not is_preview(request)
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and not request.user.is_authenticated
+    )
+
+
+def page_cache_key(page, request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page_cache:page:{page.pk}:{page_version(page.pk)}:{tags_version()}:{path}'
+
+
+def serve_cached(page, request, serve):
+    """
+    Serve a page from the cache, or with serve() and cache the response.
+
+    Args:
+        page: The page being served
+        request: The request
+        serve: Callable rendering the response
+
+    Returns:
+        HttpResponse: The cached or rendered response
+    """
+    if not is_cacheable(request):
+        return serve()
+
+    key = page_cache_key(page, request)
+    cached = page_cache().get(key)
+    if cached is not None:
+        return cached
+
+    response = serve()
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    # Responses that set cookies belong to one visitor. The whole response is
+    # pickled, as by Django's cache middleware, so hits keep its headers
+    if response.status_code == 200 and not response.cookies and not response.streaming:
+        page_cache().set(key, response, cache_ttl())
+    return response
+
+
+def invalidate_page(page_id):
+    _bump_version(PAGE_VERSION_KEY.format(page_id=page_id))
+
+
+def invalidate_tags():
+    _bump_version(TAGS_VERSION_KEY)
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def _invalidate_published_page(sender, instance, **kwargs):
+    invalidate_page(instance.pk)
+
+
+@receiver(post_save, sender=CategorizedTag)
+def _invalidate_changed_tag(sender, instance, created, **kwargs):
+    # A new tag is on no page yet; pages that get it are published again
+    if not created:
+        invalidate_tags()
+
+
+@receiver(post_delete, sender=CategorizedTag)
+@receiver(post_save, sender=TagCategory)
+@receiver(post_delete, sender=TagCategory)
+def _invalidate_tags(sender, **kwargs):
+    invalidate_tags()
@@ -0,0 +1,81 @@
+"""
+Batched loading of what product cards render.
+
+A product card in a listing shows the page's first gallery image and its first
+three categorized tags in their category colors. Loaded card by card, that costs a
+gallery query, image and rendition queries, a tag query and a category query per
+tag for every result. prefetch_product_cards loads them for a whole page of results
+in a fixed number of queries.
+"""
+
+from django.db.models import F, Prefetch, Window, prefetch_related_objects
+from django.db.models.functions import RowNumber
+from wagtail.images import get_image_model
+
+from apps.categorized_tags.models import CategorizedPageTag, TagCategory
+
+CARD_IMAGE_FILTER = 'fill-800x600'
+CARD_TAG_COUNT = 3
+DEFAULT_CATEGORY_COLOR = "hsl(0, 0%, 90%)"
+
+
+def first_per_page(queryset, page_field, count, order_by):
+    """
+    Limit queryset to the first count rows of each page.
+
+    Parental relations cannot prefetch sliced querysets, so the rows are numbered
+    per page with a window function instead.
+    """
+    return queryset.annotate(
+        position_in_page=Window(RowNumber(), partition_by=F(page_field), order_by=[F(field) for field in order_by])
+    ).filter(position_in_page__lte=count)
+
+
+def prefetch_product_cards(pages):
+    """
+    Load the card data of LabEquipmentPages in bulk.
+
+    Sets on each page:
+        card_gallery_images: a list holding its first gallery image, if any, with the
+            internal image and its card rendition loaded (used by main_image())
+        card_tags: its first CARD_TAG_COUNT tags, as {'name', 'category_color'} dicts
+
+    Args:
+        pages: LabEquipmentPages, e.g. the object list of a paginator page
+
+    Returns:
+        list: The pages
+    """
+    from .models import LabEquipmentGalleryImage
+
+    pages = list(pages)
+    if not pages:
+        return pages
+
+    prefetch_related_objects(
+        pages,
+        Prefetch(
+            'gallery_images',
+            queryset=first_per_page(LabEquipmentGalleryImage.objects.all(), 'page', 1, ['sort_order', 'id']),
+            to_attr='card_gallery_images',
+        ),
+        Prefetch(
+            'card_gallery_images__internal_image',
+            queryset=get_image_model().objects.prefetch_renditions(CARD_IMAGE_FILTER),
+        ),
+        Prefetch(
+            'categorized_tagged_items',
+            queryset=first_per_page(CategorizedPageTag.objects.select_related('tag'), 'content_object', CARD_TAG_COUNT,
+                                    ['id']),
+            to_attr='card_tagged_items',
+        ),
+    )
+
+    categories = {item.tag.category for page in pages for item in page.card_tagged_items}
+    colors = dict(TagCategory.objects.filter(name__in=categories).values_list('name', 'color')) if categories else {}
+    for page in pages:
+        page.card_tags = [
+            {'name': item.tag.name, 'category_color': colors.get(item.tag.category, DEFAULT_CATEGORY_COLOR)}
+            for item in page.card_tagged_items
+        ]
+    return pages
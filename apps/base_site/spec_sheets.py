@@ -0,0 +1,69 @@
+"""
+Loading of the specification sheet of a lab equipment page.
+
+The detail page shows, for every model, the page's spec groups merged with the
+model's own. Merged model by model through the related managers, that fetches the
+page groups, the model groups and the specs of every group again for each model,
+and spec_group_names does it all once more. load_spec_sheet fetches the groups and
+specs of the page and all its models in a fixed number of queries and merges the
+groups of every model once.
+"""
+
+from django.db.models import prefetch_related_objects
+
+
+def merge_spec_groups(page_groups, model_groups=()):
+    """
+    Merge the spec groups of a page with the spec groups of one of its models.
+
+    A model group adds its specs to the page group of the same name, or is added
+    as a group of its own.
+
+    Args:
+        page_groups: Spec groups of the page
+        model_groups: Spec groups of the model
+
+    Returns:
+        list: {'name', 'specs'} dicts sorted by name
+    """
+    effective = {}
+    for group in page_groups:
+        effective[group.name] = {'name': group.name, 'specs': list(group.specs.all())}
+
+    for group in model_groups:
+        if group.name in effective:
+            effective[group.name]['specs'] += list(group.specs.all())
+        else:
+            effective[group.name] = {'name': group.name, 'specs': list(group.specs.all())}
+
+    return sorted(effective.values(), key=lambda group: group['name'])
+
+
+def load_spec_sheet(page):
+    """
+    Load and merge the spec groups of a LabEquipmentPage and its models.
+
+    The page groups, models, model groups and specs are prefetched in five queries,
+    however many models and groups the page has. Pages holding unsaved child
+    objects, such as previews, are merged from memory instead.
+
+    Sets:
+        merged_spec_groups on every model of page.models.all()
+        spec_group_names on the page
+
+    Args:
+        page: LabEquipmentPage
+
+    Returns:
+        LabEquipmentPage: The page
+    """
+    if not getattr(page, '_cluster_related_objects', None):
+        prefetch_related_objects([page], 'spec_groups__specs', 'models__spec_groups__specs')
+
+    page_groups = list(page.spec_groups.all())
+    names = set()
+    for model in page.models.all():
+        model.merged_spec_groups = merge_spec_groups(page_groups, model.spec_groups.all())
+        names.update(group['name'] for group in model.merged_spec_groups)
+    page.spec_group_names = sorted(names)
+    return page
@@ -0,0 +1,442 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+
+from apps.categorized_tags.models import CategorizedTag
+from apps.categorized_tags.resolver import resolve_tag_ids
+from wagtail.models import Revision
+from wagtail.search.backends import get_search_backend
+
+from .api import create_lab_equipment_page, update_lab_equipment_page
+from .models import APIToken, LabEquipmentPage, SpecGroup, Spec
+from .page_cache import serve_cached
+from .spec_sheets import load_spec_sheet
+
+
+class BulkLabEquipmentAPITests(TestCase):
+
+    def setUp(self):
+        self.token = APIToken.objects.create(name='test')
+        self.url = reverse('api_lab_equipment_bulk')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {self.token.token}'}
+
+    def product(self, n, **extra):
+        data = {
+            'title': f'Spectrometer {n}',
+            'slug': f'spectrometer-{n}',
+            'short_description': f'Spectrometer number {n}',
+            'tags': [{'category': 'Manufacturer', 'name': 'Horiba'}, 'Application: FTIR'],
+            'specifications': [{'name': 'Physical', 'specs': [{'key': 'Weight', 'value': f'{n} kg'}]}],
+            'models': [{'name': f'Model {n}'}],
+        }
+        data.update(extra)
+        return data
+
+    def post(self, body, content_type='application/json', **params):
+        url = self.url
+        if params:
+            url += '?' + '&'.join(f'{k}={v}' for k, v in params.items())
+        return self.client.post(url, data=body, content_type=content_type, **self.auth)
+
+    def test_requires_token(self):
+        response = self.client.post(self.url, data='[]', content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_json_array_with_per_item_results(self):
+        items = [self.product(1), {'title': 'No description'}, self.product(2)]
+        response = self.post(json.dumps(items), chunk_size=2)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertFalse(data['success'])
+        self.assertEqual((data['total'], data['created'], data['updated'], data['failed']), (3, 2, 0, 1))
+        self.assertEqual([r['index'] for r in data['results']], [0, 1, 2])
+        self.assertEqual(data['results'][1]['error'], 'Missing required fields: short_description')
+        self.assertEqual(data['results'][2]['action'], 'created')
+
+        pages = LabEquipmentPage.objects.filter(slug__in=['spectrometer-1', 'spectrometer-2'])
+        self.assertEqual(pages.count(), 2)
+        # Tags shared by both products are resolved (and created) once
+        self.assertEqual(CategorizedTag.objects.filter(name__iexact='Horiba').count(), 1)
+        for page in pages:
+            self.assertEqual(page.categorized_tags.count(), 2)
+            self.assertEqual(page.spec_groups.count(), 1)
+            self.assertEqual(page.models.count(), 1)
+
+    def test_ndjson_updates_existing_and_reports_bad_lines(self):
+        self.post(json.dumps([self.product(1)]))
+
+        body = '\n'.join([
+            json.dumps(self.product(1, title='Spectrometer 1 (rev B)')),
+            '{not json',
+            json.dumps(self.product(3)),
+            json.dumps(self.product(3, short_description='Updated in the same batch')),
+        ])
+        response = self.post(body, content_type='application/x-ndjson')
+
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((data['created'], data['updated'], data['failed']), (1, 2, 1))
+        self.assertTrue(data['results'][1]['error'].startswith('Invalid JSON on line 2'))
+        self.assertEqual(LabEquipmentPage.objects.filter(slug='spectrometer-1').count(), 1)
+        self.assertEqual(LabEquipmentPage.objects.filter(slug='spectrometer-3').count(), 1)
+        self.assertEqual(LabEquipmentPage.objects.get(slug='spectrometer-1').title, 'Spectrometer 1 (rev B)')
+
+    def test_reimport_reports_unchanged(self):
+        self.post(json.dumps([self.product(1), self.product(2)]))
+
+        response = self.post(json.dumps([self.product(1), self.product(2, title='Spectrometer 2 (rev B)')]))
+
+        data = response.json()
+        self.assertEqual((data['created'], data['updated'], data['unchanged']), (0, 1, 1))
+        self.assertEqual([r['action'] for r in data['results']], ['unchanged', 'updated'])
+
+    def test_invalid_body(self):
+        response = self.post('"just a string"')
+        self.assertEqual(response.status_code, 400)
+        response = self.post('')
+        self.assertEqual(response.status_code, 400)
+
+
+class LabEquipmentChildObjectTests(TestCase):
+
+    def product(self, n, groups, specs, models):
+        spec_groups = [
+            {'name': f'Group {g}', 'specs': [{'key': f'Key {s}', 'value': f'{n}.{g}.{s}'} for s in range(specs)]}
+            for g in range(groups)
+        ]
+        return {
+            'title': f'Centrifuge {n}',
+            'slug': f'centrifuge-{n}',
+            'short_description': f'Centrifuge number {n}',
+            'specifications': spec_groups,
+            'models': [{'name': f'Model {m}', 'specifications': spec_groups} for m in range(models)],
+            'images': [f'https://example.com/{n}/{i}.jpg' for i in range(groups)],
+        }
+
+    def count_queries(self, func, *args):
+        with CaptureQueriesContext(connection) as context:
+            result = func(*args)
+        self.assertTrue(result['success'], result)
+        return len(context.captured_queries)
+
+    def test_creates_child_object_tree(self):
+        result = create_lab_equipment_page(self.product(1, groups=2, specs=3, models=2))
+
+        page = LabEquipmentPage.objects.get(id=result['page_id'])
+        self.assertEqual([g.name for g in page.spec_groups.order_by('name')], ['Group 0', 'Group 1'])
+        self.assertEqual(page.spec_groups.get(name='Group 1').specs.count(), 3)
+        self.assertEqual(page.models.count(), 2)
+        for model in page.models.all():
+            self.assertEqual(model.spec_groups.count(), 2)
+            self.assertEqual(Spec.objects.filter(spec_group__in=model.spec_groups.all()).count(), 6)
+        self.assertEqual(
+            list(page.gallery_images.values_list('external_image_url', 'sort_order')),
+            [('https://example.com/1/0.jpg', 0), ('https://example.com/1/1.jpg', 1)],
+        )
+
+    def test_query_count_does_not_grow_with_spec_count(self):
+        # Warm up the content type and site caches
+        create_lab_equipment_page(self.product(0, groups=1, specs=1, models=1))
+
+        small = self.count_queries(create_lab_equipment_page, self.product(1, groups=1, specs=1, models=1))
+        large = self.count_queries(create_lab_equipment_page, self.product(2, groups=6, specs=10, models=5))
+        self.assertEqual(small, large)
+
+        # Growing and shrinking child objects, by a few rows and by many (but few enough
+        # for one INSERT per table within SQLite's limit on query parameters)
+        sizes = {'small': dict(groups=2, specs=2, models=2), 'large': dict(groups=5, specs=5, models=4)}
+        grow, shrink = {}, {}
+        for n, (size, counts) in enumerate(sizes.items(), start=3):
+            page = LabEquipmentPage.objects.get(id=create_lab_equipment_page(
+                self.product(n, groups=1, specs=1, models=1))['page_id'])
+            grow[size] = self.count_queries(update_lab_equipment_page, page, self.product(n, **counts))
+            page = LabEquipmentPage.objects.get(id=page.id)
+            shrink[size] = self.count_queries(
+                update_lab_equipment_page, page, self.product(n + 10, groups=1, specs=1, models=1) | {'slug': page.slug})
+        self.assertEqual(grow['small'], grow['large'])
+        self.assertEqual(shrink['small'], shrink['large'])
+
+    def test_search_index_update_does_not_load_child_objects(self):
+        result = create_lab_equipment_page(self.product(1, groups=2, specs=2, models=2))
+        page = LabEquipmentPage.objects.get(id=result['page_id'])
+
+        with CaptureQueriesContext(connection) as context:
+            get_search_backend().add(page)
+
+        # The public search indexes those in apps.search.fulltext
+        child_tables = ('base_site_spec', 'base_site_equipment', 'categorized_tags_')
+        self.assertEqual([q['sql'] for q in context.captured_queries if any(t in q['sql'] for t in child_tables)], [])
+
+    def test_update_replaces_child_objects(self):
+        result = create_lab_equipment_page(self.product(1, groups=3, specs=2, models=2))
+        page = LabEquipmentPage.objects.get(id=result['page_id'])
+
+        update_lab_equipment_page(page, self.product(1, groups=1, specs=1, models=1))
+
+        self.assertEqual(page.spec_groups.count(), 1)
+        self.assertEqual(page.models.count(), 1)
+        self.assertEqual(page.gallery_images.count(), 1)
+        # Old groups, including their SpecGroup rows and specs, are gone
+        self.assertEqual(SpecGroup.objects.count(), 2)
+        self.assertEqual(Spec.objects.count(), 2)
+
+    def test_identical_update_is_unchanged(self):
+        data = self.product(1, groups=2, specs=2, models=2)
+        page = LabEquipmentPage.objects.get(id=create_lab_equipment_page(data)['page_id'])
+        revisions = Revision.objects.count()
+
+        with CaptureQueriesContext(connection) as context:
+            result = update_lab_equipment_page(page, dict(data))
+
+        self.assertEqual(result['action'], 'unchanged')
+        self.assertEqual(Revision.objects.count(), revisions)
+        writes = [q['sql'] for q in context.captured_queries if not q['sql'].startswith('SELECT')]
+        self.assertEqual(writes, [])
+
+    def test_identical_update_after_published_edit_restores_imported_content(self):
+        data = self.product(1, groups=2, specs=2, models=2) | {'is_published': True}
+        page = LabEquipmentPage.objects.get(id=create_lab_equipment_page(data)['page_id'])
+
+        # An editor changes the page outside the importer
+        page.short_description = 'Edited'
+        page.save_revision().publish()
+
+        page = LabEquipmentPage.objects.get(id=page.id)
+        result = update_lab_equipment_page(page, dict(data))
+
+        self.assertEqual(result['action'], 'updated')
+        page = LabEquipmentPage.objects.get(id=page.id)
+        self.assertEqual(page.short_description, data['short_description'])
+        self.assertFalse(page.has_unpublished_changes)
+
+        # Unpublishing is an edit too
+        page.unpublish()
+        page = LabEquipmentPage.objects.get(id=page.id)
+        self.assertEqual(update_lab_equipment_page(page, dict(data))['action'], 'updated')
+        page = LabEquipmentPage.objects.get(id=page.id)
+        self.assertTrue(page.live)
+        self.assertEqual(update_lab_equipment_page(page, dict(data))['action'], 'unchanged')
+
+    def test_unpublished_update_leaves_a_draft_whether_or_not_content_changed(self):
+        for n, changes in enumerate(({}, {'short_description': 'Changed'}), start=1):
+            with self.subTest(changes=changes):
+                data = self.product(n, groups=1, specs=1, models=1)
+                page = LabEquipmentPage.objects.get(id=create_lab_equipment_page(data)['page_id'])
+                # Published in the admin
+                page.save_revision().publish()
+                page = LabEquipmentPage.objects.get(id=page.id)
+
+                self.assertEqual(update_lab_equipment_page(page, data | changes)['action'], 'updated')
+                self.assertFalse(LabEquipmentPage.objects.get(id=page.id).live)
+
+    def test_identical_update_keeps_a_draft_saved_in_the_admin(self):
+        data = self.product(1, groups=1, specs=1, models=1)
+        page = LabEquipmentPage.objects.get(id=create_lab_equipment_page(data)['page_id'])
+        page.short_description = 'Edited draft'
+        revision = page.save_revision()
+
+        page = LabEquipmentPage.objects.get(id=page.id)
+        self.assertEqual(update_lab_equipment_page(page, dict(data))['action'], 'unchanged')
+        page = LabEquipmentPage.objects.get(id=page.id)
+        self.assertEqual(page.latest_revision_id, revision.id)
+        self.assertEqual(update_lab_equipment_page(page, dict(data))['action'], 'unchanged')
+
+    def test_update_applies_minimal_diff(self):
+        data = self.product(1, groups=2, specs=2, models=2)
+        page = LabEquipmentPage.objects.get(id=create_lab_equipment_page(data)['page_id'])
+        group = page.spec_groups.get(name='Group 0')
+        kept_spec, changed_spec = group.specs.order_by('key')
+        kept_model = page.models.get(name='Model 0')
+        revisions = Revision.objects.count()
+
+        data['specifications'] = [
+            {'name': 'Group 0', 'specs': [
+                {'key': 'Key 0', 'value': kept_spec.value},
+                {'key': 'Key 1', 'value': 'changed'},
+            ]},
+            {'name': 'Group 2', 'specs': [{'key': 'Key 0', 'value': 'new'}]},
+        ]
+        data['models'] = [data['models'][0], {'name': 'Model 9'}]
+        data['images'] = list(reversed(data['images']))
+        result = update_lab_equipment_page(page, data)
+
+        self.assertEqual(result['action'], 'updated')
+        self.assertEqual(Revision.objects.count(), revisions + 1)
+        # Unchanged rows are kept, changed rows are updated in place
+        self.assertEqual(page.spec_groups.get(name='Group 0').pk, group.pk)
+        self.assertTrue(Spec.objects.filter(pk=kept_spec.pk, value=kept_spec.value).exists())
+        self.assertEqual(Spec.objects.get(pk=changed_spec.pk).value, 'changed')
+        self.assertEqual(sorted(page.spec_groups.values_list('name', flat=True)), ['Group 0', 'Group 2'])
+        self.assertEqual(page.models.get(name='Model 0').pk, kept_model.pk)
+        self.assertEqual(sorted(page.models.values_list('name', flat=True)), ['Model 0', 'Model 9'])
+        self.assertEqual(page.models.get(name='Model 9').spec_groups.count(), 0)
+        self.assertEqual(
+            list(page.gallery_images.order_by('sort_order').values_list('external_image_url', flat=True)),
+            data['images'],
+        )
+
+        # The same payload again is a no-op
+        self.assertEqual(update_lab_equipment_page(page, dict(data))['action'], 'unchanged')
+
+
+STATIC_FILES = override_settings(STORAGES={
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+
+
+class RenderedPageMixin:
+
+    def setUp(self):
+        caches['pages'].clear()
+
+    def create_page(self, n, groups, models, tags=()):
+        data = {
+            'title': f'Incubator {n}',
+            'slug': f'incubator-{n}',
+            'is_published': True,
+            'processed_tag_ids': resolve_tag_ids(tags),
+            'specifications': [
+                {'name': f'Group {g}', 'specs': [{'key': 'Shared', 'value': f'{n}.{g}'}]} for g in range(groups)
+            ],
+            'models': [
+                {'name': f'Model {m}', 'specifications': [
+                    {'name': f'Group {g}', 'specs': [{'key': 'Model', 'value': f'{n}.{m}.{g}'}]} for g in range(groups)
+                ] + [{'name': f'Only model {m}', 'specs': [{'key': 'Extra', 'value': f'{n}.{m}'}]}]}
+                for m in range(models)
+            ],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            result = create_lab_equipment_page(data)
+        self.assertTrue(result['success'], result)
+        return LabEquipmentPage.objects.get(id=result['page_id'])
+
+    def render(self, page):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(page.url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+
+@STATIC_FILES
+class LabEquipmentPageRenderingTests(RenderedPageMixin, TestCase):
+    # Queries to render a detail page, whatever its number of models, groups and specs
+    QUERY_BUDGET = 15
+
+    def test_renders_models_and_specs_within_query_budget(self):
+        # Warm up the site and content type caches
+        self.render(self.create_page(0, groups=1, models=1))
+
+        _, small = self.render(self.create_page(1, groups=1, models=1))
+        response, large = self.render(self.create_page(2, groups=6, models=8))
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, self.QUERY_BUDGET)
+        self.assertContains(response, '2.7.5')
+        self.assertContains(response, 'Only model 7')
+
+    def test_merges_page_and_model_spec_groups(self):
+        page = self.create_page(1, groups=2, models=2)
+        load_spec_sheet(page)
+
+        with self.assertNumQueries(0):
+            models = list(page.models.all())
+            merged = {model.name: model.merged_spec_groups for model in models}
+            self.assertEqual(page.spec_group_names, ['Group 0', 'Group 1', 'Only model 0', 'Only model 1'])
+
+        groups = {group['name']: [spec.value for spec in group['specs']] for group in merged['Model 1']}
+        self.assertEqual(groups, {'Group 0': ['1.0', '1.1.0'], 'Group 1': ['1.1', '1.1.1'], 'Only model 1': ['1.1']})
+        self.assertEqual(merged['Model 1'], page.get_effective_spec_groups(models[1]))
+
+
+@STATIC_FILES
+class PageCacheTests(RenderedPageMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.page = self.create_page(1, groups=2, models=2, tags=['Manufacturer: AirScience'])
+        # Warm up the site and content type caches
+        self.render(self.page)
+        caches['pages'].clear()
+
+    def test_serves_anonymous_visitors_from_cache(self):
+        response, rendered = self.render(self.page)
+        cached, queries = self.render(self.page)
+
+        self.assertLess(queries, rendered)
+        self.assertEqual(cached.content, response.content)
+        self.assertContains(cached, '1.1.1')
+
+    def test_cached_response_keeps_its_headers(self):
+        request = RequestFactory().get(self.page.url)
+        request.user = AnonymousUser()
+
+        def serve():
+            response = HttpResponse('<p>Incubator</p>', content_type='text/html; charset=iso-8859-1')
+            response['Cache-Control'] = 'max-age=60'
+            patch_vary_headers(response, ['Accept-Language'])
+            return response
+
+        serve_cached(self.page, request, serve)
+        cached = serve_cached(self.page, request, lambda: self.fail('Served a cached page again'))
+
+        self.assertEqual(cached.content, b'<p>Incubator</p>')
+        self.assertEqual(cached['Content-Type'], 'text/html; charset=iso-8859-1')
+        self.assertEqual(cached.charset, 'iso-8859-1')
+        self.assertEqual(cached['Cache-Control'], 'max-age=60')
+        self.assertEqual(cached['Vary'], 'Accept-Language')
+
+    def test_publish_invalidates_cached_page(self):
+        self.render(self.page)
+
+        self.page.title = 'Renamed incubator'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.page.save_revision().publish()
+
+        response, _ = self.render(self.page)
+        self.assertContains(response, 'Renamed incubator')
+
+    def test_unpublish_invalidates_cached_page(self):
+        self.render(self.page)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.page.unpublish()
+
+        self.assertEqual(self.client.get(self.page.url).status_code, 404)
+
+    def test_tag_change_invalidates_cached_page_and_fragments(self):
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'visitor'
+        self.render(self.page)
+        self.client.cookies.clear()
+        self.render(self.page)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = CategorizedTag.objects.get(name='AirScience')
+            tag.name = 'Air Science'
+            tag.save()
+
+        anonymous, _ = self.render(self.page)
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'visitor'
+        visitor, _ = self.render(self.page)
+        self.assertContains(anonymous, 'Air Science')
+        self.assertContains(visitor, 'Air Science')
+
+    def test_caches_fragments_for_visitors_with_a_session(self):
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'visitor'
+        response, rendered = self.render(self.page)
+        cached, queries = self.render(self.page)
+
+        # The header depends on the visitor's cart, the spec tables come from the cache
+        self.assertLess(queries, rendered)
+        self.assertEqual(cached.content, response.content)
+        self.assertIsNotNone(cached.context)
+
@@ -22,5 +22,6 @@ urlpatterns = [
     
     # API URLs
     path('api/lab-equipment/', api.create_or_update_lab_equipment, name='api_lab_equipment'),
+    path('api/lab-equipment/bulk/', api.bulk_create_or_update_lab_equipment, name='api_lab_equipment_bulk'),
     path('api/approve-review-item/', api.approve_review_item, name='approve_review_item'),
 ] 
\ No newline at end of file
@@ -0,0 +1,317 @@
+"""
+Set-based resolution of incoming tag data to CategorizedTag IDs.
+
+Importers, the lab equipment API and the AI pipeline all receive tags as
+{"category": ..., "name": ...} objects or legacy "Category: Name" strings. Instead
+of looking each tag up (and possibly creating it) one query at a time, the resolver
+normalizes every incoming tag first, then:
+
+    1. fetches the existing tags, and any malformed "Category: Name" tags with an
+       empty category left by old imports, in one case-insensitive query
+    2. repairs the malformed tags it found
+    3. creates the missing tags with one bulk_create(ignore_conflicts=True) and
+       re-selects them (retrying once with suffixed slugs on slug collisions)
+
+Resolved (category, name) -> id pairs are kept in a per-process cache shared by all
+callers, so tags seen before cost no queries. The cache is cleared whenever a tag is
+saved or deleted through the ORM, and pairs resolved inside a transaction are only
+cached once it commits. The list of all tags (offered to the AI model with every
+page) is cached the same way.
+
+Tags renamed, deleted or created in other processes send no signal here, so both
+caches are also dropped CACHE_TTL seconds after they were first filled.
+"""
+
+import logging
+import random
+import threading
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.text import slugify
+
+from .models import CategorizedTag, TagCategory, generate_random_color
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATEGORY = 'General'
+CACHE_TTL = 5 * 60
+
+
+def normalize_tag(tag_data):
+    """
+    Normalize one incoming tag.
+
+    Accepts {"category": ..., "name": ...} (a name of the form "Category: Name" with an
+    empty category is split), "Category: Name" strings, and plain strings, which go in
+    the General category.
+
+    Returns:
+        tuple: (category, name, malformed_name) or None if the tag is unusable;
+               malformed_name is the full "Category: Name" string an old import may have
+               stored as a tag name with an empty category, or None
+    """
+    if isinstance(tag_data, dict) and 'category' in tag_data and 'name' in tag_data:
+        category = str(tag_data['category']).strip()
+        name = str(tag_data['name']).strip()
+        malformed_name = None
+        if ':' in name and not category:
+            malformed_name = name
+            category, name = [part.strip() for part in name.split(':', 1)]
+    elif isinstance(tag_data, str):
+        malformed_name = tag_data.strip()
+        if ':' in malformed_name:
+            category, name = [part.strip() for part in malformed_name.split(':', 1)]
+        else:
+            category, name, malformed_name = DEFAULT_CATEGORY, malformed_name, None
+    else:
+        return None
+
+    if not name:
+        return None
+    return category, name, malformed_name
+
+
+def tag_key(category, name):
+    """The case-insensitive identity of a tag."""
+    return (category.lower(), name.lower())
+
+
+class TagResolver:
+    """Resolves tag data to CategorizedTag IDs with a per-process cache."""
+
+    def __init__(self):
+        self._ids = {}
+        self._ids_filled_at = None
+        self._ids_generation = 0
+        self._tags = None
+        self._tags_fetched_at = None
+        self._tags_generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        """Forget all cached tag IDs and the cached tag list."""
+        with self._lock:
+            self._ids.clear()
+            self._ids_filled_at = None
+            self._ids_generation += 1
+        self._forget_tags()
+
+    def _expire_ids(self):
+        # Called with the lock held
+        if self._ids_filled_at is not None and time.monotonic() - self._ids_filled_at >= CACHE_TTL:
+            self._ids.clear()
+            self._ids_filled_at = None
+
+    def _forget_tags(self):
+        with self._lock:
+            self._tags = None
+            self._tags_generation += 1
+
+    def existing_tags(self):
+        """
+        Return all tags, fetched once per CACHE_TTL seconds or until a tag changes.
+
+        Returns:
+            list: {'category', 'name'} dicts, shared by all callers, which must not modify it
+        """
+        with self._lock:
+            if self._tags is not None and time.monotonic() - self._tags_fetched_at < CACHE_TTL:
+                return self._tags
+            generation = self._tags_generation
+
+        tags = [{'category': category, 'name': name}
+                for category, name in CategorizedTag.objects.values_list('category', 'name')]
+
+        def remember():
+            with self._lock:
+                # A tag changed while the list was fetched
+                if self._tags_generation == generation:
+                    self._tags = tags
+                    self._tags_fetched_at = time.monotonic()
+
+        # Only share the list once the tags it holds are committed
+        transaction.on_commit(remember)
+        return tags
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ids)
+
+    def resolve_ids(self, tags_data):
+        """
+        Resolve a list of tags to CategorizedTag IDs, creating missing tags.
+
+        Returns:
+            list: Tag IDs in input order, without duplicates; tags that cannot be
+                  resolved (e.g. their name is taken in another category) are left out
+        """
+        return self.resolve_many([tags_data])[0]
+
+    def resolve_many(self, tag_lists):
+        """
+        Resolve several lists of tags (e.g. one per product) with one set of queries.
+
+        Returns:
+            list: One list of tag IDs per input list
+        """
+        normalized_lists = []
+        for tags_data in tag_lists:
+            normalized = []
+            for tag_data in tags_data or []:
+                tag = normalize_tag(tag_data)
+                if tag is None:
+                    logger.warning(f"Skipping invalid tag data: {tag_data!r}")
+                else:
+                    normalized.append(tag)
+            normalized_lists.append(normalized)
+
+        with self._lock:
+            self._expire_ids()
+            generation = self._ids_generation
+            resolved = {}
+            missing = {}
+            for normalized in normalized_lists:
+                for category, name, malformed_name in normalized:
+                    key = tag_key(category, name)
+                    if key in self._ids:
+                        resolved[key] = self._ids[key]
+                    elif key not in missing:
+                        missing[key] = (category, name, malformed_name)
+            self.hits += len(resolved)
+            self.misses += len(missing)
+
+        if missing:
+            found = self._fetch_or_create(missing)
+            resolved.update(found)
+            # Only share IDs once they are committed
+            transaction.on_commit(lambda: self._remember(found, generation))
+
+        results = []
+        for normalized in normalized_lists:
+            tag_ids = []
+            for category, name, _ in normalized:
+                tag_id = resolved.get(tag_key(category, name))
+                if tag_id is not None and tag_id not in tag_ids:
+                    tag_ids.append(tag_id)
+            results.append(tag_ids)
+        return results
+
+    def _remember(self, found, generation):
+        with self._lock:
+            # A tag changed while these IDs were resolved
+            if self._ids_generation != generation:
+                return
+            if self._ids_filled_at is None:
+                self._ids_filled_at = time.monotonic()
+            self._ids.update(found)
+
+    def _select(self, keys, malformed_names=()):
+        """
+        Fetch existing tags for keys, and malformed tags named in malformed_names, in one query.
+
+        Returns:
+            tuple: ({key: id}, {lowercased malformed name: CategorizedTag})
+        """
+        categories = {category for category, _ in keys}
+        names = {name for _, name in keys}
+        condition = Q(lower_category__in=categories, lower_name__in=names)
+        if malformed_names:
+            condition |= Q(category='', lower_name__in=set(malformed_names))
+
+        found = {}
+        malformed = {}
+        tags = CategorizedTag.objects.annotate(
+            lower_category=Lower('category'),
+            lower_name=Lower('name'),
+        ).filter(condition)
+        for tag in tags:
+            key = tag_key(tag.category, tag.name)
+            if key in keys:
+                found[key] = tag.id
+            elif not tag.category:
+                malformed[tag.name.lower()] = tag
+        return found, malformed
+
+    def _fetch_or_create(self, missing):
+        malformed_names = {spec[2].lower() for spec in missing.values() if spec[2]}
+        found, malformed = self._select(set(missing), malformed_names)
+
+        pending = {key: spec for key, spec in missing.items() if key not in found}
+
+        # Repair tags stored by old imports as "Category: Name" with an empty category
+        for key, (category, name, malformed_name) in list(pending.items()):
+            tag = malformed.get(malformed_name.lower()) if malformed_name else None
+            if tag is None:
+                continue
+            tag.category = category
+            tag.name = name
+            try:
+                with transaction.atomic():
+                    tag.save()
+            except IntegrityError as e:
+                logger.warning(f"Could not fix malformed tag '{malformed_name}': {e}")
+                continue
+            logger.info(f"Fixed and using tag: {tag}")
+            found[key] = tag.id
+            del pending[key]
+
+        if pending:
+            self._create(pending, found)
+
+        return found
+
+    def _create(self, pending, found):
+        """Create the pending tags in bulk and add their IDs to found."""
+        # bulk_create bypasses CategorizedTag.save(), so make sure the categories exist
+        TagCategory.objects.bulk_create(
+            [TagCategory(name=category, color=generate_random_color())
+             for category in {category for category, _, _ in pending.values()}],
+            ignore_conflicts=True,
+        )
+
+        for attempt in range(2):
+            tags = []
+            for category, name, _ in pending.values():
+                slug = slugify(f"{category}-{name}")
+                if attempt:
+                    # Second attempt: the plain slug collided with another tag
+                    suffix = ''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=5))
+                    slug = f"{slug}-{suffix}"
+                tags.append(CategorizedTag(category=category, name=name, slug=slug))
+            CategorizedTag.objects.bulk_create(tags, ignore_conflicts=True)
+            # bulk_create sends no post_save signal
+            self._forget_tags()
+
+            created, _ = self._select(set(pending))
+            found.update(created)
+            for key in created:
+                logger.info(f"Created new tag: {pending[key][0]}: {pending[key][1]}")
+                del pending[key]
+            if not pending:
+                return
+
+        for category, name, _ in pending.values():
+            logger.error(f"Failed to create tag {category}:{name} (the name may be used in another category)")
+
+
+# The resolver shared by the whole process
+tag_resolver = TagResolver()
+
+
+def resolve_tag_ids(tags_data):
+    """Resolve a list of tags to CategorizedTag IDs with the shared resolver."""
+    return tag_resolver.resolve_ids(tags_data)
+
+
+@receiver(post_save, sender=CategorizedTag)
+@receiver(post_delete, sender=CategorizedTag)
+def _clear_tag_cache(sender, **kwargs):
+    # A renamed or deleted tag may invalidate any cached pair
+    tag_resolver.clear()
@@ -1,3 +1,138 @@
+import time
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from .models import CategorizedTag, TagCategory
+from .resolver import CACHE_TTL, TagResolver, normalize_tag, tag_resolver
+
+
+class NormalizeTagTests(TestCase):
+
+    def test_formats(self):
+        self.assertEqual(normalize_tag({'category': ' Manufacturer ', 'name': 'Horiba '}),
+                         ('Manufacturer', 'Horiba', None))
+        self.assertEqual(normalize_tag({'category': '', 'name': 'Manufacturer: Horiba'}),
+                         ('Manufacturer', 'Horiba', 'Manufacturer: Horiba'))
+        self.assertEqual(normalize_tag('Application:FTIR'), ('Application', 'FTIR', 'Application:FTIR'))
+        self.assertEqual(normalize_tag('Benchtop'), ('General', 'Benchtop', None))
+        self.assertIsNone(normalize_tag({'name': 'no category'}))
+        self.assertIsNone(normalize_tag('Manufacturer:'))
+
+
+class TagResolverTests(TestCase):
+
+    def setUp(self):
+        self.resolver = TagResolver()
+        tag_resolver.clear()
+
+    def tearDown(self):
+        tag_resolver.clear()
+
+    def tags(self, count, category='Application'):
+        return [{'category': category, 'name': f'{category} {n}'} for n in range(count)]
+
+    def test_matches_existing_tags_case_insensitively(self):
+        existing = CategorizedTag.objects.create(category='Manufacturer', name='Horiba')
+
+        tag_ids = self.resolver.resolve_ids(['manufacturer: HORIBA', {'category': 'Manufacturer', 'name': 'horiba'}])
+
+        self.assertEqual(tag_ids, [existing.id])
+        self.assertEqual(CategorizedTag.objects.count(), 1)
+
+    def test_creates_missing_tags_and_categories(self):
+        tag_ids = self.resolver.resolve_ids(self.tags(3) + ['Benchtop'])
+
+        self.assertEqual(len(tag_ids), 4)
+        tags = CategorizedTag.objects.in_bulk(tag_ids)
+        self.assertEqual(tags[tag_ids[3]].category, 'General')
+        self.assertEqual(tags[tag_ids[0]].slug, 'application-application-0')
+        self.assertTrue(TagCategory.objects.filter(name='Application').exists())
+        self.assertTrue(TagCategory.objects.filter(name='General').exists())
+
+    def test_fixes_malformed_tags(self):
+        malformed = CategorizedTag.objects.create(category='', name='Manufacturer: Horiba')
+
+        tag_ids = self.resolver.resolve_ids(['Manufacturer: Horiba'])
+
+        malformed.refresh_from_db()
+        self.assertEqual(tag_ids, [malformed.id])
+        self.assertEqual((malformed.category, malformed.name), ('Manufacturer', 'Horiba'))
+
+    def test_retries_slug_collisions(self):
+        # "Application: A-B" and "Application-A: B" slugify to the same slug
+        CategorizedTag.objects.create(category='Application-A', name='B')
+
+        tag_ids = self.resolver.resolve_ids([{'category': 'Application', 'name': 'A-B'}])
+
+        self.assertEqual(len(tag_ids), 1)
+        self.assertTrue(CategorizedTag.objects.get(id=tag_ids[0]).slug.startswith('application-a-b-'))
+
+    def test_query_count_does_not_grow_with_tag_count(self):
+        # Creating: select, category insert, tag insert, re-select
+        with self.assertNumQueries(4):
+            self.assertEqual(len(self.resolver.resolve_ids(self.tags(3))), 3)
+        with self.assertNumQueries(4):
+            self.assertEqual(len(self.resolver.resolve_ids(self.tags(15, category='Manufacturer'))), 15)
+
+        # Existing tags: a single select, however many there are
+        with self.assertNumQueries(1):
+            self.assertEqual(len(TagResolver().resolve_ids(self.tags(15, category='Manufacturer'))), 15)
+
+    def test_cache_is_shared_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tag_ids = self.resolver.resolve_ids(self.tags(15))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolver.resolve_ids(list(reversed(self.tags(15)))), tag_ids[::-1])
+
+    def test_cache_is_cleared_when_a_tag_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tag_ids = tag_resolver.resolve_ids(self.tags(2))
+        self.assertEqual(len(tag_resolver), 2)
+
+        CategorizedTag.objects.get(id=tag_ids[0]).delete()
+        self.assertEqual(len(tag_resolver), 0)
+
+    def test_cache_expires_for_changes_made_by_other_processes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tag_ids = self.resolver.resolve_ids(self.tags(2))
+
+        # Another process deletes a tag: no signal reaches this one
+        CategorizedTag.objects.filter(id=tag_ids[0]).delete()
+        self.assertEqual(self.resolver.resolve_ids(self.tags(2)), tag_ids)
+
+        with mock.patch('apps.categorized_tags.resolver.time.monotonic', return_value=time.monotonic() + CACHE_TTL):
+            new_ids = self.resolver.resolve_ids(self.tags(2))
+        self.assertNotIn(tag_ids[0], new_ids)
+        self.assertEqual(new_ids[1], tag_ids[1])
+
+    def test_ids_resolved_while_a_tag_changes_are_not_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tag_ids = tag_resolver.resolve_ids(self.tags(2))
+            CategorizedTag.objects.get(id=tag_ids[0]).delete()
+        self.assertEqual(len(tag_resolver), 0)
+
+    def test_existing_tags_are_cached_until_tags_change(self):
+        CategorizedTag.objects.create(category='Type', name='Centrifuge')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.resolver.existing_tags(), [{'category': 'Type', 'name': 'Centrifuge'}])
+        with self.assertNumQueries(0):
+            self.resolver.existing_tags()
+
+        # Tags created in bulk send no signal
+        with self.captureOnCommitCallbacks(execute=True):
+            self.resolver.resolve_ids(self.tags(1))
+            self.assertEqual(len(self.resolver.existing_tags()), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag_resolver.existing_tags()
+        CategorizedTag.objects.get(name='Centrifuge').delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(len(tag_resolver.existing_tags()), 1)
+
+    def test_resolve_many_shares_queries(self):
+        with self.assertNumQueries(4):
+            results = self.resolver.resolve_many([self.tags(2), self.tags(3), []])
+        self.assertEqual([len(r) for r in results], [2, 3, 0])
+        self.assertEqual(results[0], results[1][:2])
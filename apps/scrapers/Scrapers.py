@@ -1,28 +1,123 @@
 import requests
 import re
+import time
+import threading
 import nltk
 from difflib import SequenceMatcher
 from bs4 import BeautifulSoup
-from apps.scrapers.selectors.base import Selector, Selected, SelectedType
+from apps.scrapers.selectors.compiler import CompiledSelector
+from apps.scrapers.utils.debug_artifacts import capture_artifact
+from apps.scrapers.utils.html_parser import get_html_parser, make_soup
 import logging
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 class Scraper:
-    def __init__(self, filepath):
-        self.selector = Selector.fromFilePath(filepath)
+    """
+    Scrapes product pages with a selector configuration.
 
-    def scrape(self, href):
-        new_soup = BeautifulSoup(requests.get(href).text, 'html.parser')
-        result = self.selector.select(Selected(new_soup, SelectedType.SINGLE)).collapsed_value
-        
-        # Post-process the result to handle fallbacks
-        if isinstance(result, dict):
-            # Apply short description fallback if needed
-            self._apply_short_description_fallback(result)
-            
-        return result
+    Each page goes through an explicit fetch -> parse -> select -> post_process
+    pipeline. Callers that already have the page can enter it later: pass the
+    response text as html, or an already parsed document as soup, and the page is
+    not fetched or parsed again. Time spent in each stage is accumulated in
+    stage_timings for run reports.
+    """
+
+    STAGES = ('fetch', 'parse', 'select', 'post_process')
+
+    def __init__(self, filepath, session=None, timeout=30, parser=None):
+        """
+        Args:
+            filepath: Path to the selector YAML configuration
+            session: Optional requests.Session (e.g. with a retry adapter) used for fetching
+            timeout: Timeout in seconds for fetching a page
+            parser: HTML parser backend; defaults to the SCRAPER_HTML_PARSER setting
+        """
+        # Compiled plans are cached per YAML file, so repeated Scrapers share them
+        self.selector = CompiledSelector.fromFilePath(filepath)
+        self.session = session
+        self.timeout = timeout
+        self.parser = get_html_parser(parser)
+        self._timings_lock = threading.Lock()
+        self.reset_timings()
+
+    def reset_timings(self):
+        """Clear the accumulated per-stage timings."""
+        with self._timings_lock:
+            self.stage_timings = {stage: 0.0 for stage in self.STAGES}
+            self.stage_counts = {stage: 0 for stage in self.STAGES}
+
+    def _record(self, stage, started):
+        elapsed = time.perf_counter() - started
+        with self._timings_lock:
+            self.stage_timings[stage] += elapsed
+            self.stage_counts[stage] += 1
+
+    def fetch(self, href):
+        """Download a page and return its HTML."""
+        started = time.perf_counter()
+        try:
+            http = self.session if self.session is not None else requests
+            response = http.get(href, timeout=self.timeout)
+            response.raise_for_status()
+            capture_artifact('scraped_html', href, response.text)
+            return response.text
+        finally:
+            self._record('fetch', started)
+
+    def parse(self, html):
+        """Parse HTML into a BeautifulSoup document."""
+        started = time.perf_counter()
+        try:
+            return make_soup(html, self.parser)
+        finally:
+            self._record('parse', started)
+
+    def select(self, soup):
+        """Run the compiled selector program over a parsed document."""
+        started = time.perf_counter()
+        try:
+            return self.selector.run(soup)
+        finally:
+            self._record('select', started)
+
+    def post_process(self, result):
+        """Apply fallbacks to the selected data."""
+        started = time.perf_counter()
+        try:
+            if isinstance(result, dict):
+                # Apply short description fallback if needed
+                self._apply_short_description_fallback(result)
+            return result
+        finally:
+            self._record('post_process', started)
+
+    def scrape(self, href, html=None, soup=None):
+        """
+        Scrape a page.
+
+        Args:
+            href: URL of the page (only fetched if neither html nor soup is given)
+            html: Already fetched HTML of the page
+            soup: Already parsed BeautifulSoup document of the page
+
+        Returns:
+            The selected data
+        """
+        if soup is None:
+            if html is None:
+                html = self.fetch(href)
+            soup = self.parse(html)
+        return self.post_process(self.select(soup))
+
+    def timings_report(self):
+        """Return {stage: (total seconds, pages)} for the stages run so far."""
+        with self._timings_lock:
+            return {
+                stage: (self.stage_timings[stage], self.stage_counts[stage])
+                for stage in self.STAGES
+            }
         
     def _apply_short_description_fallback(self, result):
         """
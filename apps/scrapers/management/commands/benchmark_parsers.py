@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.scrapers.utils.html_parser import KNOWN_PARSERS, available_parsers, make_soup
+
+
+class Command(BaseCommand):
+    help = 'Compare the parse throughput of the installed HTML parser backends on saved HTML fixtures'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fixtures',
+            nargs='+',
+            default=['product_page.html', 'scripts/debug_page_1747413378.html'],
+            help='HTML files to parse'
+        )
+        parser.add_argument(
+            '--parsers',
+            nargs='+',
+            default=None,
+            choices=KNOWN_PARSERS,
+            help='Parser backends to compare (default: every installed backend)'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Number of timed parses per fixture and backend (default: 20)'
+        )
+
+    def handle(self, *args, **options):
+        installed = available_parsers()
+        parsers = options['parsers'] or installed
+        iterations = max(1, options['iterations'])
+
+        missing = [name for name in parsers if name not in installed]
+        for name in missing:
+            self.stderr.write(f"Skipping {name}: not installed")
+        parsers = [name for name in parsers if name in installed]
+
+        for fixture in options['fixtures']:
+            try:
+                with open(fixture, 'r', encoding='utf-8') as f:
+                    html = f.read()
+            except OSError as e:
+                self.stderr.write(f"Skipping {fixture}: {e}")
+                continue
+
+            self.stdout.write(f"\n{fixture} ({len(html)} bytes, {iterations} iterations)")
+
+            results = []
+            for name in parsers:
+                # Warm up once so imports and caches are not timed
+                make_soup(html, name)
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    make_soup(html, name)
+                ms = (time.perf_counter() - start) * 1000 / iterations
+                results.append((name, ms))
+
+                mib_per_s = len(html.encode('utf-8')) / (1024 * 1024) / (ms / 1000) if ms > 0 else 0
+                self.stdout.write(f"  {name:<12} {ms:8.2f} ms/page   {mib_per_s:7.2f} MiB/s")
+
+            baseline = dict(results).get('html.parser')
+            if baseline:
+                for name, ms in results:
+                    if name != 'html.parser' and ms > 0:
+                        self.stdout.write(self.style.SUCCESS(f"  {name} vs html.parser: {baseline / ms:.2f}x"))
@@ -0,0 +1,141 @@
+import logging
+import time
+import tracemalloc
+from copy import deepcopy
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.scrapers.selectors.base import Selector, Selected, SelectedType
+from apps.scrapers.selectors.mapping_selector import MappingSelector
+from apps.scrapers.utils.html_parser import get_html_parser, make_soup
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-page CPU time and peak memory of a selector configuration on saved HTML fixtures'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--config',
+            type=str,
+            default='apps/scrapers/triadscientific-yamls/mapping.yaml',
+            help='Path to the selector YAML configuration file'
+        )
+        parser.add_argument(
+            '--fixtures',
+            nargs='+',
+            default=['sample_original.html', 'product_page.html'],
+            help='HTML files to run the selector against'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Number of timed runs per fixture (default: 20)'
+        )
+        parser.add_argument(
+            '--error-strategy',
+            type=str,
+            default='mark_none',
+            choices=MappingSelector.VALID_ERROR_STRATEGIES,
+            help='Error strategy for a top-level mapping, so every key is evaluated on fixtures it does not fully match'
+        )
+        parser.add_argument(
+            '--parser',
+            type=str,
+            default=None,
+            help='HTML parser backend for the fixtures (default: the SCRAPER_HTML_PARSER setting)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            selector = Selector.fromFilePath(options['config'])
+        except Exception as e:
+            raise CommandError(f"Could not load selector from {options['config']}: {e}")
+
+        if isinstance(selector, MappingSelector):
+            # A new mapping rather than changing the loaded one, which the registry shares
+            selector = MappingSelector(selector.mapping, error_strategy=options['error_strategy'])
+
+        compiled = selector.compile()
+        iterations = max(1, options['iterations'])
+        html_parser = get_html_parser(options['parser'])
+
+        # Selector errors on partially matching fixtures are expected here; keep the output readable
+        logging.disable(logging.ERROR)
+        try:
+            for fixture in options['fixtures']:
+                try:
+                    with open(fixture, 'r', encoding='utf-8') as f:
+                        html = f.read()
+                except OSError as e:
+                    self.stderr.write(f"Skipping {fixture}: {e}")
+                    continue
+
+                soup = make_soup(html, html_parser)
+                self.stdout.write(f"\n{fixture} ({len(html)} bytes, {iterations} iterations, {html_parser})")
+
+                modes = (
+                    ('before (deepcopy)', lambda: self._run_with_copies(selector, soup)),
+                    ('after (shared)', lambda: selector.select(Selected(soup, SelectedType.SINGLE))),
+                    ('compiled', lambda: compiled.run(soup)),
+                )
+
+                results = []
+                for label, run in modes:
+                    cpu_ms, peak_kib, error = self._measure(run, iterations)
+                    results.append((label, cpu_ms, peak_kib))
+                    line = f"  {label:<18} cpu/page: {cpu_ms:8.2f} ms   peak memory: {peak_kib:9.1f} KiB"
+                    if error:
+                        line += f"   error: {error}"
+                    self.stdout.write(line)
+
+                _, before_cpu, before_peak = results[0]
+                for label, cpu_ms, peak_kib in results[1:]:
+                    if cpu_ms > 0 and peak_kib > 0:
+                        self.stdout.write(self.style.SUCCESS(
+                            f"  {label} speedup: {before_cpu / cpu_ms:.2f}x cpu, {before_peak / peak_kib:.2f}x peak memory"
+                        ))
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def _run_with_copies(self, selector, soup):
+        """
+        Run selector the way it ran before inputs were shared: every key of a top-level
+        mapping reads its own deep copy of the page. Nested composites share their
+        input, so this slightly understates the old cost.
+        """
+        if not isinstance(selector, MappingSelector):
+            return selector.select(deepcopy(Selected(soup, SelectedType.SINGLE)))
+
+        result = {}
+        for key, child in selector.mapping.items():
+            try:
+                result[key] = child.select(deepcopy(Selected(soup, SelectedType.SINGLE))).collapsed_value
+            except Exception:
+                if selector.error_strategy != 'mark_none':
+                    raise
+                result[key] = None
+        return Selected(result, SelectedType.VALUE)
+
+    def _measure(self, run, iterations):
+        """Return (cpu ms per page, peak KiB for one page, error message or None)."""
+        error = None
+
+        start = time.process_time()
+        for _ in range(iterations):
+            try:
+                run()
+            except Exception as e:
+                error = str(e)
+        cpu_ms = (time.process_time() - start) * 1000 / iterations
+
+        # Peak memory is measured on a separate run so tracing does not skew the timings
+        tracemalloc.start()
+        try:
+            run()
+        except Exception:
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return cpu_ms, peak / 1024, error
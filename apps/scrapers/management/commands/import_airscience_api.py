@@ -6,13 +6,14 @@ import re
 import time
 import traceback
 import os
-from bs4 import BeautifulSoup
 from django.core.management.base import BaseCommand
 import json
 
-from apps.scrapers.selectors.base import Selector, Selected, SelectedType
+from apps.scrapers.selectors.base import Selected, SelectedType
+from apps.scrapers.selectors.registry import selector_registry
 from apps.scrapers.utils.image_downloader import ImageDownloader
 from apps.scrapers.utils.api_client import LabEquipmentAPIClient
+from apps.scrapers.utils.html_parser import make_soup
 
 logger = logging.getLogger(__name__)
 
@@ -102,13 +103,13 @@ class Command(BaseCommand):
                 return
 
             # Parse the HTML content
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = make_soup(response.text)
             
             # Create a Selected object with the parsed HTML
             page_selected = Selected(soup, SelectedType.SINGLE)
             
             # Load the mapping selector
-            mapping_selector = Selector.fromFilePath("apps/scrapers/airscience-yamls/mapping.yaml")
+            mapping_selector = selector_registry.get("apps/scrapers/airscience-yamls/mapping.yaml")
             
             # Apply the mapping selector to extract data
             try:
@@ -423,7 +424,7 @@ class Command(BaseCommand):
     def process_tag_file(self, yaml_file, dry_run):
         """Process tags from a single YAML file"""
         try:
-            selector = Selector.fromFilePath(yaml_file)
+            selector = selector_registry.get(yaml_file)
             tag_data = selector(Selected(None, SelectedType.SINGLE)).value
             
             self.stdout.write(f"Processing tags from {yaml_file}: {len(tag_data)} tags found")
@@ -441,7 +442,7 @@ class Command(BaseCommand):
     def _load_tag_mappings(self, yaml_file):
         """Load tag mappings from a YAML file"""
         try:
-            selector = Selector.fromFilePath(yaml_file)
+            selector = selector_registry.get(yaml_file)
             tag_data = selector(Selected(None, SelectedType.SINGLE)).value
             
             self.stdout.write(f"Loaded {len(tag_data)} tags from {yaml_file}")
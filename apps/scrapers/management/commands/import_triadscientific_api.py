@@ -7,7 +7,6 @@ import time
 import traceback
 import os
 import importlib.util
-from bs4 import BeautifulSoup
 from django.core.management.base import BaseCommand
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
@@ -216,17 +215,17 @@ class Command(BaseCommand):
             'start_time': datetime.datetime.now(),
         }
         
-        # Create a new scraper for triad scientific
-        scraper = Scraper("apps/scrapers/triadscientific-yamls/mapping.yaml")
-        
         # Create a requests session with retry capability
         session = self._create_session_with_retry(options['retry'], options['retry_delay'])
         
+        # Create a new scraper for triad scientific that fetches through the retrying session
+        scraper = Scraper("apps/scrapers/triadscientific-yamls/mapping.yaml", session=session)
+        self.scraper = scraper
+        
         # Process the URLs in parallel
         self.process_urls_parallel(
             urls=urls,
             scraper=scraper,
-            session=session,
             skip_images=options['skip_images'],
             dry_run=options['dry_run'],
             workers=options['workers'],
@@ -274,6 +273,16 @@ class Command(BaseCommand):
             
             if not final:
                 report += f"Estimated time remaining: {remaining_str}\n"
+            
+            # Per-stage scraping timings (fetch/parse/select/post_process)
+            scraper = getattr(self, 'scraper', None)
+            if scraper is not None:
+                stage_parts = []
+                for stage, (seconds, pages) in scraper.timings_report().items():
+                    if pages:
+                        stage_parts.append(f"{stage} {seconds / pages * 1000:.0f}ms")
+                if stage_parts:
+                    report += f"Avg per page: {' | '.join(stage_parts)}\n"
                 
             self.stdout.write(report)
 
@@ -284,41 +293,50 @@ class Command(BaseCommand):
                 "last_updated": datetime.datetime.now().isoformat(),
                 "stats": {k: v for k, v in stats.items() if k != 'start_time'},
                 "all_urls": all_urls,
-                "processed_urls": processed_urls or []
+                "processed_urls": list(processed_urls or [])
             }
             
-            with open(checkpoint_file, 'w') as f:
-                json.dump(checkpoint_data, f, indent=2)
+            # Replace the checkpoint atomically so an interrupted write never loses it
+            tmp_file = f"{checkpoint_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(checkpoint_data, f)
+            os.replace(tmp_file, checkpoint_file)
 
     def discover_urls_parallel(self, category=None, request_delay=1.0, output_file=None, workers=4):
-        """Discover product URLs from the Triad Scientific website in parallel"""
+        """Discover product URLs from the Triad Scientific website with the async crawler"""
         self.stdout.write("Starting URL discovery...")
         
-        discoverer = TriadUrlDiscoverer(delay=request_delay)
+        discoverer = TriadUrlDiscoverer(request_delay=request_delay)
         
+        start_urls = None
         if category:
             self.stdout.write(f"Discovering URLs for category: {category}")
-            urls = discoverer.discover_category_urls(category)
+            categories = discoverer.discover_main_categories()
+            start_urls = [c['url'] for c in categories if f"/products/{category}/" in c.get('url', '')]
+            if not start_urls:
+                self.stdout.write(f"Category not found: {category}")
+                return
         else:
             self.stdout.write("Discovering URLs for all categories")
-            urls = discoverer.discover_all_product_urls(workers=workers)
         
-        if not urls:
+        # Product URLs are streamed to the output file as they are discovered
+        products = discoverer.discover_all_urls_async(
+            output_file=output_file,
+            max_concurrency=workers,
+            start_urls=start_urls
+        )
+        
+        if not products:
             self.stdout.write("No URLs discovered.")
             return
         
-        self.stdout.write(f"Discovered {len(urls)} product URLs")
-        
-        # Save to file if specified
+        self.stdout.write(f"Discovered {len(products)} product URLs")
         if output_file:
-            with open(output_file, 'w') as f:
-                for url in urls:
-                    f.write(f"{url}\n")
             self.stdout.write(f"URLs saved to {output_file}")
         
-        return urls
+        return [product['url'] for product in products]
 
-    def process_urls_parallel(self, urls, scraper, session, skip_images, 
+    def process_urls_parallel(self, urls, scraper, skip_images, 
                              dry_run, workers, batch_size, checkpoint_file, stats, add_manufacturer_tag):
         """Process URLs in parallel using a thread pool"""
         # Set up a thread for reporting statistics
@@ -335,6 +353,9 @@ class Command(BaseCommand):
         for url in urls:
             work_queue.put(url)
         
+        # URLs whose processing finished, for the checkpoints
+        processed_urls = []
+        
         # Create and start worker threads
         def worker_thread():
             while not stop_processing:
@@ -347,7 +368,6 @@ class Command(BaseCommand):
                     result = self._process_single_url(
                         url, 
                         scraper, 
-                        session, 
                         skip_images, 
                         dry_run,
                         add_manufacturer_tag
@@ -355,6 +375,7 @@ class Command(BaseCommand):
                     
                     # Update statistics
                     with stats_lock:
+                        processed_urls.append(url)
                         stats['processed'] += 1
                         if result:
                             if result.get('success', False):
@@ -368,12 +389,12 @@ class Command(BaseCommand):
                             
                     # Save checkpoint after each batch
                     if stats['processed'] % batch_size == 0:
-                        processed_urls = [u for u in urls if u not in [i for i in work_queue.queue]]
                         self._save_checkpoint(checkpoint_file, stats, urls, processed_urls)
                         
                 except Exception as e:
                     logger.exception(f"Error processing URL {url}: {str(e)}")
                     with stats_lock:
+                        processed_urls.append(url)
                         stats['processed'] += 1
                         stats['failed'] += 1
                 
@@ -398,16 +419,14 @@ class Command(BaseCommand):
         # Save final checkpoint
         self._save_checkpoint(checkpoint_file, stats, urls, urls)
 
-    def _process_single_url(self, url, scraper, session, skip_images, dry_run, add_manufacturer_tag):
+    def _process_single_url(self, url, scraper, skip_images, dry_run, add_manufacturer_tag):
         """Process a single URL and send the data to the API"""
         logger.info(f"Processing URL: {url}")
         
         try:
-            # Extract product data using scraper
-            with session.get(url) as response:
-                response.raise_for_status()
-                soup = BeautifulSoup(response.text, 'html.parser')
-                product_data = scraper.scrape(url)
+            # Extract product data using scraper; the page is fetched once, through
+            # the scraper's retrying session, and parsed once
+            product_data = scraper.scrape(url)
             
             # Extract relevant fields
             product_name = product_data.get('name', '')
@@ -671,7 +690,8 @@ class Command(BaseCommand):
         elif options['url_file']:
             try:
                 with open(options['url_file'], 'r') as f:
-                    urls = [line.strip() for line in f if line.strip()]
+                    # Lines may carry the product name after the URL ("url | name")
+                    urls = [line.split(' | ', 1)[0].strip() for line in f if line.strip()]
             except Exception as e:
                 self.stderr.write(f"Error reading URL file: {str(e)}")
                 return []
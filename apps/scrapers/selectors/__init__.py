@@ -34,6 +34,8 @@ from .file_selector import FileSelector
 from .zip_selector import ZipSelector
 from .value_to_single_selector import ValueToSingleSelector
 from .regex_selector import RegexSelector
+from .compiler import CompiledSelector
+from .registry import SelectorRegistry, selector_registry
 
 __all__ = [
     # Base classes
@@ -47,5 +49,8 @@ __all__ = [
     'SeriesSelector', 'ForEachSelector', 'MappingSelector', 
     'PlainTextSelector', 'ConcatSelector', 'PrintSelector', 
     'FileSelector', 'ZipSelector', 'ValueToSingleSelector',
-    'RegexSelector'
+    'RegexSelector',
+
+    # Compiled programs and the shared YAML cache
+    'CompiledSelector', 'SelectorRegistry', 'selector_registry'
 ]
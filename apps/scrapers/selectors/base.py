@@ -82,6 +82,17 @@ class Selector(ABC):
     """Abstract base class for all selector operations."""
     expected_selected: Optional[Union[SelectedType, List[SelectedType]]] = None
 
+    def mutates_input(self) -> bool:
+        """
+        Whether this selector modifies the tree held by its input.
+
+        Selectors are read-only by default, which lets MappingSelector, ZipSelector
+        and ConcatSelector hand one parsed tree to all of their children. A selector
+        that edits the tree in place must override this to return True; composite
+        selectors return True if any of their children do.
+        """
+        return False
+
     def validate_selected_type(self, selected):
         """Checks if the input Selected object's type matches expectations."""
         if self.expected_selected is None:
@@ -116,6 +127,16 @@ class Selector(ABC):
         # log.debug(f"{type(self).__name__} returned {result}")
         return result
 
+    def compile(self, input_type: SelectedType = SelectedType.SINGLE):
+        """
+        Lower this selector tree into a CompiledSelector.
+
+        The compiled program validates types once, merges adjacent steps and runs
+        without allocating a Selected wrapper per node. See compiler.py.
+        """
+        from apps.scrapers.selectors.compiler import CompiledSelector
+        return CompiledSelector(self, input_type)
+
     # --- YAML Loading Factory Methods ---
 
     @classmethod
@@ -259,3 +280,23 @@ class Selector(ABC):
     def toYamlDict(self):
         """Returns the YAML dictionary representation of the selector."""
         pass # Must be implemented by subclasses
+
+
+# --- Shared Input Helpers ---
+
+def shared_input(selector, selected):
+    """
+    Return the input to hand to one of several selectors applied to the same Selected.
+
+    The input is shared as-is unless the selector mutates its input, in which case it
+    receives its own deep copy so its changes cannot leak into its siblings.
+
+    A shared element keeps its place in the document, so a ParentSelector under a
+    MappingSelector, ZipSelector or ConcatSelector can walk above the element the
+    composite was applied to. Deep copies used to cut the tree at that element,
+    which stopped ParentSelector there; a selector that mutates its input still
+    gets such a detached copy.
+    """
+    if selector.mutates_input():
+        return deepcopy(selected)
+    return selected
@@ -42,11 +42,21 @@ class BrSplitSelector(Selector):
         """
         super().select(selected)
         
+        segments = self.split_segments(selected.value)
+        return Selected([Selected(soup, SelectedType.SINGLE) for soup in segments], SelectedType.MULTIPLE)
+
+    def split_segments(self, value):
+        """
+        Split an HTML element by <br/> tags.
+        
+        Args:
+            value: A BeautifulSoup element (or anything that renders to HTML via str())
+            
+        Returns:
+            A list of BeautifulSoup objects, one for each segment
+        """
         # Get the HTML representation
-        if hasattr(selected.value, 'decode'):
-            html_content = str(selected.value)
-        else:
-            html_content = str(selected.value)
+        html_content = str(value)
         
         log.debug(f"BrSplitSelector processing HTML: {html_content[:100]}...")
         
@@ -54,7 +64,7 @@ class BrSplitSelector(Selector):
         segments = self.br_pattern.split(html_content)
         log.debug(f"BrSplitSelector found {len(segments)} segments")
         
-        # Create a Selected SINGLE for each segment
+        # Parse each segment into its own BeautifulSoup object
         result_segments = []
         for i, segment in enumerate(segments):
             if not segment.strip() and not self.include_empty:
@@ -74,12 +84,12 @@ class BrSplitSelector(Selector):
             # Create a new BeautifulSoup object for each segment
             try:
                 soup = BeautifulSoup(segment, 'html.parser')
-                result_segments.append(Selected(soup, SelectedType.SINGLE))
+                result_segments.append(soup)
                 log.debug(f"BrSplitSelector added segment {i}: {segment[:50]}...")
             except Exception as e:
                 log.error(f"BrSplitSelector error processing segment {i}: {e}")
                 
-        return Selected(result_segments, SelectedType.MULTIPLE)
+        return result_segments
 
     def toYamlDict(self):
         """Convert to YAML dictionary representation."""
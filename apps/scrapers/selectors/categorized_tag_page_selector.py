@@ -8,6 +8,7 @@ from typing import Dict, List, Optional
 from .base import Selector, Selected, SelectedType
 from apps.categorized_tags.models import CategorizedTag, TagCategory
 from apps.base_site.models import LabEquipmentPage
+from apps.scrapers.utils.html_parser import make_soup
 
 log = logging.getLogger(__name__)
 
@@ -85,7 +86,7 @@ class CategorizedTagPageSelector(Selector):
                     continue
                 
                 # Parse the page
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = make_soup(response.text)
                 
                 # Find product links
                 product_links = soup.select(self.product_links_selector)
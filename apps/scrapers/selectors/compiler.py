@@ -0,0 +1,754 @@
+#!/usr/bin/env python3
+# apps/scrapers/selectors/compiler.py
+
+"""
+Selector compiler.
+
+Lowers a tree of Selector objects into a CompiledSelector: a flat program of plain
+Python callables that pass raw values (BeautifulSoup elements, strings, lists) from
+one step to the next instead of Selected wrappers.
+
+Compilation does the work the interpreted selectors repeat on every call:
+- Input types are checked once, by tracking the type of the value flowing between
+  steps. A mismatch compiles into a step that raises the same error at run time, so
+  error strategies such as "mark_none" behave exactly as they do when interpreted.
+- Series (including series loaded through FileSelector) are flattened into their parent.
+  Each step remembers the chain of series it came from, so its errors are re-raised
+  with the same "Error in X within SeriesSelector" context the interpreted tree adds.
+- Adjacent steps are merged: css -> index becomes a single indexed lookup (index 0
+  uses select_one), and an indexed css lookup followed by text/html/attr becomes one step.
+- CSS selectors and regex patterns are compiled once.
+
+Selectors the compiler does not know are run through their own select() method, so
+custom selectors keep working inside a compiled program.
+"""
+
+import logging
+import os
+import re
+from copy import deepcopy
+
+import bs4
+import soupsieve
+from bs4 import BeautifulSoup
+
+from .base import Selector, Selected, SelectedType
+from .attr_selector import AttrSelector
+from .br_split_selector import BrSplitSelector
+from .concat_selector import ConcatSelector
+from .css_selector import CSSSelector
+from .file_selector import FileSelector
+from .for_each_selector import ForEachSelector
+from .html_selector import HtmlSelector
+from .indexed_selector import IndexedSelector
+from .mapping_selector import MappingSelector
+from .parent_selector import ParentSelector
+from .plain_text_selector import PlainTextSelector
+from .print_selector import PrintSelector
+from .regex_selector import RegexSelector
+from .series_selector import SeriesSelector
+from .split_selector import SplitSelector
+from .text_selector import TextSelector
+from .value_to_single_selector import ValueToSingleSelector
+from .zip_selector import ZipSelector
+
+log = logging.getLogger(__name__)
+
+
+# --- Static types ---
+
+class Kind:
+    """
+    The static type of the raw value passed between compiled steps.
+
+    selected_type is None for values still wrapped in a Selected (the output of a
+    selector the compiler does not know). MULTIPLE kinds also record the kind of
+    their items.
+    """
+    __slots__ = ('selected_type', 'item')
+
+    def __init__(self, selected_type, item=None):
+        self.selected_type = selected_type
+        self.item = item
+
+    def __eq__(self, other):
+        return (isinstance(other, Kind)
+                and self.selected_type == other.selected_type
+                and self.item == other.item)
+
+    def __repr__(self):
+        if self.selected_type is None:
+            return 'ANY'
+        if self.selected_type == SelectedType.MULTIPLE:
+            return f"MULTIPLE[{self.item!r}]"
+        return self.selected_type.name
+
+
+ANY = Kind(None)
+VALUE = Kind(SelectedType.VALUE)
+SINGLE = Kind(SelectedType.SINGLE)
+
+
+def multiple(item):
+    return Kind(SelectedType.MULTIPLE, item)
+
+
+def kind_for(selected_type):
+    """The Kind of a raw input of the given SelectedType."""
+    if selected_type == SelectedType.MULTIPLE:
+        # The items of an incoming MULTIPLE are still Selected objects
+        return multiple(ANY)
+    return Kind(selected_type)
+
+
+def wrap(value, kind):
+    """Turn a raw value of the given kind back into a Selected."""
+    if kind.selected_type is None:
+        return value
+    if kind.selected_type == SelectedType.MULTIPLE:
+        return Selected([wrap(item, kind.item) for item in value], SelectedType.MULTIPLE)
+    return Selected(value, kind.selected_type)
+
+
+def collapse(value, kind):
+    """Equivalent of Selected.collapsed_value for a raw value of the given kind."""
+    if kind.selected_type is None:
+        return value.collapsed_value
+    if kind.selected_type == SelectedType.MULTIPLE:
+        return [collapse(item, kind.item) for item in value]
+    if kind.selected_type == SelectedType.SINGLE:
+        if isinstance(value, bs4.element.Tag):
+            return value.get_text(strip=True)
+        return str(value)
+    return value
+
+
+# --- Program representation ---
+
+class Step:
+    """
+    One instruction of a compiled program.
+
+    context holds, outermost first, the name of the selector the step came from in
+    each SeriesSelector it was flattened out of. index_context is the context of an
+    IndexedSelector merged into a css step, whose IndexErrors are reported there.
+    """
+    __slots__ = ('op', 'args', 'in_kind', 'out_kind', 'context', 'index_context')
+
+    def __init__(self, op, args, in_kind, out_kind, context=(), index_context=None):
+        self.op = op
+        self.args = args
+        self.in_kind = in_kind
+        self.out_kind = out_kind
+        self.context = context
+        self.index_context = index_context
+
+    def __repr__(self):
+        return f"Step({self.op}, {self.in_kind!r} -> {self.out_kind!r})"
+
+
+def _fail(exc_type, message, in_kind, out_kind=ANY):
+    return Step('fail', (exc_type, message), in_kind, out_kind)
+
+
+def _type_error(selector, kind):
+    # Same message as Selector.validate_selected_type
+    return (f"{type(selector).__name__} expects input of type "
+            f"{_expected_names(selector)}, but received {kind.selected_type.name}.")
+
+
+def _accepts(selector, kind):
+    expected = selector.expected_selected
+    if expected is None:
+        return True
+    if not isinstance(expected, list):
+        expected = [expected]
+    return kind.selected_type in expected
+
+
+def _expected_names(selector):
+    expected = selector.expected_selected
+    if not isinstance(expected, list):
+        expected = [expected]
+    return " or ".join(st.name for st in expected)
+
+
+# --- Lowering: Selector tree -> list of Steps ---
+
+def lower(selector, kind, file_stack=(), included=None):
+    """
+    Lower a selector applied to an input of the given kind into a list of Steps.
+
+    The absolute paths of files inlined through FileSelector are added to included.
+
+    Returns:
+        (steps, output kind)
+    """
+    # A value still wrapped in a Selected can only be handled by the selector itself
+    if kind.selected_type is None and not isinstance(selector, (PlainTextSelector, FileSelector)):
+        return [Step('call', (selector, kind), kind, ANY)], ANY
+
+    if isinstance(selector, SeriesSelector):
+        # The series checks its input itself, outside the context of its first step
+        if not _accepts(selector, kind):
+            return [_fail(TypeError, _type_error(selector, kind), kind)], ANY
+        steps = []
+        for child in selector.selectors:
+            child_steps, kind = lower(child, kind, file_stack, included)
+            name = type(child).__name__
+            for step in child_steps:
+                step.context = (name,) + step.context
+                if step.index_context is not None:
+                    step.index_context = (name,) + step.index_context
+            steps.extend(child_steps)
+            if child_steps and child_steps[-1].op == 'fail':
+                # Everything after a failing step is unreachable
+                break
+        return steps, kind
+
+    if isinstance(selector, FileSelector):
+        path = os.path.abspath(selector.file_path)
+        if path in file_stack:
+            raise ValueError(f"Selector file '{selector.file_path}' includes itself")
+        if included is not None:
+            included.add(path)
+        return lower(selector.load(), kind, file_stack + (path,), included)
+
+    if isinstance(selector, CSSSelector):
+        if kind != SINGLE:
+            return [_fail(TypeError, _type_error(selector, kind), kind)], ANY
+        try:
+            compiled_css = soupsieve.compile(selector.css_selector_text)
+        except Exception as e:
+            message = f"Error applying CSS selector '{selector.css_selector_text}': {e}"
+            return [_fail(RuntimeError, message, kind)], ANY
+        args = (compiled_css, selector.css_selector_text, selector.index, False)
+        if selector.index is None:
+            return [Step('css', args, kind, multiple(SINGLE))], multiple(SINGLE)
+        return [Step('css', args, kind, SINGLE)], SINGLE
+
+    if isinstance(selector, IndexedSelector):
+        if kind.selected_type != SelectedType.MULTIPLE:
+            return [_fail(TypeError, _type_error(selector, kind), kind)], ANY
+        out = kind.item if isinstance(selector.index, int) else kind
+        return [Step('index', (selector.index,), kind, out)], out
+
+    if isinstance(selector, TextSelector):
+        if kind != SINGLE:
+            return [_fail(TypeError, _type_error(selector, kind), kind)], ANY
+        return [Step('text', (), kind, VALUE)], VALUE
+
+    if isinstance(selector, HtmlSelector):
+        if kind != SINGLE:
+            return [_fail(TypeError, _type_error(selector, kind), kind)], ANY
+        return [Step('html', (), kind, VALUE)], VALUE
+
+    if isinstance(selector, AttrSelector):
+        if kind != SINGLE:
+            return [_fail(TypeError, _type_error(selector, kind), kind)], ANY
+        return [Step('attr', (selector.attr,), kind, VALUE)], VALUE
+
+    if isinstance(selector, SplitSelector):
+        if kind not in (VALUE, SINGLE):
+            return [_fail(TypeError, _type_error(selector, kind), kind)], ANY
+        out = multiple(VALUE)
+        return [Step('split', (selector.delimiter, kind == SINGLE), kind, out)], out
+
+    if isinstance(selector, BrSplitSelector):
+        if kind != SINGLE:
+            return [_fail(TypeError, _type_error(selector, kind), kind)], ANY
+        out = multiple(SINGLE)
+        return [Step('br_split', (selector,), kind, out)], out
+
+    if isinstance(selector, RegexSelector):
+        if kind not in (VALUE, SINGLE):
+            # The interpreted selector returns None rather than raising on a type mismatch
+            return [Step('constant', (None,), kind, VALUE)], VALUE
+        try:
+            pattern = re.compile(selector.pattern, re.DOTALL)
+        except (re.error, TypeError) as e:
+            log.error(f"RegexSelector regex error with pattern '{selector.pattern}': {e}")
+            return [Step('constant', (None,), kind, VALUE)], VALUE
+        return [Step('regex', (pattern, selector.group, kind == VALUE), kind, VALUE)], VALUE
+
+    if isinstance(selector, PlainTextSelector):
+        return [Step('constant', (selector.text,), kind, VALUE)], VALUE
+
+    if isinstance(selector, ValueToSingleSelector):
+        if kind != VALUE:
+            message = f"ValueToSingleSelector expects input of type VALUE, but got {kind!r}"
+            return [_fail(RuntimeError, message, kind)], ANY
+        return [Step('to_single', (selector.parser,), kind, SINGLE)], SINGLE
+
+    if isinstance(selector, ParentSelector):
+        if kind != SINGLE:
+            message = f"ParentSelector expects input of type SINGLE, but got {kind!r}"
+            return [_fail(RuntimeError, message, kind)], ANY
+        return [Step('parent', (selector,), kind, SINGLE)], SINGLE
+
+    if isinstance(selector, PrintSelector):
+        return [Step('print', (selector, kind), kind, kind)], kind
+
+    if isinstance(selector, ForEachSelector):
+        if kind.selected_type != SelectedType.MULTIPLE:
+            return [_fail(TypeError, _type_error(selector, kind), kind)], ANY
+        body_steps, body_kind = lower(selector.selector, kind.item, file_stack, included)
+        out = multiple(body_kind)
+        args = (body_steps, build(body_steps), selector.skip_on_fail)
+        return [Step('for_each', args, kind, out)], out
+
+    if isinstance(selector, MappingSelector):
+        if kind != SINGLE:
+            return [_fail(TypeError, _type_error(selector, kind), kind)], ANY
+        entries = []
+        for key, child in selector.mapping.items():
+            child_steps, child_kind = lower(child, kind, file_stack, included)
+            entries.append((key, build(child_steps), child_kind, child.mutates_input()))
+        return [Step('mapping', (entries, selector.error_strategy), kind, VALUE)], VALUE
+
+    if isinstance(selector, ZipSelector):
+        keys_steps, keys_kind = lower(selector.keys_selector, kind, file_stack, included)
+        vals_steps, vals_kind = lower(selector.vals_selector, kind, file_stack, included)
+        args = (
+            (build(keys_steps), keys_kind, selector.keys_selector.mutates_input()),
+            (build(vals_steps), vals_kind, selector.vals_selector.mutates_input()),
+        )
+        return [Step('zip', args, kind, VALUE)], VALUE
+
+    if isinstance(selector, ConcatSelector):
+        first_steps, first_kind = lower(selector.first, kind, file_stack, included)
+        second_steps, second_kind = lower(selector.second, kind, file_stack, included)
+        args = (
+            (build(first_steps), first_kind, selector.first.mutates_input()),
+            (build(second_steps), second_kind, selector.second.mutates_input()),
+        )
+        return [Step('concat', args, kind, VALUE)], VALUE
+
+    # Unknown selector (e.g. CategorizedTagPageSelector): let it run itself
+    return [Step('call', (selector, kind), kind, ANY)], ANY
+
+
+def optimize(steps):
+    """Merge adjacent steps of a flat program."""
+    merged = []
+    for step in steps:
+        previous = merged[-1] if merged else None
+
+        # css (all matches) -> integer index  =>  indexed css lookup, reporting a
+        # missing element the way IndexedSelector does
+        if (previous is not None and previous.op == 'css' and previous.args[2] is None
+                and step.op == 'index' and isinstance(step.args[0], int)):
+            compiled_css, css_text, _, _ = previous.args
+            merged[-1] = Step('css', (compiled_css, css_text, step.args[0], True), previous.in_kind,
+                              step.out_kind, previous.context, step.context)
+            continue
+
+        # indexed css lookup -> text/html/attr  =>  one element step (these cannot
+        # fail on the element a css lookup returns, so their context is not needed)
+        if (previous is not None and previous.op == 'css' and previous.args[2] is not None
+                and step.op in ('text', 'html', 'attr')):
+            merged[-1] = Step('css_' + step.op, previous.args + step.args, previous.in_kind,
+                              step.out_kind, previous.context, previous.index_context)
+            continue
+
+        merged.append(step)
+    return merged
+
+
+# --- Code generation: Steps -> callables ---
+
+def build(steps):
+    """
+    Turn a list of Steps into a single callable on raw values.
+
+    Errors are re-raised with the SeriesSelector context of the step that raised
+    them, as the interpreted series would.
+    """
+    steps = optimize(steps)
+    ops = tuple(_OP_BUILDERS[step.op](*step.args) for step in steps)
+    if not ops:
+        return _identity
+    if len(ops) == 1 and not steps[0].context:
+        return ops[0]
+
+    def run(value):
+        done = 0
+        try:
+            for op in ops:
+                value = op(value)
+                done += 1
+            return value
+        except Exception as e:
+            raise _in_context(e, steps[done])
+    return run
+
+
+def _in_context(error, step):
+    """Wrap an error raised by step in the errors of the series it came from."""
+    context = step.context
+    if step.index_context is not None and isinstance(error, IndexError):
+        context = step.index_context
+    for name in reversed(context):
+        wrapped = RuntimeError(f"Error in {name} within SeriesSelector: {error}")
+        wrapped.__cause__ = error
+        error = wrapped
+    return error
+
+
+def _identity(value):
+    return value
+
+
+def _build_fail(exc_type, message):
+    def run(value):
+        raise exc_type(message)
+    return run
+
+
+def _find_by_css(compiled_css, css_text, index, from_indexed):
+    if index is None:
+        def run(value):
+            try:
+                return value.select(compiled_css)
+            except Exception as e:
+                raise RuntimeError(f"Error applying CSS selector '{css_text}': {e}") from e
+        return run
+
+    def out_of_bounds(count):
+        if from_indexed:
+            return IndexError(f"Index {index} out of bounds for list of length {count}")
+        return IndexError(f"Index {index} out of bounds for CSS selector '{css_text}' (found {count} elements)")
+
+    if index == 0:
+        def run(value):
+            try:
+                element = value.select_one(compiled_css)
+            except Exception as e:
+                raise RuntimeError(f"Error applying CSS selector '{css_text}': {e}") from e
+            if element is None:
+                raise out_of_bounds(0)
+            return element
+        return run
+
+    def run(value):
+        try:
+            elements = value.select(compiled_css)
+        except Exception as e:
+            raise RuntimeError(f"Error applying CSS selector '{css_text}': {e}") from e
+        try:
+            return elements[index]
+        except IndexError:
+            raise out_of_bounds(len(elements))
+    return run
+
+
+def _element_text(element):
+    try:
+        return element.get_text(strip=True)
+    except AttributeError:
+        return str(element).strip()
+
+
+def _element_html(element):
+    if isinstance(element, bs4.element.Tag):
+        return element.prettify().strip()
+    return str(element).strip()
+
+
+def _element_attr(element, attr):
+    if not isinstance(element, bs4.element.Tag):
+        raise TypeError(f"AttrSelector requires a bs4.element.Tag, but received {type(element)}")
+    return element.get(attr)
+
+
+def _build_text():
+    return _element_text
+
+
+def _build_html():
+    return _element_html
+
+
+def _build_attr(attr):
+    def run(value):
+        return _element_attr(value, attr)
+    return run
+
+
+def _build_css_text(compiled_css, css_text, index, from_indexed):
+    find = _find_by_css(compiled_css, css_text, index, from_indexed)
+
+    def run(value):
+        return _element_text(find(value))
+    return run
+
+
+def _build_css_html(compiled_css, css_text, index, from_indexed):
+    find = _find_by_css(compiled_css, css_text, index, from_indexed)
+
+    def run(value):
+        return _element_html(find(value))
+    return run
+
+
+def _build_css_attr(compiled_css, css_text, index, from_indexed, attr):
+    find = _find_by_css(compiled_css, css_text, index, from_indexed)
+
+    def run(value):
+        return _element_attr(find(value), attr)
+    return run
+
+
+def _build_index(index):
+    if isinstance(index, int):
+        def run(value):
+            try:
+                return value[index]
+            except IndexError:
+                raise IndexError(f"Index {index} out of bounds for list of length {len(value)}")
+        return run
+
+    def run(value):
+        return value[index]
+    return run
+
+
+def _build_split(delimiter, from_single):
+    def run(value):
+        if from_single:
+            try:
+                text = value.get_text()
+            except AttributeError:
+                text = str(value)
+        else:
+            text = str(value)
+        return [part.strip() for part in text.split(delimiter) if part.strip()]
+    return run
+
+
+def _build_br_split(selector):
+    return selector.split_segments
+
+
+def _build_regex(pattern, group, from_value):
+    def run(value):
+        if from_value:
+            text = str(value) if value is not None else ""
+        else:
+            text = str(value)
+        try:
+            match = pattern.search(text)
+            if match:
+                return match.group(group).strip()
+            return None
+        except Exception as e:
+            log.error(f"RegexSelector error with pattern '{pattern.pattern}': {e}")
+            return None
+    return run
+
+
+def _build_constant(constant):
+    def run(value):
+        return constant
+    return run
+
+
+def _build_to_single(parser):
+    def run(value):
+        try:
+            return BeautifulSoup(f"<div>{value}</div>", parser).div
+        except Exception as e:
+            raise RuntimeError(f"Error converting VALUE to SINGLE: {e}")
+    return run
+
+
+def _build_parent(selector):
+    def run(value):
+        try:
+            return selector.find_parent(value)
+        except Exception as e:
+            raise RuntimeError(f"Error finding parent element: {e}")
+    return run
+
+
+def _build_print(selector, kind):
+    def run(value):
+        selector.select(wrap(value, kind))
+        return value
+    return run
+
+
+def _build_call(selector, kind):
+    def run(value):
+        return selector.select(wrap(value, kind))
+    return run
+
+
+def _build_for_each(body_steps, body, skip_on_fail):
+    def run(value):
+        results = []
+        for i, item in enumerate(value):
+            try:
+                results.append(body(item))
+            except Exception as e:
+                if skip_on_fail:
+                    log.warning(f"Error processing item at index {i}, skipping: {e}")
+                else:
+                    raise RuntimeError(f"Error at index {i} in ForEachSelector: {e}") from e
+        return results
+    return run
+
+
+def _build_mapping(entries, error_strategy):
+    def run(value):
+        result = {}
+        for key, body, kind, copy_input in entries:
+            try:
+                result[key] = collapse(body(deepcopy(value) if copy_input else value), kind)
+            except Exception as e:
+                if error_strategy == "raise":
+                    raise RuntimeError(f"Error applying selector for key '{key}' in MappingSelector: {e}") from e
+                elif error_strategy == "mark_none":
+                    log.warning(f"Error for key '{key}' in MappingSelector, setting to None: {e}")
+                    result[key] = None
+                else:
+                    log.warning(f"Error for key '{key}' in MappingSelector, skipping entire mapping: {e}")
+                    raise RuntimeError(f"MappingSelector failed with 'skip' strategy due to error for key '{key}': {e}") from e
+        return result
+    return run
+
+
+def _build_zip(keys, vals):
+    keys_body, keys_kind, keys_copy = keys
+    vals_body, vals_kind, vals_copy = vals
+
+    def run(value):
+        keys_result = keys_body(deepcopy(value) if keys_copy else value)
+        vals_result = vals_body(deepcopy(value) if vals_copy else value)
+        key_values = _collapse_items(keys_result, keys_kind, 'keys_selector')
+        val_values = _collapse_items(vals_result, vals_kind, 'vals_selector')
+
+        if len(key_values) != len(val_values):
+            raise ValueError(f"keys and vals must have the same length, but got {len(key_values)} keys and {len(val_values)} vals")
+
+        for i, key_value in enumerate(key_values):
+            try:
+                hash(key_value)
+            except Exception as e:
+                raise TypeError(f"Key at index {i} is not hashable: {e}") from e
+
+        return dict(zip(key_values, val_values))
+    return run
+
+
+def _collapse_items(result, kind, name):
+    """Collapse the items of a ZipSelector operand, which must be a MULTIPLE."""
+    if kind.selected_type is None:
+        if result.selected_type != SelectedType.MULTIPLE:
+            raise TypeError(f"{name} must return a MULTIPLE, but returned {result.selected_type}")
+        return [item.collapsed_value for item in result.value]
+    if kind.selected_type != SelectedType.MULTIPLE:
+        raise TypeError(f"{name} must return a MULTIPLE, but returned {kind.selected_type}")
+    return [collapse(item, kind.item) for item in result]
+
+
+def _build_concat(first, second):
+    first_body, first_kind, first_copy = first
+    second_body, second_kind, second_copy = second
+
+    def run(value):
+        first_value = collapse(first_body(deepcopy(value) if first_copy else value), first_kind)
+        second_value = collapse(second_body(deepcopy(value) if second_copy else value), second_kind)
+        first_text = str(first_value) if first_value is not None else ""
+        second_text = str(second_value) if second_value is not None else ""
+        return first_text + second_text
+    return run
+
+
+_OP_BUILDERS = {
+    'fail': _build_fail,
+    'css': _find_by_css,
+    'css_text': _build_css_text,
+    'css_html': _build_css_html,
+    'css_attr': _build_css_attr,
+    'index': _build_index,
+    'text': _build_text,
+    'html': _build_html,
+    'attr': _build_attr,
+    'split': _build_split,
+    'br_split': _build_br_split,
+    'regex': _build_regex,
+    'constant': _build_constant,
+    'to_single': _build_to_single,
+    'parent': _build_parent,
+    'print': _build_print,
+    'call': _build_call,
+    'for_each': _build_for_each,
+    'mapping': _build_mapping,
+    'zip': _build_zip,
+    'concat': _build_concat,
+}
+
+
+# --- Compiled selector ---
+
+class CompiledSelector(Selector):
+    """
+    A selector tree lowered into a flat program.
+
+    CompiledSelector is a drop-in Selector: select() accepts and returns Selected
+    objects. run() skips the wrappers entirely, taking a raw value (usually a parsed
+    BeautifulSoup document) and returning the collapsed result.
+    """
+
+    def __init__(self, source: Selector, input_type: SelectedType = SelectedType.SINGLE):
+        """
+        Compile a selector.
+
+        Args:
+            source: The Selector tree to compile
+            input_type: The SelectedType of the input the program will be run on
+        """
+        if not isinstance(source, Selector):
+            raise TypeError("CompiledSelector requires a Selector instance")
+        if not isinstance(input_type, SelectedType):
+            raise TypeError("input_type must be an instance of SelectedType Enum")
+
+        self.source = source
+        self.expected_selected = input_type
+        self.input_kind = kind_for(input_type)
+        self.included_files = set()
+        self.steps, self.output_kind = lower(source, self.input_kind, included=self.included_files)
+        self.program = build(self.steps)
+
+    def run(self, value):
+        """Apply the program to a raw input value and return the collapsed result."""
+        return collapse(self.program(value), self.output_kind)
+
+    def select(self, selected):
+        """Apply the program to a Selected object and return a Selected result."""
+        super().select(selected)
+        return wrap(self.program(selected.value), self.output_kind)
+
+    def mutates_input(self):
+        return self.source.mutates_input()
+
+    def toYamlDict(self):
+        """Compiled selectors serialize as their source tree."""
+        return self.source.toYamlDict()
+
+    @staticmethod
+    def fromYamlDict(yaml_dict):
+        """Build and compile a selector from a YAML dictionary."""
+        return CompiledSelector(Selector.fromYamlDict(yaml_dict))
+
+    @staticmethod
+    def fromFilePath(file_path):
+        """
+        Load and compile a selector from a YAML file.
+
+        Compiled programs are shared through the process-wide selector registry and
+        rebuilt when the file, or any file it includes, changes.
+        """
+        from .registry import selector_registry
+        return selector_registry.get_compiled(file_path)
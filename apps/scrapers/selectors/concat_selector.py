@@ -2,9 +2,7 @@
 # apps/scrapers/selectors/concat_selector.py
 
 import logging
-from copy import deepcopy
-
-from .base import Selector, Selected, SelectedType
+from .base import Selector, Selected, SelectedType, shared_input
 
 log = logging.getLogger(__name__)
 
@@ -46,10 +44,10 @@ class ConcatSelector(Selector):
         Returns:
             A Selected of type VALUE containing the concatenated results
         """
-        # We need to use deepcopy to avoid any side effects from the first selector
-        # affecting the second selector's input
-        first_result = self.first.select(deepcopy(selected))
-        second_result = self.second.select(deepcopy(selected))
+        # Both selectors read the same input; a selector that mutates it gets
+        # its own copy so it cannot affect the other one
+        first_result = self.first.select(shared_input(self.first, selected))
+        second_result = self.second.select(shared_input(self.second, selected))
         
         # Extract string values from the results
         # Use collapsed_value to handle different result types
@@ -61,6 +59,10 @@ class ConcatSelector(Selector):
         
         return Selected(result, SelectedType.VALUE)
 
+    def mutates_input(self):
+        """A concat mutates its input if either of its selectors does."""
+        return self.first.mutates_input() or self.second.mutates_input()
+
     def toYamlDict(self):
         """Convert to YAML dictionary representation."""
         return {
@@ -40,25 +40,40 @@ class FileSelector(Selector):
         """
         Get the selector loaded from the file.
         
-        This property lazily loads the selector when first accessed.
+        The selector is loaded on first use through the process-wide selector
+        registry, so every FileSelector pointing at the same file shares one parsed
+        tree, and is kept after that. select() and compile() check it against the file
+        again.
         
         Returns:
             The loaded Selector instance
         """
         if self._selector is None:
-            # Import here to avoid circular imports
-            from .base import Selector
+            self.load()
+        return self._selector
+
+    def load(self):
+        """
+        Look the file up in the selector registry, reloading it if it changed.
+        
+        Returns:
+            The loaded Selector instance
+        """
+        # Import here to avoid circular imports
+        from .registry import selector_registry
+        
+        try:
+            selector = selector_registry.get(self.file_path)
+            if selector is None:
+                raise ValueError(f"Failed to load selector from file: {self.file_path}")
+        except Exception as e:
+            # Add context to the error
+            raise RuntimeError(f"Error loading selector from file '{self.file_path}': {e}") from e
             
-            try:
-                self._selector = Selector.fromFilePath(self.file_path)
-                if self._selector is None:
-                    raise ValueError(f"Failed to load selector from file: {self.file_path}")
-            except Exception as e:
-                # Add context to the error
-                raise RuntimeError(f"Error loading selector from file '{self.file_path}': {e}") from e
-                
+        if selector is not self._selector:
+            self._selector = selector
             # Inherit expected_selected from the loaded selector
-            self.expected_selected = self._selector.expected_selected
+            self.expected_selected = selector.expected_selected
                 
         return self._selector
 
@@ -66,13 +81,19 @@ class FileSelector(Selector):
         """
         Apply the loaded selector to the input.
         
+        The file is checked for changes once per call.
+        
         Args:
             selected: A Selected object matching the expected type of the loaded selector
             
         Returns:
             The result of applying the loaded selector
         """
-        return self.selector.select(selected)
+        return self.load().select(selected)
+
+    def mutates_input(self):
+        """Delegates to the selector loaded from the file."""
+        return self.selector.mutates_input()
 
     def toYamlDict(self):
         """Convert to YAML dictionary representation."""
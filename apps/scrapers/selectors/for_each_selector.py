@@ -72,6 +72,10 @@ class ForEachSelector(Selector):
                     
         return Selected(results, SelectedType.MULTIPLE)
 
+    def mutates_input(self):
+        """Mutates its input if the per-item selector does."""
+        return self.selector.mutates_input()
+
     def toYamlDict(self):
         """Convert to YAML dictionary representation."""
         result = {
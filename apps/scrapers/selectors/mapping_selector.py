@@ -3,9 +3,7 @@
 
 import logging
 from typing import Dict, Optional, Literal
-from copy import deepcopy
-
-from .base import Selector, Selected, SelectedType
+from .base import Selector, Selected, SelectedType, shared_input
 
 log = logging.getLogger(__name__)
 
@@ -66,8 +64,8 @@ class MappingSelector(Selector):
         result = {}
         for key, selector in self.mapping.items():
             try:
-                # Use deepcopy to ensure selector doesn't modify the input for other selectors
-                selector_result = selector.select(deepcopy(selected))
+                # All keys read the same tree; only mutating selectors get a private copy
+                selector_result = selector.select(shared_input(selector, selected))
                 result[key] = selector_result.collapsed_value
             except Exception as e:
                 if self.error_strategy == "raise":
@@ -82,6 +80,10 @@ class MappingSelector(Selector):
                     
         return Selected(result, SelectedType.VALUE)
 
+    def mutates_input(self):
+        """A mapping mutates its input if any of its selectors do."""
+        return any(selector.mutates_input() for selector in self.mapping.values())
+
     def toYamlDict(self):
         """Convert to YAML dictionary representation."""
         mapping_dict = {}
@@ -14,6 +14,10 @@ class ParentSelector(Selector):
     
     This selector expects a SINGLE type input (a BeautifulSoup element) and outputs
     the parent element as a SINGLE type.
+
+    Parents are looked up in the whole document, including above the element a
+    MappingSelector, ZipSelector or ConcatSelector was applied to (see shared_input
+    in base.py).
     """
     
     def __init__(self, levels: int = 1):
@@ -42,28 +46,38 @@ class ParentSelector(Selector):
             raise RuntimeError(f"ParentSelector expects input of type SINGLE, but got {selected.selected_type}")
         
         try:
-            element = selected.value
-            
-            # If this is a strong tag, get its direct parent (which should be a paragraph)
-            if element.name == 'strong':
-                if element.parent:
-                    log.debug(f"Found parent of strong tag: {element.parent.name}")
-                    return Selected(element.parent, SelectedType.SINGLE)
-                else:
-                    log.warning("Strong tag has no parent")
-            
-            # If we have levels specified, go up that many levels in hierarchy
-            for i in range(self.levels):
-                if element.parent and element.parent.name != '[document]':
-                    element = element.parent
-                    log.debug(f"Went up to parent: {element.name}")
-                else:
-                    log.warning(f"Reached the top of the document at level {i}, cannot go up further")
-                    break
-                    
-            return Selected(element, SelectedType.SINGLE)
+            return Selected(self.find_parent(selected.value), SelectedType.SINGLE)
         except Exception as e:
             raise RuntimeError(f"Error finding parent element: {e}")
+
+    def find_parent(self, element):
+        """
+        Walk up from a BeautifulSoup element to the configured ancestor.
+        
+        Args:
+            element: A BeautifulSoup element.
+            
+        Returns:
+            The ancestor element (or the element itself if it has no parent).
+        """
+        # If this is a strong tag, get its direct parent (which should be a paragraph)
+        if element.name == 'strong':
+            if element.parent:
+                log.debug(f"Found parent of strong tag: {element.parent.name}")
+                return element.parent
+            else:
+                log.warning("Strong tag has no parent")
+        
+        # If we have levels specified, go up that many levels in hierarchy
+        for i in range(self.levels):
+            if element.parent and element.parent.name != '[document]':
+                element = element.parent
+                log.debug(f"Went up to parent: {element.name}")
+            else:
+                log.warning(f"Reached the top of the document at level {i}, cannot go up further")
+                break
+                
+        return element
     
     @classmethod
     def fromYamlDict(cls, yaml_dict: Dict[str, Any]) -> "ParentSelector":
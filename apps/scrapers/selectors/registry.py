@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# apps/scrapers/selectors/registry.py
+
+"""
+Process-wide cache of selectors loaded from YAML files.
+
+Loading a selector configuration means reading and parsing YAML and constructing the
+selector tree, and a top-level mapping.yaml fans out to a dozen file_selector files.
+The registry keeps constructed (and, on request, compiled) selectors keyed by absolute
+path, so every Scraper, FileSelector and management command in a process shares them.
+
+Entries are validated against the file's modification time and size on every lookup,
+so editing a YAML file takes effect without a restart. Compiled programs also record
+the files they inlined and are rebuilt when any of them changes. The cache is bounded
+(least recently used entries are evicted first) and can be cleared explicitly.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from .base import Selector
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 128
+
+
+class _Entry:
+    """A cached file: its stamp, the constructed selector and its compiled program."""
+    __slots__ = ('stamp', 'selector', 'compiled', 'dependencies')
+
+    def __init__(self, stamp, selector):
+        self.stamp = stamp
+        self.selector = selector
+        self.compiled = None
+        # Stamps of the files inlined into the compiled program, by absolute path
+        self.dependencies = {}
+
+
+class SelectorRegistry:
+    """A bounded, thread-safe cache of selectors keyed by YAML file path."""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        Initialize a SelectorRegistry.
+
+        Args:
+            max_size: Maximum number of files to keep; least recently used entries are evicted
+        """
+        if not isinstance(max_size, int) or max_size < 1:
+            raise ValueError("max_size must be a positive integer")
+
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _stamp(path):
+        """Identify a version of a file by its modification time and size."""
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _entry(self, file_path):
+        """Return a fresh cache entry for the file, loading it if needed."""
+        path = os.path.abspath(file_path)
+        stamp = self._stamp(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.stamp == stamp:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+
+        # Load outside the lock: a file may include other files through FileSelector
+        selector = Selector.fromFilePath(path)
+
+        with self._lock:
+            self.misses += 1
+            entry = _Entry(stamp, selector)
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                log.debug(f"SelectorRegistry evicted {evicted}")
+            return entry
+
+    def get(self, file_path):
+        """
+        Get the selector defined in a YAML file.
+
+        The returned selector is shared by every caller in the process and must not be modified.
+        """
+        return self._entry(file_path).selector
+
+    def get_compiled(self, file_path):
+        """
+        Get the compiled program for a YAML file.
+
+        The program is rebuilt if the file or any file it includes has changed.
+        """
+        entry = self._entry(file_path)
+
+        with self._lock:
+            compiled = entry.compiled
+            dependencies = dict(entry.dependencies)
+
+        if compiled is not None and self._dependencies_fresh(dependencies):
+            return compiled
+
+        compiled = entry.selector.compile()
+        dependencies = {}
+        for path in compiled.included_files:
+            try:
+                dependencies[path] = self._stamp(path)
+            except OSError:
+                dependencies[path] = None
+
+        with self._lock:
+            entry.compiled = compiled
+            entry.dependencies = dependencies
+        return compiled
+
+    def _dependencies_fresh(self, dependencies):
+        for path, stamp in dependencies.items():
+            try:
+                if self._stamp(path) != stamp:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def invalidate(self, file_path=None):
+        """
+        Drop cached selectors.
+
+        Args:
+            file_path: The file to drop; if None, the whole cache is cleared
+        """
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(file_path), None)
+
+    def __contains__(self, file_path):
+        with self._lock:
+            return os.path.abspath(file_path) in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# The registry shared by the whole process
+selector_registry = SelectorRegistry()
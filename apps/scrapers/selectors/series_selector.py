@@ -82,6 +82,10 @@ class SeriesSelector(Selector):
         log.debug(f"SeriesSelector completed with result: {current}")        
         return current
 
+    def mutates_input(self):
+        """A series mutates its input if any of its steps do."""
+        return any(selector.mutates_input() for selector in self.selectors)
+
     def toYamlDict(self):
         """Convert to YAML list representation."""
         return [selector.toYamlDict() for selector in self.selectors]
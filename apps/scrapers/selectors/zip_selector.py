@@ -2,9 +2,7 @@
 # apps/scrapers/selectors/zip_selector.py
 
 import logging
-from copy import deepcopy
-
-from .base import Selector, Selected, SelectedType
+from .base import Selector, Selected, SelectedType, shared_input
 
 log = logging.getLogger(__name__)
 
@@ -51,9 +49,9 @@ class ZipSelector(Selector):
             A Selected of type VALUE containing the resulting dictionary
         """
         # Apply selectors to get keys and values
-        # Use deepcopy to prevent side effects between selectors
-        keys_result = self.keys_selector.select(deepcopy(selected))
-        vals_result = self.vals_selector.select(deepcopy(selected))
+        # Both selectors read the same tree unless one of them mutates it
+        keys_result = self.keys_selector.select(shared_input(self.keys_selector, selected))
+        vals_result = self.vals_selector.select(shared_input(self.vals_selector, selected))
         
         # Verify both results are MULTIPLE type
         if keys_result.selected_type != SelectedType.MULTIPLE:
@@ -97,6 +95,10 @@ class ZipSelector(Selector):
         
         return Selected(result, SelectedType.VALUE)
 
+    def mutates_input(self):
+        """A zip mutates its input if either of its selectors does."""
+        return self.keys_selector.mutates_input() or self.vals_selector.mutates_input()
+
     def toYamlDict(self):
         """Convert to YAML dictionary representation."""
         return {
@@ -0,0 +1,683 @@
+import copy
+import datetime
+import glob
+import importlib.util
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from apps.ai_processing.utils import preprocess_html
+from apps.scrapers.Scrapers import Scraper
+from apps.scrapers.selectors.attr_selector import AttrSelector
+from apps.scrapers.selectors.base import Selected, SelectedType, Selector
+from apps.scrapers.selectors.categorized_tag_page_selector import CategorizedTagPageSelector
+from apps.scrapers.selectors.concat_selector import ConcatSelector
+from apps.scrapers.selectors.css_selector import CSSSelector
+from apps.scrapers.selectors.for_each_selector import ForEachSelector
+from apps.scrapers.selectors.indexed_selector import IndexedSelector
+from apps.scrapers.selectors.mapping_selector import MappingSelector
+from apps.scrapers.selectors.parent_selector import ParentSelector
+from apps.scrapers.selectors.series_selector import SeriesSelector
+from apps.scrapers.selectors.text_selector import TextSelector
+from apps.scrapers.selectors.zip_selector import ZipSelector
+from apps.scrapers.selectors.file_selector import FileSelector
+from apps.scrapers.selectors.registry import SelectorRegistry, selector_registry
+from apps.scrapers.utils import html_parser
+from apps.scrapers.utils.crawler import AsyncCrawler, normalize_url
+from apps.scrapers.utils.debug_artifacts import TRUNCATION_MARKER, ArtifactRecorder
+from apps.scrapers.utils.html_parser import available_parsers, get_html_parser, make_soup
+
+SCRAPERS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HTML_FIXTURES = [
+    os.path.join(settings.BASE_DIR, name)
+    for name in (
+        'product_page.html',
+        'sample_original.html',
+        'clean_original.html',
+        'fix_original.html',
+        os.path.join('scripts', 'debug_page_1747413378.html'),
+    )
+]
+
+MAPPING_CONFIGS = [
+    os.path.join(SCRAPERS_DIR, 'triadscientific-yamls', 'mapping.yaml'),
+    os.path.join(SCRAPERS_DIR, 'airscience-yamls', 'mapping.yaml'),
+]
+
+DEBUG_PAGES = [
+    os.path.join(settings.BASE_DIR, 'scripts', 'debug_page_1747413378.html'),
+    os.path.join(settings.BASE_DIR, 'scripts', 'debug_page_1747413447.html'),
+]
+
+
+def _load_url_discovery():
+    # The module lives in a hyphenated directory, so it is loaded by path as in the importer
+    path = os.path.join(SCRAPERS_DIR, 'triadscientific-yamls', 'url_discovery.py')
+    spec = importlib.util.spec_from_file_location('url_discovery', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Configuration of the Triad URL discovery, not selector definitions
+URL_DISCOVERY_CONFIGS = {
+    os.path.join(SCRAPERS_DIR, 'triadscientific-yamls', name)
+    for name in ('categories.yaml', 'pagination.yaml', 'product_urls.yaml', 'subcategories.yaml')
+}
+
+SELECTOR_CONFIGS = sorted(
+    set(glob.glob(os.path.join(SCRAPERS_DIR, '*-yamls', '*.yaml'))) - URL_DISCOVERY_CONFIGS
+)
+
+
+def _outcome(run):
+    """Return the result of run(), or the type of the exception it raised."""
+    try:
+        return ('ok', run())
+    except Exception as e:
+        return ('error', type(e).__name__)
+
+
+def _outcome_with_message(run):
+    """Return the result of run(), or the type and message of the exception it raised."""
+    try:
+        return ('ok', run())
+    except Exception as e:
+        return ('error', type(e).__name__, str(e))
+
+
+class HtmlParserResolutionTests(SimpleTestCase):
+
+    def setUp(self):
+        html_parser._resolve.cache_clear()
+
+    def tearDown(self):
+        html_parser._resolve.cache_clear()
+
+    def test_html_parser_is_always_available(self):
+        self.assertIn('html.parser', available_parsers())
+        self.assertEqual(get_html_parser('html.parser'), 'html.parser')
+
+    def test_auto_prefers_lxml(self):
+        expected = 'lxml' if 'lxml' in available_parsers() else 'html.parser'
+        self.assertEqual(get_html_parser('auto'), expected)
+
+    def test_missing_backend_falls_back_to_html_parser(self):
+        with mock.patch.object(html_parser, 'is_parser_available', lambda name: name == 'html.parser'):
+            self.assertEqual(get_html_parser('lxml'), 'html.parser')
+            self.assertEqual(get_html_parser('auto'), 'html.parser')
+
+    def test_unknown_backend_falls_back_to_html_parser(self):
+        self.assertEqual(get_html_parser('no-such-parser'), 'html.parser')
+
+    def test_default_is_html_parser(self):
+        # lxml is optional, so it is only used when asked for
+        with override_settings():
+            del settings.SCRAPER_HTML_PARSER
+            self.assertEqual(get_html_parser(), 'html.parser')
+
+    @override_settings(SCRAPER_HTML_PARSER='html.parser')
+    def test_setting_selects_backend(self):
+        self.assertEqual(get_html_parser(), 'html.parser')
+
+    @override_settings(SCRAPER_HTML_PARSER='auto')
+    def test_auto_is_opt_in(self):
+        expected = 'lxml' if 'lxml' in available_parsers() else 'html.parser'
+        self.assertEqual(get_html_parser(), expected)
+
+
+class HtmlParserParityTests(SimpleTestCase):
+    """Selector results must not depend on the parser backend."""
+
+    # html5lib is excluded: it inserts <tbody> like a browser, which changes what
+    # child combinators such as 'table > tr' match
+    PARITY_PARSERS = ('lxml',)
+
+    def setUp(self):
+        self.alternatives = [name for name in available_parsers() if name in self.PARITY_PARSERS]
+        if not self.alternatives:
+            self.skipTest("lxml is not installed")
+        self.fixtures = {}
+        for path in HTML_FIXTURES:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.fixtures[os.path.relpath(path, settings.BASE_DIR)] = f.read()
+        logging.disable(logging.ERROR)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def _selector(self, config):
+        selector = selector_registry.get(config)
+        if isinstance(selector, MappingSelector):
+            # Evaluate every key even on fixtures that do not fully match
+            selector = copy.deepcopy(selector)
+            selector.error_strategy = 'mark_none'
+        return selector
+
+    def test_selector_outputs_match(self):
+        # Each mapping and every file it includes, so per-field differences are reported
+        configs = []
+        for mapping in MAPPING_CONFIGS:
+            configs.append(mapping)
+            configs.extend(sorted(selector_registry.get_compiled(mapping).included_files))
+
+        for config in configs:
+            selector = self._selector(config)
+            compiled = selector.compile()
+            for fixture, html in self.fixtures.items():
+                expected = _outcome(lambda: selector.select(
+                    Selected(make_soup(html, 'html.parser'), SelectedType.SINGLE)).value)
+                expected_compiled = _outcome(lambda: compiled.run(make_soup(html, 'html.parser')))
+                for parser in self.alternatives:
+                    with self.subTest(config=os.path.relpath(config, SCRAPERS_DIR), fixture=fixture, parser=parser):
+                        self.assertEqual(_outcome(lambda: selector.select(
+                            Selected(make_soup(html, parser), SelectedType.SINGLE)).value), expected)
+                        self.assertEqual(_outcome(lambda: compiled.run(make_soup(html, parser))), expected_compiled)
+
+    def test_preprocessed_text_matches(self):
+        # Markup may legitimately differ where the fixture is invalid HTML (e.g. nested <p>),
+        # but the text sent for extraction must not
+        for fixture, html in self.fixtures.items():
+            expected = make_soup(preprocess_html(html, parser='html.parser'), 'html.parser').get_text()
+            for parser in self.alternatives:
+                with self.subTest(fixture=fixture, parser=parser):
+                    processed = preprocess_html(html, parser=parser)
+                    self.assertEqual(make_soup(processed, 'html.parser').get_text(), expected)
+
+
+class CompiledSelectorParityTests(SimpleTestCase):
+    """A compiled selector must return what the interpreted tree returns, or fail the same way."""
+
+    def setUp(self):
+        self.fixtures = {}
+        for path in dict.fromkeys(HTML_FIXTURES + DEBUG_PAGES):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.fixtures[os.path.relpath(path, settings.BASE_DIR)] = f.read()
+        logging.disable(logging.ERROR)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def _variants(self, config):
+        selector = selector_registry.get(config)
+        if isinstance(selector, CategorizedTagPageSelector):
+            # Fetches live category pages; compiled programs run it through select() as-is
+            return
+        yield 'as loaded', selector
+        if isinstance(selector, MappingSelector):
+            yield 'mark_none', MappingSelector(selector.mapping, error_strategy='mark_none')
+
+    def test_every_config_matches_on_every_fixture(self):
+        self.assertTrue(SELECTOR_CONFIGS)
+        for config in SELECTOR_CONFIGS:
+            for variant, selector in self._variants(config):
+                compiled = selector.compile()
+                for fixture, html in self.fixtures.items():
+                    with self.subTest(config=os.path.relpath(config, SCRAPERS_DIR), variant=variant, fixture=fixture):
+                        expected = _outcome_with_message(lambda: selector.select(
+                            Selected(make_soup(html), SelectedType.SINGLE)).collapsed_value)
+                        self.assertEqual(_outcome_with_message(lambda: compiled.run(make_soup(html))), expected)
+
+    def test_type_errors_match(self):
+        # Input type mismatches are compiled into failing steps
+        for selector in (
+            SeriesSelector([CSSSelector('p'), TextSelector()]),
+            SeriesSelector([CSSSelector('p', index=0), IndexedSelector(0)]),
+            SeriesSelector([TextSelector(), AttrSelector('id')]),
+        ):
+            html = '<p id="a">one</p><p>two</p>'
+            with self.subTest(selector=selector.toYamlDict()):
+                expected = _outcome_with_message(lambda: selector.select(
+                    Selected(make_soup(html), SelectedType.SINGLE)).collapsed_value)
+                self.assertEqual(expected[0], 'error')
+                self.assertEqual(_outcome_with_message(lambda: selector.compile().run(make_soup(html))), expected)
+
+    def test_fused_index_keeps_indexed_selector_error(self):
+        html = '<p>one</p><p>two</p>'
+        for selector in (
+            SeriesSelector([CSSSelector('p'), IndexedSelector(5)]),
+            SeriesSelector([CSSSelector('li'), IndexedSelector(0), TextSelector()]),
+            SeriesSelector([CSSSelector('p', index=5), TextSelector()]),
+        ):
+            with self.subTest(selector=selector.toYamlDict()):
+                expected = _outcome_with_message(lambda: selector.select(
+                    Selected(make_soup(html), SelectedType.SINGLE)).collapsed_value)
+                self.assertEqual(expected[0], 'error')
+                self.assertEqual(_outcome_with_message(lambda: selector.compile().run(make_soup(html))), expected)
+
+
+class SelectorRegistryTests(SimpleTestCase):
+    HTML = '<h1>Title</h1><h2>Subtitle</h2>'
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.registry = SelectorRegistry(max_size=2)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        # Bump the mtime explicitly: rewrites within one clock tick keep the old one
+        mtime = os.stat(path).st_mtime_ns + 1_000_000 if os.path.exists(path) else None
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+        return path
+
+    def _css(self, name, css):
+        return self._write(name, f'css_selector:\n  css_selector: "{css}"\n  index: 0\n')
+
+    def test_least_recently_used_entry_is_evicted(self):
+        first, second, third = (self._css(f'{n}.yaml', 'h1') for n in ('first', 'second', 'third'))
+        self.registry.get(first)
+        self.registry.get(second)
+        self.registry.get(first)
+        self.registry.get(third)
+
+        self.assertEqual(len(self.registry), 2)
+        self.assertIn(first, self.registry)
+        self.assertNotIn(second, self.registry)
+        self.assertEqual((self.registry.hits, self.registry.misses), (1, 3))
+
+    def test_changed_file_is_reloaded(self):
+        path = self._css('title.yaml', 'h1')
+        selector = self.registry.get(path)
+        self.assertIs(self.registry.get(path), selector)
+
+        self._css('title.yaml', 'h2')
+        reloaded = self.registry.get(path)
+        self.assertIsNot(reloaded, selector)
+        self.assertEqual(reloaded.css_selector_text, 'h2')
+
+    def test_compiled_program_is_rebuilt_when_an_included_file_changes(self):
+        child = self._css('title.yaml', 'h1')
+        mapping = self._write('mapping.yaml', (
+            'mapping_selector:\n'
+            '  mapping:\n'
+            '    title:\n'
+            '      file_selector:\n'
+            f'        file_path: "{child}"\n'
+        ))
+        with mock.patch('apps.scrapers.selectors.registry.selector_registry', self.registry):
+            compiled = self.registry.get_compiled(mapping)
+            self.assertIs(self.registry.get_compiled(mapping), compiled)
+            self.assertEqual(compiled.run(make_soup(self.HTML)), {'title': 'Title'})
+
+            self._css('title.yaml', 'h2')
+            rebuilt = self.registry.get_compiled(mapping)
+            self.assertIsNot(rebuilt, compiled)
+            self.assertEqual(rebuilt.run(make_soup(self.HTML)), {'title': 'Subtitle'})
+
+    def test_file_selector_checks_the_file_once_per_select(self):
+        path = self._css('title.yaml', 'h1')
+        selector = FileSelector(path)
+        with mock.patch('apps.scrapers.selectors.registry.selector_registry', self.registry), \
+                mock.patch.object(SelectorRegistry, '_stamp', wraps=SelectorRegistry._stamp) as stamp:
+            selector.select(Selected(make_soup(self.HTML), SelectedType.SINGLE))
+            self.assertEqual(stamp.call_count, 1)
+
+            for _ in range(3):
+                selector.selector
+                selector.mutates_input()
+            self.assertEqual(stamp.call_count, 1)
+
+            self._css('title.yaml', 'h2')
+            result = selector.select(Selected(make_soup(self.HTML), SelectedType.SINGLE))
+            self.assertEqual(stamp.call_count, 2)
+            self.assertEqual(result.collapsed_value, 'Subtitle')
+
+
+class RecordingSelector(Selector):
+    """Records the element it is given; removes the element's first <p> when mutating."""
+
+    def __init__(self, mutating=False):
+        self.expected_selected = SelectedType.SINGLE
+        self.mutating = mutating
+        self.received = []
+
+    def select(self, selected):
+        self.received.append(selected.value)
+        if self.mutating:
+            selected.value.find('p').decompose()
+        return Selected(selected.value.get_text(strip=True), SelectedType.VALUE)
+
+    def mutates_input(self):
+        return self.mutating
+
+    def toYamlDict(self):
+        return {'recording_selector': {'mutating': self.mutating}}
+
+
+class SharedInputTests(SimpleTestCase):
+    HTML = '<div id="outer"><section id="inner"><p>first</p><p>second</p></section></div>'
+
+    def _inner(self):
+        soup = make_soup(self.HTML, 'html.parser')
+        return soup, Selected(soup.find(id='inner'), SelectedType.SINGLE)
+
+    def test_readers_share_the_input(self):
+        first, second = RecordingSelector(), RecordingSelector()
+        _, selected = self._inner()
+        MappingSelector({'first': first, 'second': second}).select(selected)
+        self.assertIs(first.received[0], selected.value)
+        self.assertIs(second.received[0], selected.value)
+
+    def test_mutating_selector_gets_a_copy(self):
+        writer, reader = RecordingSelector(mutating=True), RecordingSelector()
+        soup, selected = self._inner()
+        mapping = MappingSelector({'writer': writer, 'reader': reader})
+        for mode, run in (
+            ('interpreted', lambda: mapping.select(selected).value),
+            ('compiled', lambda: mapping.compile().run(selected.value)),
+        ):
+            with self.subTest(mode=mode):
+                self.assertEqual(run(), {'writer': 'second', 'reader': 'firstsecond'})
+                self.assertIsNot(writer.received[-1], selected.value)
+                self.assertIs(reader.received[-1], selected.value)
+                self.assertEqual(len(soup.find_all('p')), 2)
+
+    def test_parent_selector_walks_above_the_mapped_element(self):
+        # Shared inputs keep their place in the document; a deep copy would stop at #inner
+        parent_id = SeriesSelector([ParentSelector(), AttrSelector('id')])
+        paragraphs = CSSSelector('p')
+        selectors = {
+            'mapping': (MappingSelector({'parent': parent_id}), {'parent': 'outer'}),
+            'concat': (ConcatSelector(parent_id, parent_id), 'outerouter'),
+            'zip': (
+                ZipSelector(
+                    SeriesSelector([paragraphs, ForEachSelector(TextSelector())]),
+                    SeriesSelector([paragraphs, ForEachSelector(
+                        SeriesSelector([ParentSelector(levels=2), AttrSelector('id')]))]),
+                ),
+                {'first': 'outer', 'second': 'outer'},
+            ),
+        }
+        for name, (selector, expected) in selectors.items():
+            _, selected = self._inner()
+            with self.subTest(selector=name):
+                self.assertEqual(selector.select(selected).value, expected)
+                self.assertEqual(selector.compile().run(selected.value), expected)
+
+
+class ScraperPipelineTests(SimpleTestCase):
+    """Each page is fetched and parsed once, and every stage is timed."""
+
+    URL = 'https://www.triadscientific.com/en/products/lab-equipment/1/example'
+    HTML = '<h1>Example Centrifuge</h1><div class="description"><p>A bench-top centrifuge for small labs.</p></div>'
+    MAPPING = (
+        'mapping_selector:\n'
+        '  mapping:\n'
+        '    name:\n'
+        '      css_selector:\n'
+        '        css_selector: "h1"\n'
+        '        index: 0\n'
+        '    full_description:\n'
+        '      css_selector:\n'
+        '        css_selector: "div.description"\n'
+        '        index: 0\n'
+    )
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        config = os.path.join(tmp.name, 'mapping.yaml')
+        with open(config, 'w', encoding='utf-8') as f:
+            f.write(self.MAPPING)
+
+        self.html = self.HTML
+        self.session = mock.Mock()
+        self.session.get.return_value = mock.Mock(text=self.html, status_code=200)
+        self.scraper = Scraper(config, session=self.session)
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+    def _pages_per_stage(self):
+        return {stage: pages for stage, (_, pages) in self.scraper.timings_report().items()}
+
+    def test_scrape_fetches_and_parses_once(self):
+        result = self.scraper.scrape(self.URL)
+
+        self.session.get.assert_called_once_with(self.URL, timeout=self.scraper.timeout)
+        self.assertEqual(result['name'], 'Example Centrifuge')
+        self.assertEqual(self._pages_per_stage(), {'fetch': 1, 'parse': 1, 'select': 1, 'post_process': 1})
+        self.assertTrue(all(seconds >= 0 for seconds, _ in self.scraper.timings_report().values()))
+
+    def test_given_html_or_soup_skips_earlier_stages(self):
+        self.scraper.scrape(self.URL, html=self.html)
+        self.scraper.scrape(self.URL, soup=make_soup(self.html))
+
+        self.session.get.assert_not_called()
+        self.assertEqual(self._pages_per_stage(), {'fetch': 0, 'parse': 1, 'select': 2, 'post_process': 2})
+
+        self.scraper.reset_timings()
+        self.assertEqual(self._pages_per_stage(), {stage: 0 for stage in Scraper.STAGES})
+
+    def test_importer_fetches_each_url_once(self):
+        from apps.scrapers.management.commands.import_triadscientific_api import Command
+
+        command = Command(stdout=io.StringIO())
+        command.scraper = self.scraper
+        result = command._process_single_url(
+            self.URL, self.scraper, skip_images=True, dry_run=True, add_manufacturer_tag=False)
+
+        self.assertEqual(result, {'success': True, 'dry_run': True})
+        self.session.get.assert_called_once()
+        self.assertEqual(self._pages_per_stage(), {'fetch': 1, 'parse': 1, 'select': 1, 'post_process': 1})
+
+        stats = {'processed': 1, 'total': 1, 'successful': 1, 'failed': 0, 'skipped': 0,
+                 'start_time': datetime.datetime.now()}
+        command._print_stats_report(stats)
+        self.assertRegex(command.stdout.getvalue(),
+                         r'Avg per page: fetch \d+ms \| parse \d+ms \| select \d+ms \| post_process \d+ms')
+
+
+class StubTriadServer:
+    """A local HTTP server standing in for the Triad site, serving the saved debug pages.
+
+    The homepage links to a few category pages (with duplicates that differ only in
+    form); every category page serves one of the debug pages.
+    """
+
+    CATEGORY_PATHS = [
+        '/en/products/ftir-systems/1091',
+        '/en/products/freeze-dryers/947',
+        '/en/products/particle-size-analysis/953',
+        '/en/products/analyzers/1078',
+    ]
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.pages = []
+        for path in DEBUG_PAGES:
+            with open(path, 'rb') as f:
+                self.pages.append(f.read())
+
+        self.hits = {}
+        self.arrivals = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+        links = []
+        for path in self.CATEGORY_PATHS:
+            links.append(f'<a href="{path}">{path}</a>')
+            links.append(f'<a href="{path}/">{path}</a>')
+        self.home = f'<html><body><nav>{"".join(links)}</nav></body></html>'.encode('utf-8')
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _handle(self, request):
+        path = urlsplit(request.path).path.rstrip('/') or '/'
+        with self._lock:
+            self.hits[path] = self.hits.get(path, 0) + 1
+            self.arrivals.append(time.monotonic())
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if path == '/':
+                body = self.home
+            elif path in self.CATEGORY_PATHS:
+                body = self.pages[self.CATEGORY_PATHS.index(path) % len(self.pages)]
+            else:
+                request.send_error(404)
+                return
+            request.send_response(200)
+            request.send_header('Content-Type', 'text/html; charset=utf-8')
+            request.send_header('Content-Length', str(len(body)))
+            request.end_headers()
+            request.wfile.write(body)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class DebugArtifactTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def files(self):
+        return sorted(p for p in os.listdir(os.path.join(self.directory.name, 'simplified_html')))
+
+    def test_disabled_by_default(self):
+        recorder = ArtifactRecorder(self.directory.name)
+        self.assertFalse(recorder.capture('simplified_html', 'https://example.com/a', 'content'))
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, 'simplified_html')))
+
+    def test_samples_caps_and_writes_in_background(self):
+        samples = iter([0.1, 0.9, 0.2])
+        recorder = ArtifactRecorder(self.directory.name, enabled=True, sample_rate=0.5, max_bytes=10,
+                                    sample=lambda: next(samples))
+
+        results = [recorder.capture('simplified_html', 'https://www.example.com/a', 'x' * 50) for _ in range(3)]
+        recorder.flush()
+
+        self.assertEqual(results, [True, False, True])
+        files = self.files()
+        self.assertEqual(len(files), 2)
+        self.assertTrue(files[0].startswith('simplified_html_www_example_com_'))
+        with open(os.path.join(self.directory.name, 'simplified_html', files[0])) as f:
+            self.assertEqual(f.read(), 'x' * 10 + TRUNCATION_MARKER)
+
+    def test_cleanup_deletes_expired_artifacts(self):
+        recorder = ArtifactRecorder(self.directory.name, enabled=True, retention_days=1)
+        recorder.capture('simplified_html', 'https://example.com/old', 'old')
+        recorder.capture('simplified_html', 'https://example.com/new', 'new')
+        recorder.flush()
+
+        old = os.path.join(self.directory.name, 'simplified_html', self.files()[0])
+        os.utime(old, (time.time() - 2 * 24 * 60 * 60,) * 2)
+
+        self.assertEqual(recorder.cleanup(), 1)
+        self.assertEqual(len(self.files()), 1)
+
+
+class AsyncDiscoveryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.url_discovery = _load_url_discovery()
+        # Product links in the featured products carousel of the saved pages
+        self.expected_paths = set()
+        for path in DEBUG_PAGES:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.expected_paths.update(
+                    re.findall(r'href="(/en/products/[^/"]+/\d+/[^/"]+/\d+)"', f.read()))
+        self.assertTrue(self.expected_paths)
+
+    def _stub_discoverer(self, stub):
+        discoverer = self.url_discovery.TriadUrlDiscoverer(base_url=stub.base_url, request_delay=0)
+        # Category links are only accepted on the production host; accept the stub's instead
+        regex = discoverer.selectors['categories']['css_selector']['filter']['regex']
+        production_host = re.escape('www.triadscientific.com')
+        self.assertIn(production_host, regex['pattern'])
+        regex['pattern'] = regex['pattern'].replace(production_host, re.escape(urlsplit(stub.base_url).netloc))
+        return discoverer
+
+    def test_category_filter_accepts_only_the_production_host(self):
+        discoverer = self.url_discovery.TriadUrlDiscoverer(request_delay=0)
+        html = ('<a href="/en/products/ftir-systems/1091">FTIR</a>'
+                '<a href="https://www.triadscientific.com/en/products/freeze-dryers/947/">Freeze dryers</a>'
+                '<a href="https://mirror.example.com/en/products/analyzers/1078">Analyzers</a>')
+        urls = [item['url'] for item in discoverer._apply_selector(html, 'categories')]
+        self.assertEqual(urls, [
+            'http://www.triadscientific.com/en/products/ftir-systems/1091',
+            'https://www.triadscientific.com/en/products/freeze-dryers/947/',
+        ])
+
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url('HTTP://Example.COM:80/a/b/../c/?b=2&a=1#frag'),
+                         'http://example.com/a/c?a=1&b=2')
+        self.assertEqual(normalize_url('https://example.com'), 'https://example.com/')
+        self.assertEqual(normalize_url('http://example.com:8080/x/'), 'http://example.com:8080/x')
+
+    def test_discovery_streams_deduplicated_products(self):
+        with StubTriadServer() as stub, tempfile.TemporaryDirectory() as tmp:
+            output_file = os.path.join(tmp, 'urls.txt')
+            discoverer = self._stub_discoverer(stub)
+            products = discoverer.discover_all_urls_async(output_file=output_file, max_concurrency=4)
+
+            with open(output_file, 'r') as f:
+                lines = [line.rstrip('\n') for line in f]
+
+        expected = {stub.base_url + path for path in self.expected_paths}
+        self.assertEqual({product['url'] for product in products}, expected)
+        self.assertEqual(len(lines), len(expected))
+        self.assertEqual({line.split(' | ', 1)[0] for line in lines}, expected)
+        self.assertTrue(all(' | ' in line for line in lines))
+
+        # Every page is fetched once, although the homepage links each category twice
+        self.assertEqual(len(discoverer.categories), 2 * len(StubTriadServer.CATEGORY_PATHS))
+        self.assertEqual(stub.hits, {path: 1 for path in ['/'] + StubTriadServer.CATEGORY_PATHS})
+
+    def test_concurrency_is_bounded(self):
+        start = [(f"/en/products/ftir-systems/1091?page={n}", 'page') for n in range(8)]
+        with StubTriadServer(delay=0.05) as stub:
+            crawler = AsyncCrawler(lambda url, html, kind: ([], []), max_concurrency=3, requests_per_second=None)
+            stats = crawler.run([(stub.base_url + path, kind) for path, kind in start])
+
+        self.assertEqual(stats['pages'], 8)
+        self.assertLessEqual(stub.max_in_flight, 3)
+        self.assertGreater(stub.max_in_flight, 1)
+
+    def test_rate_limit_per_host(self):
+        start = [(f"/en/products/ftir-systems/1091?page={n}", 'page') for n in range(5)]
+        with StubTriadServer() as stub:
+            crawler = AsyncCrawler(lambda url, html, kind: ([], []), max_concurrency=5, requests_per_second=20)
+            crawler.run([(stub.base_url + path, kind) for path, kind in start])
+
+        arrivals = sorted(stub.arrivals)
+        self.assertEqual(len(arrivals), 5)
+        # One request up front, then one every 50ms
+        self.assertGreaterEqual(arrivals[-1] - arrivals[0], 4 * 0.05 * 0.9)
@@ -9,6 +9,16 @@ import time
 import re
 from pathlib import Path
 
+try:
+    from apps.scrapers.utils.crawler import AsyncCrawler
+    from apps.scrapers.utils.html_parser import get_html_parser
+except ImportError:
+    # Running as a standalone script outside the project
+    AsyncCrawler = None
+
+    def get_html_parser(name=None):
+        return name or 'html.parser'
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('triad_url_discovery')
@@ -20,16 +30,20 @@ YAML_DIR = Path(__file__).parent
 # Default rate limiting (can be overridden in constructor)
 REQUEST_DELAY = 1  # seconds between requests
 
+# Product pages: /en/products/<category>/<category id>/<product slug>/<product id>
+PRODUCT_PATH_PATTERN = re.compile(r'/en/products/[^/]+/\d+/[^/]+/\d+/?$')
+
 
 class TriadUrlDiscoverer:
     """
     Class for discovering URLs on the Triad Scientific website using YAML selectors.
     """
     
-    def __init__(self, base_url=BASE_URL, yaml_dir=YAML_DIR, request_delay=REQUEST_DELAY):
+    def __init__(self, base_url=BASE_URL, yaml_dir=YAML_DIR, request_delay=REQUEST_DELAY, parser=None):
         self.base_url = base_url
         self.yaml_dir = yaml_dir
         self.request_delay = request_delay
+        self.parser = get_html_parser(parser)
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -82,7 +96,7 @@ class TriadUrlDiscoverer:
             return []
         
         selector = self.selectors[selector_type]
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = BeautifulSoup(html, self.parser)
         
         results = []
         
@@ -118,6 +132,23 @@ class TriadUrlDiscoverer:
                 if 'url' in item:
                     results.append(item)
             
+            # Product cards (e.g. the featured products carousel) link to products directly
+            found = {item['url'] for item in results}
+            for card in soup.select('div.card'):
+                link = card.find('a', href=PRODUCT_PATH_PATTERN)
+                if not link:
+                    continue
+                url = urljoin(self.base_url, link['href'])
+                if url in found:
+                    continue
+                found.add(url)
+                
+                item = {'url': url}
+                title = card.select_one('.card-title')
+                if title and title.get_text(strip=True):
+                    item['product_name'] = title.get_text(strip=True)
+                results.append(item)
+            
             return results
         
         # Standard selector processing for other selector types
@@ -215,6 +246,79 @@ class TriadUrlDiscoverer:
         logger.info(f"URL discovery completed. Found {len(self.product_urls)} product URLs")
         return self.product_urls
     
+    def _parse_discovery_page(self, url, html, kind):
+        """Split a page into products and further pages to crawl (see AsyncCrawler)."""
+        links = []
+        if kind == 'home':
+            categories = self._apply_selector(html, 'categories')
+            self.categories.extend(categories)
+            links.extend((category['url'], 'category') for category in categories if 'url' in category)
+        
+        products = self._apply_selector(html, 'product_urls')
+        links.extend((page['url'], 'category') for page in self._apply_selector(html, 'pagination') if 'url' in page)
+        return products, links
+    
+    def discover_all_urls_async(self, output_file=None, max_concurrency=8, requests_per_second=None,
+                                burst=1, start_urls=None):
+        """
+        Discover product URLs with the asyncio crawl engine.
+        
+        Categories and their pagination are fetched concurrently, at most max_concurrency
+        at a time and at most requests_per_second per host. Product URLs are deduplicated
+        on their normalized form and appended to output_file as they are found.
+        
+        Args:
+            output_file: File to stream "url | product name" lines to (optional)
+            max_concurrency: Maximum number of requests in flight
+            requests_per_second: Rate limit per host; defaults to one request per request_delay
+            burst: Number of requests a host may receive at once before the rate applies
+            start_urls: Category URLs to start from instead of the homepage
+        
+        Returns:
+            list: The discovered products, as dicts with 'url' and optional 'product_name'
+        """
+        if AsyncCrawler is None:
+            raise RuntimeError("Async discovery needs the project on the Python path (apps.scrapers.utils.crawler)")
+        
+        if requests_per_second is None:
+            requests_per_second = 1 / self.request_delay if self.request_delay > 0 else None
+        
+        crawler = AsyncCrawler(
+            self._parse_discovery_page,
+            max_concurrency=max_concurrency,
+            requests_per_second=requests_per_second,
+            burst=burst,
+            headers=dict(self.session.headers),
+        )
+        if start_urls:
+            start = [(url, 'category') for url in start_urls]
+        else:
+            start = [(self.base_url, 'home')]
+        
+        products = []
+        output = open(output_file, 'w') if output_file else None
+        
+        def on_product(product):
+            products.append(product)
+            if output:
+                line = product['url']
+                if 'product_name' in product:
+                    line += f" | {product['product_name']}"
+                output.write(f"{line}\n")
+                output.flush()
+        
+        try:
+            stats = crawler.run(start, on_item=on_product)
+        finally:
+            if output:
+                output.close()
+        
+        self.visited_urls.update(crawler.seen_pages)
+        self.product_urls.extend(products)
+        logger.info(f"URL discovery completed: {stats['pages']} pages fetched, {stats['failed']} failed, "
+                    f"{len(products)} product URLs")
+        return products
+    
     def save_results(self, output_file='product_urls.txt'):
         """Save discovered product URLs to a file."""
         with open(os.path.join(self.yaml_dir, output_file), 'w') as f:
@@ -77,6 +77,59 @@ class LabEquipmentAPIClient:
                     return {"success": False, "error": f"Request error: {str(e)}"}
             return {"success": False, "error": f"Request error: {str(e)}"}
 
+    
+    def bulk_create_or_update_lab_equipment(self, items, batch_size=100, chunk_size=None):
+        """
+        Create or update many lab equipment pages through the bulk endpoint
+        
+        Items are sent as NDJSON in requests of batch_size products. A batch that fails
+        as a whole (e.g. a network error) is reported as failed for each of its items.
+        
+        Args:
+            items (list): Lab equipment data dicts, as for create_or_update_lab_equipment
+            batch_size (int): Number of products per HTTP request
+            chunk_size (int): Optional number of products per server-side transaction
+        
+        Returns:
+            dict: Totals (total, created, updated, unchanged, failed) and one result per item,
+                  with 'index' referring to the position in items
+        """
+        endpoint = f"{self.base_url}/api/lab-equipment/bulk/"
+        params = {'chunk_size': chunk_size} if chunk_size else None
+        headers = dict(self.headers, **{'Content-Type': 'application/x-ndjson'})
+        
+        summary = {"success": True, "total": len(items), "created": 0, "updated": 0, "unchanged": 0, "failed": 0, "results": []}
+        
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            body = "\n".join(json.dumps(item) for item in batch)
+            
+            try:
+                logger.info(f"Sending {len(batch)} items to {endpoint} (items {start}-{start + len(batch) - 1})")
+                response = requests.post(endpoint, headers=headers, params=params, data=body.encode('utf-8'))
+                try:
+                    response_data = response.json()
+                except ValueError:
+                    response_data = {"success": False, "error": f"Invalid JSON response: {response.text}"}
+                
+                if response.status_code >= 400 or 'results' not in response_data:
+                    error_message = response_data.get("error", response_data.get("message", f"HTTP error {response.status_code}"))
+                    raise requests.exceptions.RequestException(error_message)
+                
+                for result in response_data['results']:
+                    result['index'] += start
+                    summary['results'].append(result)
+                for key in ('created', 'updated', 'unchanged', 'failed'):
+                    summary[key] += response_data.get(key, 0)
+                    
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Bulk API request failed: {str(e)}")
+                for offset in range(len(batch)):
+                    summary['results'].append({"index": start + offset, "success": False, "error": str(e)})
+                summary['failed'] += len(batch)
+        
+        summary['success'] = summary['failed'] == 0
+        return summary
 
 # Example usage:
 """
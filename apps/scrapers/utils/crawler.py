@@ -0,0 +1,233 @@
+"""
+Asyncio crawl engine with bounded concurrency and per-host politeness.
+
+The engine walks a site breadth first from a set of start URLs. A fixed number of
+workers keeps at most max_concurrency requests in flight; before each request a
+worker takes a token from the bucket of the target host, so the request rate per
+host is bounded without blocking the other workers. URLs are deduplicated on their
+normalized form, for pages to visit and for the items they yield alike.
+
+What a page contains is decided by a parse_page callback:
+
+    parse_page(url, html, kind) -> (items, links)
+
+where items are dicts with a 'url' key and links are (url, kind) pairs to visit next.
+Items are handed to on_item as soon as they are found, so callers can stream them.
+
+Pages are fetched with requests and parsed in a thread pool (one session per thread),
+as the project has no async HTTP client dependency; parse_page must be thread-safe.
+"""
+
+import asyncio
+import logging
+import posixpath
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """
+    Normalize a URL for deduplication.
+
+    Lowercases the scheme and host, drops default ports, credentials and fragments,
+    resolves dot segments, strips trailing slashes and sorts query parameters.
+
+    Args:
+        url: An absolute URL
+
+    Returns:
+        str: The normalized URL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    port = parts.port
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+
+    path = parts.path or '/'
+    path = posixpath.normpath(path) if path != '/' else path
+    if path.startswith('//'):
+        path = '/' + path.lstrip('/')
+
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+class TokenBucket:
+    """An asyncio token bucket: rate tokens per second, holding at most capacity."""
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        """
+        Args:
+            rate: Tokens added per second; None or 0 disables the limit
+            capacity: Maximum number of tokens, i.e. the allowed burst
+            clock: Monotonic clock in seconds
+        """
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.clock = clock
+        self.tokens = float(self.capacity)
+        self.updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        if not self.rate:
+            return
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class AsyncCrawler:
+    """Crawls pages concurrently, yielding items found by a parse_page callback."""
+
+    def __init__(self, parse_page, max_concurrency=8, requests_per_second=1.0, burst=1,
+                 timeout=30, headers=None, max_pages=None, session_factory=requests.Session):
+        """
+        Args:
+            parse_page: Callback (url, html, kind) -> (items, links), see the module docstring
+            max_concurrency: Maximum number of requests in flight
+            requests_per_second: Rate limit per host; None or 0 disables it
+            burst: Number of requests a host may receive at once before the rate applies
+            timeout: Timeout in seconds for each request
+            headers: Headers sent with every request
+            max_pages: Stop scheduling new pages after this many (None for no limit)
+            session_factory: Callable returning a requests.Session, one per fetch thread
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self.parse_page = parse_page
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.max_pages = max_pages
+        self.session_factory = session_factory
+
+        self._local = threading.local()
+        self._buckets = {}
+        self.seen_pages = set()
+        self.seen_items = set()
+        self.stats = {'pages': 0, 'failed': 0, 'items': 0}
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self.session_factory()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def _fetch_and_parse(self, url, kind):
+        """Fetch and parse a page in a pool thread, keeping the event loop free."""
+        response = self._session().get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return self.parse_page(url, response.text, kind)
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc.lower()
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.requests_per_second, self.burst)
+        return bucket
+
+    def _schedule(self, queue, url, kind):
+        key = normalize_url(url)
+        if key in self.seen_pages:
+            return
+        if self.max_pages is not None and len(self.seen_pages) >= self.max_pages:
+            return
+        self.seen_pages.add(key)
+        queue.put_nowait((url, kind))
+
+    async def _visit(self, executor, queue, url, kind, on_item):
+        await self._bucket(url).acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            items, links = await loop.run_in_executor(executor, self._fetch_and_parse, url, kind)
+        except requests.exceptions.RequestException as e:
+            self.stats['failed'] += 1
+            logger.error(f"Error fetching {url}: {e}")
+            return
+
+        self.stats['pages'] += 1
+
+        for item in items:
+            key = normalize_url(item['url'])
+            if key in self.seen_items:
+                continue
+            self.seen_items.add(key)
+            self.stats['items'] += 1
+            if on_item is not None:
+                on_item(item)
+
+        for link, link_kind in links:
+            self._schedule(queue, link, link_kind)
+
+    async def _worker(self, executor, queue, on_item):
+        while True:
+            url, kind = await queue.get()
+            try:
+                await self._visit(executor, queue, url, kind, on_item)
+            except Exception:
+                self.stats['failed'] += 1
+                logger.exception(f"Error processing {url}")
+            finally:
+                queue.task_done()
+
+    async def crawl(self, start, on_item=None):
+        """
+        Crawl from the start pages until no new pages are found.
+
+        Args:
+            start: Iterable of (url, kind) pairs
+            on_item: Optional callback called with each new item as it is found
+
+        Returns:
+            dict: Crawl statistics (pages, failed, items)
+        """
+        queue = asyncio.Queue()
+        for url, kind in start:
+            self._schedule(queue, url, kind)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='crawler') as executor:
+            workers = [
+                asyncio.create_task(self._worker(executor, queue, on_item))
+                for _ in range(self.max_concurrency)
+            ]
+            try:
+                await queue.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+        logger.info(
+            f"Crawl finished: {self.stats['pages']} pages, {self.stats['failed']} failed, "
+            f"{self.stats['items']} items"
+        )
+        return dict(self.stats)
+
+    def run(self, start, on_item=None):
+        """Run crawl() to completion from synchronous code."""
+        return asyncio.run(self.crawl(start, on_item))
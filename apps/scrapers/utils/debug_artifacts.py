@@ -0,0 +1,195 @@
+"""
+Capture of debug artifacts (fetched pages, simplified payloads, ...) for inspection.
+
+Capturing is off by default. When enabled, capture() samples the calls it receives,
+truncates the content to a size cap and hands it to a background writer thread, so
+the caller never waits for the disk. If the writer falls behind, artifacts are
+dropped rather than queued without bound. The writer removes artifacts older than
+the retention period when it starts and then about once an hour.
+
+Artifacts are written to <directory>/<kind>/<kind>_<host>_<timestamp>_<n>.txt.
+Configuration comes from the DEBUG_ARTIFACTS_* settings (or environment variables
+outside Django):
+
+    DEBUG_ARTIFACTS_ENABLED          'True' to capture (default off)
+    DEBUG_ARTIFACTS_DIR              output directory (default MEDIA_ROOT/debug_artifacts)
+    DEBUG_ARTIFACTS_SAMPLE_RATE      fraction of calls captured, 0 to 1 (default 1)
+    DEBUG_ARTIFACTS_MAX_BYTES        size cap of one artifact (default 1 MB)
+    DEBUG_ARTIFACTS_RETENTION_DAYS   age after which artifacts are deleted (default 7)
+"""
+
+import itertools
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1024 * 1024
+DEFAULT_RETENTION_DAYS = 7
+CLEANUP_INTERVAL = 60 * 60
+TRUNCATION_MARKER = '\n[... truncated ...]\n'
+
+
+def _setting(name, default):
+    try:
+        from django.conf import settings
+        if settings.configured:
+            return getattr(settings, name, default)
+    except ImportError:
+        pass
+    return os.getenv(name, default)
+
+
+class ArtifactRecorder:
+    """Writes sampled, size-capped debug artifacts on a background thread."""
+
+    def __init__(self, directory, enabled=False, sample_rate=1.0, max_bytes=DEFAULT_MAX_BYTES,
+                 retention_days=DEFAULT_RETENTION_DAYS, max_pending=100, sample=random.random):
+        """
+        Args:
+            directory: Directory the artifacts are written to
+            enabled: Whether capture() records anything
+            sample_rate: Fraction of capture() calls recorded, between 0 and 1
+            max_bytes: Maximum size of one artifact; longer content is truncated
+            retention_days: Artifacts older than this are deleted (None keeps them)
+            max_pending: Maximum number of artifacts waiting to be written
+            sample: Function returning a random number in [0, 1)
+        """
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self.sample = sample
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._counter = itertools.count()
+        self._writer = None
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def capture(self, kind, source, content):
+        """
+        Record an artifact if capturing is enabled and the call is sampled.
+
+        Args:
+            kind: Kind of artifact, used as subdirectory and file name prefix
+            source: URL (or other name) the content belongs to
+            content: Text to record
+
+        Returns:
+            bool: True if the artifact was queued for writing
+        """
+        if not self.enabled or not content:
+            return False
+        if self.sample_rate < 1 and self.sample() >= self.sample_rate:
+            return False
+
+        encoded = content.encode('utf-8')
+        if self.max_bytes and len(encoded) > self.max_bytes:
+            encoded = encoded[:self.max_bytes] + TRUNCATION_MARKER.encode('utf-8')
+
+        try:
+            self._queue.put_nowait((self._path(kind, source), encoded))
+        except queue.Full:
+            self.dropped += 1
+            logger.debug(f"Debug artifact writer is behind, dropping {kind} artifact for {source}")
+            return False
+
+        self._ensure_writer()
+        return True
+
+    def _path(self, kind, source):
+        host = urlparse(source).netloc or source
+        host = re.sub(r'[^A-Za-z0-9]+', '_', host)[:80]
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        return self.directory / kind / f"{kind}_{host}_{timestamp}_{next(self._counter)}.txt"
+
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name='debug-artifacts', daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            if time.time() - self._last_cleanup > CLEANUP_INTERVAL:
+                self.cleanup()
+            path, content = self._queue.get()
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(content)
+            except OSError as e:
+                logger.warning(f"Could not write debug artifact {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Wait until all queued artifacts are written."""
+        self._queue.join()
+
+    def cleanup(self):
+        """
+        Delete artifacts older than the retention period.
+
+        Returns:
+            int: Number of files deleted
+        """
+        self._last_cleanup = time.time()
+        if not self.retention_days or not self.directory.exists():
+            return 0
+
+        cutoff = time.time() - self.retention_days * 24 * 60 * 60
+        deleted = 0
+        for path in self.directory.glob('*/*.txt'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    deleted += 1
+            except OSError:
+                continue
+        if deleted:
+            logger.info(f"Deleted {deleted} debug artifacts older than {self.retention_days} days")
+        return deleted
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_artifact_recorder():
+    """Return the process-wide recorder configured with the DEBUG_ARTIFACTS_* settings."""
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                directory = _setting('DEBUG_ARTIFACTS_DIR', None)
+                if not directory:
+                    directory = os.path.join(_setting('MEDIA_ROOT', '') or '.', 'debug_artifacts')
+                enabled = _setting('DEBUG_ARTIFACTS_ENABLED', False)
+                if isinstance(enabled, str):
+                    enabled = enabled == 'True'
+                _recorder = ArtifactRecorder(
+                    directory,
+                    enabled=enabled,
+                    sample_rate=float(_setting('DEBUG_ARTIFACTS_SAMPLE_RATE', 1.0)),
+                    max_bytes=int(_setting('DEBUG_ARTIFACTS_MAX_BYTES', DEFAULT_MAX_BYTES)),
+                    retention_days=int(_setting('DEBUG_ARTIFACTS_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)),
+                )
+    return _recorder
+
+
+def capture_artifact(kind, source, content):
+    """Record a debug artifact with the process-wide recorder (a no-op unless enabled)."""
+    return get_artifact_recorder().capture(kind, source, content)
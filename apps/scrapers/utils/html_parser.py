@@ -0,0 +1,107 @@
+"""
+Configurable HTML parser backend for BeautifulSoup.
+
+Parsing is the dominant cost of scraping large catalogue pages, and tree building
+on top of the pure-Python html.parser is slower than on lxml's C parser. The backend used for full pages is
+chosen with the SCRAPER_HTML_PARSER setting (or environment variable outside Django):
+
+    html.parser  Python's built-in parser (default)
+    auto         lxml if installed, otherwise html.parser
+    lxml         lxml's HTML parser
+    html5lib     the browser-grade html5lib parser (slow; inserts <tbody> like a
+                 browser, so selectors such as 'table > tr' may stop matching)
+
+lxml and html5lib are optional and not in requirements.txt, so the faster backends
+are opt-in: install lxml and set SCRAPER_HTML_PARSER=auto (or lxml).
+
+A backend that is not installed falls back to html.parser with a warning, so the
+setting can be shared between environments with and without the optional packages.
+apps/scrapers/tests.py checks that the Triad and Air Science selectors give identical
+results with lxml and html.parser on the saved HTML fixtures.
+"""
+
+import logging
+import os
+from functools import lru_cache
+
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARSER = 'html.parser'
+FALLBACK_PARSER = 'html.parser'
+KNOWN_PARSERS = ('lxml', 'html5lib', 'html.parser')
+
+# Backends tried, in order, when the setting is 'auto'
+AUTO_PREFERENCE = ('lxml', 'html.parser')
+
+
+def is_parser_available(name):
+    """Return True if BeautifulSoup can use the named parser in this environment."""
+    return builder_registry.lookup(name) is not None
+
+
+def available_parsers():
+    """Return the known parsers that are installed, fastest first."""
+    return [name for name in KNOWN_PARSERS if is_parser_available(name)]
+
+
+def configured_parser():
+    """Return the parser name configured for this process (before resolution)."""
+    try:
+        from django.conf import settings
+        if settings.configured:
+            return getattr(settings, 'SCRAPER_HTML_PARSER', DEFAULT_PARSER) or DEFAULT_PARSER
+    except ImportError:
+        pass
+    return os.getenv('SCRAPER_HTML_PARSER', DEFAULT_PARSER)
+
+
+@lru_cache(maxsize=None)
+def _resolve(name):
+    if name == 'auto':
+        for candidate in AUTO_PREFERENCE:
+            if is_parser_available(candidate):
+                return candidate
+        return FALLBACK_PARSER
+
+    if name not in KNOWN_PARSERS:
+        logger.warning(f"Unknown HTML parser '{name}', falling back to {FALLBACK_PARSER}")
+        return FALLBACK_PARSER
+
+    if not is_parser_available(name):
+        logger.warning(f"HTML parser '{name}' is not installed, falling back to {FALLBACK_PARSER}")
+        return FALLBACK_PARSER
+
+    return name
+
+
+def get_html_parser(name=None):
+    """
+    Resolve a parser name to a backend BeautifulSoup can use.
+
+    Args:
+        name: A parser name or 'auto'; if None, the configured parser is used
+
+    Returns:
+        str: The name of an installed parser
+    """
+    return _resolve(name or configured_parser())
+
+
+def make_soup(markup, parser=None):
+    """
+    Parse a full HTML document with the configured backend.
+
+    Fragments whose structure matters (e.g. segments re-parsed by selectors) should keep
+    using html.parser: lxml and html5lib wrap fragments in <html><body>.
+
+    Args:
+        markup: HTML string or bytes
+        parser: Optional parser name overriding the configured one
+
+    Returns:
+        BeautifulSoup: The parsed document
+    """
+    return BeautifulSoup(markup, get_html_parser(parser))
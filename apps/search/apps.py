@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class SearchConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.search'
+
+    def ready(self):
+        # Connect the signal receivers that keep the facet index and the search
+        # documents up to date
+        from . import facets, fulltext  # noqa: F401
@@ -0,0 +1,208 @@
+"""
+Faceted search over the categorized tags of live LabEquipmentPages.
+
+The PageTagFacet table holds one row per (live page, tag) with the tag's category,
+so a search request needs a fixed number of queries however many tag categories
+there are:
+
+    * filtering: the selected values of a category are OR'ed and categories are
+      AND'ed. Each category becomes a `page_id IN (SELECT page_id ... WHERE tag_id
+      IN (...))` subquery of the page query, so the database intersects the page
+      sets in a single statement
+    * counting: one GROUP BY (category, tag) query over the filtered pages returns
+      the counts of every tag of every category
+
+The index is refreshed for a page whenever it is saved (which includes publishing)
+or unpublished, once per transaction however many times the page is saved, and a
+tag's rows follow its category when the tag is saved. Rows of deleted pages and
+tags are removed by cascade. `python manage.py rebuild_facet_index` rebuilds it
+from scratch, e.g. after tags were changed with bulk queries.
+"""
+
+import logging
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from wagtail.models import Page
+from wagtail.signals import page_unpublished
+
+from apps.base_site.models import LabEquipmentPage
+from apps.categorized_tags.models import CategorizedPageTag, CategorizedTag
+
+from .models import PageTagFacet
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def live_equipment_pages():
+    """Return the live LabEquipmentPages as base Page objects."""
+    return Page.objects.live().filter(content_type=ContentType.objects.get_for_model(LabEquipmentPage))
+
+
+def refresh_page_facets(page_ids):
+    """
+    Make the facet rows of pages match their current tags.
+
+    Pages that are not live LabEquipmentPages lose their rows.
+
+    Args:
+        page_ids: IDs of the pages to refresh
+
+    Returns:
+        int: Number of facet rows the pages have now
+    """
+    page_ids = list(page_ids)
+    if not page_ids:
+        return 0
+
+    rows = CategorizedPageTag.objects.filter(
+        content_object_id__in=live_equipment_pages().filter(id__in=page_ids).values('id')
+    ).values_list('content_object_id', 'tag_id', 'tag__category')
+
+    with transaction.atomic():
+        PageTagFacet.objects.filter(page_id__in=page_ids).delete()
+        created = PageTagFacet.objects.bulk_create(
+            [PageTagFacet(page_id=page_id, tag_id=tag_id, category=category) for page_id, tag_id, category in rows],
+            batch_size=DEFAULT_CHUNK_SIZE,
+        )
+    return len(created)
+
+
+def refresh_pages_on_commit(refresh, page_id):
+    """
+    Call refresh once the current transaction commits, for every page passed until then.
+
+    Saving a page with its children sends several post_save signals; they are
+    collected per transaction so the page is refreshed once. Outside a transaction
+    refresh is called right away.
+
+    Args:
+        refresh: Callable taking a list of page IDs
+        page_id: ID of the changed page
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        refresh([page_id])
+        return
+
+    pending = connection.__dict__.setdefault('pending_page_refreshes', {})
+    callback, page_ids = pending.get(refresh, (None, None))
+    # A rolled back transaction drops the callback without running it
+    if callback is None or not any(entry[1] is callback for entry in connection.run_on_commit):
+        page_ids = set()
+
+        def callback():
+            if pending.get(refresh, (None,))[0] is callback:
+                del pending[refresh]
+            refresh(sorted(page_ids))
+
+        pending[refresh] = (callback, page_ids)
+        transaction.on_commit(callback)
+    page_ids.add(page_id)
+
+
+def live_page_id_chunks(chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the IDs of the live LabEquipmentPages in lists of up to chunk_size, by ID."""
+    pages = live_equipment_pages().order_by('id').values_list('id', flat=True)
+    last_id = 0
+    while True:
+        chunk = list(pages.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+def rebuild_facet_index(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Rebuild the facet rows of all live LabEquipmentPages, chunk_size pages at a time.
+
+    Each chunk is replaced in its own transaction, so searches keep working during
+    the rebuild.
+
+    Returns:
+        tuple: (number of pages indexed, number of facet rows)
+    """
+    page_count = row_count = 0
+    for chunk in live_page_id_chunks(chunk_size):
+        row_count += refresh_page_facets(chunk)
+        page_count += len(chunk)
+        logger.info(f"Indexed facets of {page_count} pages")
+
+    # Pages that stopped being live without a signal (e.g. bulk updates)
+    PageTagFacet.objects.exclude(page_id__in=live_equipment_pages().values('id')).delete()
+    return page_count, row_count
+
+
+def filter_pages(pages, selected):
+    """
+    Restrict pages to those with at least one selected tag in every category.
+
+    Args:
+        pages: Page queryset
+        selected: Dict of category name -> list of selected tag names
+
+    Returns:
+        QuerySet: pages, filtered in SQL; empty if a category has no matching tag
+    """
+    selected = {category: names for category, names in selected.items() if names}
+    if not selected:
+        return pages
+
+    matches = Q()
+    for category, names in selected.items():
+        matches |= Q(category=category, name__in=names)
+    tag_ids = defaultdict(list)
+    for category, tag_id in CategorizedTag.objects.filter(matches).values_list('category', 'id'):
+        tag_ids[category].append(tag_id)
+
+    for category in selected:
+        if not tag_ids[category]:
+            return pages.none()
+        pages = pages.filter(id__in=PageTagFacet.objects.filter(tag_id__in=tag_ids[category]).values('page_id'))
+    return pages
+
+
+def facet_counts(pages):
+    """
+    Count the pages of each tag, for every category, in one grouped query.
+
+    Args:
+        pages: Page queryset, usually filtered by filter_pages
+
+    Returns:
+        dict: category name -> list of {'name', 'page_count'} dicts ordered by name
+    """
+    rows = (
+        PageTagFacet.objects
+        .filter(page_id__in=pages.values('id'))
+        .values('category', 'tag__name')
+        .annotate(page_count=Count('page_id'))
+        .order_by('category', 'tag__name')
+    )
+    counts = defaultdict(list)
+    for row in rows:
+        counts[row['category']].append({'name': row['tag__name'], 'page_count': row['page_count']})
+    return dict(counts)
+
+
+@receiver(post_save, sender=LabEquipmentPage)
+@receiver(page_unpublished, sender=LabEquipmentPage)
+def _refresh_changed_page(sender, instance, **kwargs):
+    # Publishing saves the page with its tags, so post_save covers page_published;
+    # unpublishing may save the base Page. Refresh once the transaction commits.
+    refresh_pages_on_commit(refresh_page_facets, instance.pk)
+
+
+@receiver(post_save, sender=CategorizedTag)
+def _follow_tag_category(sender, instance, created, **kwargs):
+    if not created:
+        PageTagFacet.objects.filter(tag=instance).exclude(category=instance.category).update(
+            category=instance.category
+        )
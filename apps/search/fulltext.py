@@ -0,0 +1,191 @@
+"""
+Weighted full-text search over live LabEquipmentPages.
+
+Each live page has a PageSearchDocument holding its lowercased text in one column
+per weight: title, tag names, model names, spec groups/keys/values, and
+descriptions with features. search_pages() turns a query into SQL on the page queryset it is
+given: every term must occur in some column, and the rank is the sum of the
+weights of the columns each term occurs in. The result is still a Page queryset, so
+it composes with the facet filters and counts of apps.search.facets and is
+paginated by the database.
+
+Terms are matched as substrings (SQL LIKE '%term%'), so "pump" also matches
+"pumps" and "pumpkin", and no index can serve the match: every search scans the
+document table. That is fast enough for a catalogue of a few thousand pages; a
+larger one needs a real full-text index (SQLite FTS5 or PostgreSQL tsvector).
+
+Wagtail's database backend is not used for the public search: on SQLite it
+resolves matches to a Python list of IDs and ignores field boosts, and its results
+cannot be filtered further. LabEquipmentPage.search_fields only indexes the page's
+own text, for the admin's page search.
+
+Documents are refreshed when a page is saved (which includes publishing) or
+unpublished, once per transaction, and for the pages of a tag when the tag is
+renamed. `python manage.py rebuild_search_index` rebuilds them in chunks.
+"""
+
+import logging
+import re
+from html import unescape
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Prefetch, Q, Value, When
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.html import strip_tags
+from wagtail.signals import page_unpublished
+
+from apps.base_site.models import LabEquipmentPage
+from apps.categorized_tags.models import CategorizedPageTag, CategorizedTag
+
+from .facets import DEFAULT_CHUNK_SIZE, live_equipment_pages, live_page_id_chunks, refresh_pages_on_commit
+from .models import PageSearchDocument
+
+logger = logging.getLogger(__name__)
+
+# Rank contributed by a query term found in each document column
+FIELD_WEIGHTS = {
+    'title': 5,
+    'tags': 4,
+    'model_names': 3,
+    'specs': 2,
+    'description': 1,
+}
+MAX_QUERY_TERMS = 10
+
+TERM_RE = re.compile(r'\w+')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def query_terms(query):
+    """Split a search query into at most MAX_QUERY_TERMS distinct lowercase terms."""
+    return list(dict.fromkeys(TERM_RE.findall(query.lower())))[:MAX_QUERY_TERMS]
+
+
+def normalize_text(*parts):
+    """Join text parts into one lowercased line, without markup."""
+    text = ' '.join(unescape(strip_tags(part)) for part in parts if part)
+    return WHITESPACE_RE.sub(' ', text).strip().lower()
+
+
+def search_document(page):
+    """
+    Build the search document of a page.
+
+    Args:
+        page: LabEquipmentPage with its spec groups, models, features and tagged items prefetched
+
+    Returns:
+        PageSearchDocument: The unsaved document
+    """
+    specs = []
+    spec_groups = list(page.spec_groups.all())
+    for model in page.models.all():
+        spec_groups.extend(model.spec_groups.all())
+    for group in spec_groups:
+        specs.append(group.name)
+        for spec in group.specs.all():
+            specs.extend((spec.key, spec.value))
+
+    return PageSearchDocument(
+        page_id=page.pk,
+        title=normalize_text(page.title),
+        tags=normalize_text(*(item.tag.name for item in page.categorized_tagged_items.all())),
+        model_names=normalize_text(*(model.name for model in page.models.all())),
+        specs=normalize_text(*specs),
+        description=normalize_text(page.short_description, page.full_description,
+                                   *(feature.feature for feature in page.features.all())),
+    )
+
+
+def refresh_search_documents(page_ids):
+    """
+    Rebuild the search documents of pages in a fixed number of queries.
+
+    Pages that are not live LabEquipmentPages lose their documents.
+
+    Args:
+        page_ids: IDs of the pages to refresh
+
+    Returns:
+        int: Number of documents written
+    """
+    page_ids = list(page_ids)
+    if not page_ids:
+        return 0
+
+    pages = LabEquipmentPage.objects.live().filter(id__in=page_ids).prefetch_related(
+        'spec_groups__specs',
+        'models__spec_groups__specs',
+        'features',
+        Prefetch('categorized_tagged_items', queryset=CategorizedPageTag.objects.select_related('tag')),
+    )
+
+    with transaction.atomic():
+        documents = [search_document(page) for page in pages]
+        PageSearchDocument.objects.filter(page_id__in=page_ids).delete()
+        PageSearchDocument.objects.bulk_create(documents, batch_size=DEFAULT_CHUNK_SIZE)
+    return len(documents)
+
+
+def rebuild_search_documents(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Rebuild the search documents of all live LabEquipmentPages, chunk_size pages at a time.
+
+    Returns:
+        int: Number of documents written
+    """
+    count = 0
+    for chunk in live_page_id_chunks(chunk_size):
+        count += refresh_search_documents(chunk)
+        logger.info(f"Indexed search documents of {count} pages")
+
+    # Pages that stopped being live without a signal (e.g. bulk updates)
+    PageSearchDocument.objects.exclude(page_id__in=live_equipment_pages().values('id')).delete()
+    return count
+
+
+def search_pages(pages, query):
+    """
+    Restrict pages to those matching every term of query, ranked by relevance.
+
+    Args:
+        pages: Page queryset
+        query: Search query
+
+    Returns:
+        QuerySet: pages with a search_rank annotation, best matches first
+    """
+    terms = query_terms(query)
+    if not terms:
+        return pages.none()
+
+    rank = Value(0)
+    for term in terms:
+        matches = Q()
+        for field, weight in FIELD_WEIGHTS.items():
+            lookup = Q(**{f'search_document__{field}__contains': term})
+            matches |= lookup
+            rank = rank + Case(When(lookup, then=Value(weight)), default=Value(0), output_field=IntegerField())
+        pages = pages.filter(matches)
+
+    return pages.annotate(search_rank=rank).order_by('-search_rank', 'path')
+
+
+@receiver(post_save, sender=LabEquipmentPage)
+@receiver(page_unpublished, sender=LabEquipmentPage)
+def _refresh_changed_page(sender, instance, **kwargs):
+    refresh_pages_on_commit(refresh_search_documents, instance.pk)
+
+
+@receiver(post_save, sender=CategorizedTag)
+def _refresh_tagged_pages(sender, instance, created, **kwargs):
+    if created:
+        return
+
+    def refresh():
+        page_ids = CategorizedPageTag.objects.filter(tag=instance).values_list('content_object_id', flat=True)
+        for start in range(0, len(page_ids), DEFAULT_CHUNK_SIZE):
+            refresh_search_documents(page_ids[start:start + DEFAULT_CHUNK_SIZE])
+
+    transaction.on_commit(refresh)
@@ -0,0 +1,185 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.test.utils import CaptureQueriesContext
+from wagtail.models import Locale, Page
+
+from apps.base_site.models import LabEquipmentPage
+from apps.categorized_tags.models import CategorizedPageTag, CategorizedTag, TagCategory
+from apps.search.facets import facet_counts, filter_pages, live_equipment_pages, rebuild_facet_index
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark faceted search filtering and counting on synthetic lab equipment pages, '
+        'comparing per-category queries with the facet index. All data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, nargs='+', default=[10000, 100000],
+                            help='Numbers of synthetic pages to benchmark (default: 10000 100000)')
+        parser.add_argument('--categories', type=int, default=8, help='Tag categories (default: 8)')
+        parser.add_argument('--tags', type=int, default=25, help='Tags per category (default: 25)')
+        parser.add_argument('--filters', type=int, default=2,
+                            help='Categories with a selected value in the benchmarked search (default: 2)')
+        parser.add_argument('--iterations', type=int, default=5, help='Timed runs per plan (default: 5)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic data')
+
+    def handle(self, *args, **options):
+        for page_count in options['pages']:
+            try:
+                with transaction.atomic():
+                    self._benchmark(page_count, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def _benchmark(self, page_count, options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f"\n{page_count} pages, {options['categories']} categories x {options['tags']} tags")
+
+        start = time.perf_counter()
+        categories, tags = self._create_tags(options['categories'], options['tags'])
+        page_ids = self._create_pages(page_count)
+        CategorizedPageTag.objects.bulk_create(
+            [
+                CategorizedPageTag(content_object_id=page_id, tag_id=rng.choice(category_tags))
+                for page_id in page_ids
+                for category_tags in tags.values()
+            ],
+            batch_size=5000,
+        )
+        self.stdout.write(f"  synthetic data:     {time.perf_counter() - start:8.2f} s")
+
+        start = time.perf_counter()
+        rebuild_facet_index(chunk_size=5000)
+        self.stdout.write(f"  index build:        {time.perf_counter() - start:8.2f} s")
+
+        # Select the first tag of the first categories, as a visitor narrowing a search would
+        applied_filters = {
+            category.name: [CategorizedTag.objects.get(id=tags[category.name][0]).name]
+            for category in categories[:options['filters']]
+        }
+        plans = (
+            ('per-category', lambda: self._per_category_plan(applied_filters)),
+            ('facet index', lambda: self._facet_index_plan(applied_filters)),
+        )
+
+        results = {}
+        for label, plan in plans:
+            timings = []
+            for _ in range(max(1, options['iterations'])):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    matches, counts = plan()
+                    timings.append((time.perf_counter() - start) * 1000)
+            results[label] = (statistics.median(timings), len(queries), matches, counts)
+            self.stdout.write(f"  {label:<18}  {statistics.median(timings):8.1f} ms  {len(queries):3d} queries  "
+                              f"{matches} matching pages")
+
+        (before_ms, _, before_matches, before_counts), (after_ms, _, after_matches, after_counts) = results.values()
+        if (before_matches, before_counts) != (after_matches, after_counts):
+            self.stdout.write(self.style.ERROR("  the plans disagree on matches or counts"))
+        elif after_ms > 0:
+            self.stdout.write(self.style.SUCCESS(f"  facet index speedup: {before_ms / after_ms:.1f}x"))
+
+    def _create_tags(self, category_count, tag_count):
+        suffix = uuid.uuid4().hex[:8]
+        categories = [TagCategory.objects.create(name=f'Benchmark {n} {suffix}') for n in range(category_count)]
+        CategorizedTag.objects.bulk_create([
+            CategorizedTag(name=f'{category.name} value {n}', category=category.name, slug=f'benchmark-{suffix}-{c}-{n}')
+            for c, category in enumerate(categories)
+            for n in range(tag_count)
+        ])
+        tags = {category.name: [] for category in categories}
+        for category, tag_id in (CategorizedTag.objects.filter(category__in=tags)
+                                 .order_by('id').values_list('category', 'id')):
+            tags[category].append(tag_id)
+        return categories, tags
+
+    def _create_pages(self, page_count):
+        """Insert live LabEquipmentPages under a new root without going through treebeard."""
+        content_type = ContentType.objects.get_for_model(LabEquipmentPage)
+        locale = Locale.get_default()
+        root_path = 'ZZZZ'
+        alphabet = Page.alphabet
+
+        def step(n):
+            digits = ''
+            for _ in range(Page.steplen):
+                n, digit = divmod(n, len(alphabet))
+                digits = alphabet[digit] + digits
+            return digits
+
+        Page.objects.bulk_create([
+            Page(
+                path=root_path + step(n + 1), depth=2, numchild=0, title=f'Benchmark page {n}',
+                slug=f'benchmark-page-{n}', content_type=content_type, live=True, locale=locale,
+                translation_key=uuid.uuid4(), draft_title=f'Benchmark page {n}',
+            )
+            for n in range(page_count)
+        ], batch_size=5000)
+        page_ids = list(Page.objects.filter(path__startswith=root_path, depth=2).values_list('id', flat=True))
+
+        # bulk_create does not support multi-table inheritance: insert the LabEquipmentPage
+        # rows with the field defaults directly
+        fields = LabEquipmentPage._meta.local_concrete_fields
+        defaults = [None if field.primary_key else field.get_db_prep_save(field.get_default(), connection)
+                    for field in fields]
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {connection.ops.quote_name(LabEquipmentPage._meta.db_table)} ({columns}) '
+                f'VALUES ({placeholders})',
+                [[page_id if value is None and field.primary_key else value for field, value in zip(fields, defaults)]
+                 for page_id in page_ids],
+            )
+        return page_ids
+
+    def _per_category_plan(self, applied_filters):
+        """The queries the search view ran before the facet index."""
+        base_pages = live_equipment_pages()
+        for category_name, values in applied_filters.items():
+            tag_ids = CategorizedTag.objects.filter(category=category_name, name__in=values).values_list('id', flat=True)
+            page_ids_with_tag = Page.objects.filter(categorized_tagged_items__tag_id__in=tag_ids).values_list('id', flat=True)
+            if not page_ids_with_tag:
+                return 0, {}
+            base_pages = base_pages.filter(id__in=page_ids_with_tag)
+
+        page_ids = list(base_pages.values_list('id', flat=True))
+        counts = {}
+        specific_pages = LabEquipmentPage.objects.filter(page_ptr_id__in=page_ids)
+        for category in TagCategory.objects.order_by('name'):
+            tag_ids = (CategorizedTag.objects
+                       .filter(category=category.name)
+                       .filter(categorized_tags_categorizedpagetag_items__content_object__in=specific_pages)
+                       .values_list('id', flat=True)
+                       .distinct())
+            if tag_ids:
+                tags_with_counts = list(
+                    CategorizedTag.objects
+                    .filter(id__in=tag_ids)
+                    .annotate(page_count=Count('categorized_tags_categorizedpagetag_items',
+                                               filter=Q(categorized_tags_categorizedpagetag_items__content_object__in=specific_pages)))
+                    .values('name', 'page_count')
+                    .order_by('name')
+                )
+                if tags_with_counts:
+                    counts[category.name] = tags_with_counts
+        return len(page_ids), counts
+
+    def _facet_index_plan(self, applied_filters):
+        pages = filter_pages(live_equipment_pages(), applied_filters)
+        counts = facet_counts(pages)
+        return pages.count(), counts
@@ -0,0 +1,19 @@
+import logging
+from django.core.management.base import BaseCommand
+from apps.search.facets import DEFAULT_CHUNK_SIZE, rebuild_facet_index
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the tag facet index of live lab equipment pages used by faceted search. '
+        'The index is maintained on save and publish; run this after bulk changes to pages or tags.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help=f'Pages indexed per transaction (default: {DEFAULT_CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        pages, rows = rebuild_facet_index(chunk_size=max(1, options['chunk_size']))
+        self.stdout.write(self.style.SUCCESS(f"Indexed {rows} tags of {pages} pages"))
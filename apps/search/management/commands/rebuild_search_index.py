@@ -0,0 +1,20 @@
+import logging
+from django.core.management.base import BaseCommand
+from apps.search.facets import DEFAULT_CHUNK_SIZE
+from apps.search.fulltext import rebuild_search_documents
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the full-text search documents of live lab equipment pages. '
+        'Documents are maintained on save and publish; run this after bulk changes to pages or tags.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help=f'Pages indexed per transaction (default: {DEFAULT_CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        pages = rebuild_search_documents(chunk_size=max(1, options['chunk_size']))
+        self.stdout.write(self.style.SUCCESS(f"Indexed {pages} pages"))
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.15 on 2026-10-17 03:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('categorized_tags', '0001_initial'),
+        ('wagtailcore', '0094_alter_page_locale'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageTagFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=100)),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wagtailcore.page')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='categorized_tags.categorizedtag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', 'page'], name='search_facet_tag_page_idx'), models.Index(fields=['category', 'tag'], name='search_facet_category_idx')],
+                'unique_together': {('page', 'tag')},
+            },
+        ),
+    ]
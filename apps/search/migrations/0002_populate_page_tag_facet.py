@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def populate(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Page = apps.get_model('wagtailcore', 'Page')
+    CategorizedPageTag = apps.get_model('categorized_tags', 'CategorizedPageTag')
+    PageTagFacet = apps.get_model('search', 'PageTagFacet')
+
+    content_type = ContentType.objects.filter(app_label='base_site', model='labequipmentpage').first()
+    if content_type is None:
+        return
+
+    live_pages = Page.objects.filter(live=True, content_type=content_type).values('id')
+    rows = CategorizedPageTag.objects.filter(content_object_id__in=live_pages).values_list(
+        'content_object_id', 'tag_id', 'tag__category'
+    )
+    PageTagFacet.objects.bulk_create(
+        (PageTagFacet(page_id=page_id, tag_id=tag_id, category=category) for page_id, tag_id, category in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('search', '0001_page_tag_facet'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-17 03:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_populate_page_tag_facet'),
+        ('wagtailcore', '0094_alter_page_locale'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageSearchDocument',
+            fields=[
+                ('page', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='wagtailcore.page')),
+                ('title', models.TextField()),
+                ('tags', models.TextField(blank=True)),
+                ('model_names', models.TextField(blank=True)),
+                ('specs', models.TextField(blank=True)),
+                ('description', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,71 @@
+import re
+from html import unescape
+
+from django.db import migrations
+from django.db.models import Prefetch
+from django.utils.html import strip_tags
+
+# A copy of apps.search.fulltext as of this migration, so later changes to that
+# module cannot break it; `python manage.py rebuild_search_index` rebuilds the
+# documents with the current code
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(*parts):
+    text = ' '.join(unescape(strip_tags(part)) for part in parts if part)
+    return WHITESPACE_RE.sub(' ', text).strip().lower()
+
+
+def search_document(PageSearchDocument, page):
+    specs = []
+    spec_groups = list(page.spec_groups.all())
+    for model in page.models.all():
+        spec_groups.extend(model.spec_groups.all())
+    for group in spec_groups:
+        specs.append(group.name)
+        for spec in group.specs.all():
+            specs.extend((spec.key, spec.value))
+
+    return PageSearchDocument(
+        page_id=page.pk,
+        title=normalize_text(page.title),
+        tags=normalize_text(*(item.tag.name for item in page.categorized_tagged_items.all())),
+        model_names=normalize_text(*(model.name for model in page.models.all())),
+        specs=normalize_text(*specs),
+        description=normalize_text(page.short_description, page.full_description,
+                                   *(feature.feature for feature in page.features.all())),
+    )
+
+
+def populate(apps, schema_editor):
+    LabEquipmentPage = apps.get_model('base_site', 'LabEquipmentPage')
+    CategorizedPageTag = apps.get_model('categorized_tags', 'CategorizedPageTag')
+    PageSearchDocument = apps.get_model('search', 'PageSearchDocument')
+
+    pages = LabEquipmentPage.objects.filter(live=True).order_by('id').prefetch_related(
+        'spec_groups__specs',
+        'models__spec_groups__specs',
+        'features',
+        Prefetch('categorized_tagged_items', queryset=CategorizedPageTag.objects.select_related('tag')),
+    )
+    PageSearchDocument.objects.bulk_create(
+        (search_document(PageSearchDocument, page) for page in pages.iterator(chunk_size=500)),
+        batch_size=1000,
+    )
+
+
+def depopulate(apps, schema_editor):
+    apps.get_model('search', 'PageSearchDocument').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base_site', '0013_labequipmentpage_content_fingerprint'),
+        ('categorized_tags', '0001_initial'),
+        ('search', '0003_page_search_document'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate, depopulate),
+    ]
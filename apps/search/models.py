@@ -0,0 +1,46 @@
+from django.db import models
+
+from apps.categorized_tags.models import CategorizedTag
+
+
+class PageTagFacet(models.Model):
+    """
+    One categorized tag of a live LabEquipmentPage, denormalized for faceted search.
+
+    The table mirrors CategorizedPageTag for live equipment pages only and copies the
+    tag's category, so filtering and counting facets never join the tag table. It is
+    maintained by apps.search.facets.
+    """
+    page = models.ForeignKey('wagtailcore.Page', on_delete=models.CASCADE, related_name='+')
+    tag = models.ForeignKey(CategorizedTag, on_delete=models.CASCADE, related_name='+')
+    category = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ('page', 'tag')
+        indexes = [
+            models.Index(fields=['tag', 'page'], name='search_facet_tag_page_idx'),
+            models.Index(fields=['category', 'tag'], name='search_facet_category_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.page_id}: {self.category}: {self.tag_id}"
+
+
+class PageSearchDocument(models.Model):
+    """
+    Searchable text of a live LabEquipmentPage, one column per ranking weight.
+
+    Text is stored lowercased, so matching needs no LOWER() per row. It is
+    maintained by apps.search.fulltext.
+    """
+    page = models.OneToOneField('wagtailcore.Page', on_delete=models.CASCADE, primary_key=True,
+                                related_name='search_document')
+    title = models.TextField()
+    tags = models.TextField(blank=True)
+    model_names = models.TextField(blank=True)
+    specs = models.TextField(blank=True)
+    description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title
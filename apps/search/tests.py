@@ -0,0 +1,233 @@
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.base_site.api import create_lab_equipment_page
+from apps.base_site.models import LabEquipmentPage
+from apps.categorized_tags.resolver import resolve_tag_ids
+
+from .facets import facet_counts, filter_pages, live_equipment_pages, rebuild_facet_index, refresh_page_facets, \
+    refresh_pages_on_commit
+from .fulltext import rebuild_search_documents, refresh_search_documents, search_pages
+from .models import PageSearchDocument, PageTagFacet
+
+
+STATIC_FILES = override_settings(STORAGES={
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+
+
+class LabEquipmentPageMixin:
+
+    def create_page(self, n, tags, is_published=True, **data):
+        # Tags are resolved outside captureOnCommitCallbacks, so the resolver does not
+        # cache IDs that are rolled back after the test
+        tag_ids = resolve_tag_ids(tags)
+        with self.captureOnCommitCallbacks(execute=True):
+            result = create_lab_equipment_page({
+                'title': f'Fume hood {n}',
+                'slug': f'fume-hood-{n}',
+                'short_description': f'Fume hood number {n}',
+                'processed_tag_ids': tag_ids,
+                'is_published': is_published,
+                **data,
+            })
+        self.assertTrue(result['success'], result)
+        return LabEquipmentPage.objects.get(id=result['page_id'])
+
+
+class FacetIndexTests(LabEquipmentPageMixin, TestCase):
+
+    def facets(self):
+        return set(PageTagFacet.objects.values_list('page_id', 'category', 'tag__name'))
+
+    def setUp(self):
+        self.first = self.create_page(1, ['Manufacturer: AirScience', 'Type: Fume Hood'])
+        self.second = self.create_page(2, ['Manufacturer: AirScience', 'Type: Enclosure'])
+        self.third = self.create_page(3, ['Manufacturer: Other', 'Type: Fume Hood'])
+
+    def test_index_follows_publish_and_unpublish(self):
+        draft = self.create_page(4, ['Manufacturer: Other'], is_published=False)
+        self.assertIn((self.first.id, 'Manufacturer', 'AirScience'), self.facets())
+        self.assertFalse(PageTagFacet.objects.filter(page=draft).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.save_revision().publish()
+        self.assertTrue(PageTagFacet.objects.filter(page=draft).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.unpublish()
+        self.assertFalse(PageTagFacet.objects.filter(page=self.first).exists())
+
+    def test_import_refreshes_the_index_once(self):
+        # Publishing saves the page several times, each sending post_save
+        with mock.patch('apps.search.facets.refresh_page_facets', wraps=refresh_page_facets) as refresh, \
+                CaptureQueriesContext(connection) as queries:
+            page = self.create_page(4, ['Type: Fume Hood'], features=['Ductless'],
+                                    models=[{'name': 'Purair', 'specifications': [
+                                        {'name': 'Power', 'specs': [{'key': 'Voltage', 'value': '230V'}]}]}])
+
+        refresh.assert_called_once_with([page.id])
+        # One delete and one insert
+        self.assertEqual(len([query for query in queries if 'search_pagetagfacet' in query['sql']]), 2)
+
+    def test_pages_changed_in_a_rolled_back_savepoint_are_not_refreshed(self):
+        refresh = mock.Mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError), transaction.atomic():
+                refresh_pages_on_commit(refresh, 1)
+                raise ValueError
+            refresh_pages_on_commit(refresh, 3)
+            refresh_pages_on_commit(refresh, 2)
+            refresh_pages_on_commit(refresh, 3)
+
+        refresh.assert_called_once_with([2, 3])
+
+    def test_rebuild_matches_incremental_index(self):
+        facets = self.facets()
+        PageTagFacet.objects.all().delete()
+
+        self.assertEqual(rebuild_facet_index(chunk_size=2), (3, 6))
+        self.assertEqual(self.facets(), facets)
+
+    def test_filters_and_counts_in_fixed_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            pages = filter_pages(live_equipment_pages(), {'Manufacturer': ['AirScience'], 'Type': ['Fume Hood', 'Enclosure']})
+            self.assertEqual(set(pages.values_list('id', flat=True)), {self.first.id, self.second.id})
+            counts = facet_counts(pages)
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(counts, {
+            'Manufacturer': [{'name': 'AirScience', 'page_count': 2}],
+            'Type': [{'name': 'Enclosure', 'page_count': 1}, {'name': 'Fume Hood', 'page_count': 1}],
+        })
+
+        self.assertFalse(filter_pages(live_equipment_pages(), {'Manufacturer': ['Unknown']}).exists())
+
+    @STATIC_FILES
+    def test_search_view_uses_facet_index(self):
+        response = self.client.get(reverse('search'), {'type': 'Fume Hood'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({page.id for page in response.context['search_results']}, {self.first.id, self.third.id})
+        self.assertEqual(response.context['applied_filters'], {'Type': ['Fume Hood']})
+        manufacturers = response.context['available_filters']['Manufacturer']
+        self.assertEqual([(tag['name'], tag['page_count']) for tag in manufacturers], [('AirScience', 1), ('Other', 1)])
+
+
+@STATIC_FILES
+class SearchResultsTests(LabEquipmentPageMixin, TestCase):
+
+    def create_products(self, start, count):
+        for n in range(start, start + count):
+            self.create_page(n, ['Manufacturer: AirScience', f'Type: Type {n}', f'Application: Use {n}', 'Size: Large'],
+                             images=[f'https://example.com/{n}/front.jpg', f'https://example.com/{n}/back.jpg'])
+
+    def search(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('search'), params)
+            response.render()
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_renders_a_results_page_in_fixed_queries(self):
+        self.create_products(0, 3)
+        _, few_queries = self.search(manufacturer='AirScience')
+
+        self.create_products(3, 27)
+        response, many_queries = self.search(manufacturer='AirScience')
+
+        self.assertEqual(many_queries, few_queries)
+        results = response.context['search_results']
+        self.assertEqual(results.paginator.count, 30)
+        self.assertEqual(len(results.object_list), 12)
+        first = results.object_list[0]
+        self.assertIsInstance(first, LabEquipmentPage)
+        self.assertEqual(first.main_image_url(), 'https://example.com/0/front.jpg')
+        self.assertEqual([tag['name'] for tag in first.card_tags], ['AirScience', 'Type 0', 'Use 0'])
+        self.assertContains(response, 'https://example.com/0/front.jpg')
+
+    def test_paginates_before_specializing(self):
+        self.create_products(0, 13)
+        response, _ = self.search(manufacturer='AirScience', page=2)
+
+        self.assertEqual([page.title for page in response.context['search_results']], ['Fume hood 12'])
+
+
+@STATIC_FILES
+class FullTextSearchTests(LabEquipmentPageMixin, TestCase):
+
+    def setUp(self):
+        self.hood = self.create_page(1, ['Manufacturer: AirScience', 'Type: Fume Hood'], title='Ductless hood')
+        self.cabinet = self.create_page(2, ['Manufacturer: Other', 'Type: Cabinet'], title='Storage cabinet',
+                                        full_description='<p>Replaces a <b>ductless</b> hood for storage.</p>',
+                                        specifications=[{'name': 'Airflow', 'specs': [{'key': 'Filter', 'value': 'HEPA'}]}])
+        self.enclosure = self.create_page(3, ['Manufacturer: AirScience', 'Type: Enclosure'], title='Balance enclosure',
+                                          models=[{'name': 'Purair 3000', 'specifications': [
+                                              {'name': 'Power', 'specs': [{'key': 'Voltage', 'value': '230V'}]}]}])
+
+    def search(self, query, pages=None):
+        pages = live_equipment_pages() if pages is None else pages
+        return list(search_pages(pages, query).values_list('title', flat=True))
+
+    def test_matches_specs_models_tags_and_descriptions(self):
+        self.assertEqual(self.search('hepa'), ['Storage cabinet'])
+        self.assertEqual(self.search('purair'), ['Balance enclosure'])
+        self.assertEqual(self.search('230v'), ['Balance enclosure'])
+        self.assertEqual(self.search('airscience'), ['Ductless hood', 'Balance enclosure'])
+        self.assertEqual(self.search('storage FILTER'), ['Storage cabinet'])
+        self.assertEqual(self.search('hepa purair'), [])
+        self.assertEqual(self.search('  '), [])
+
+    def test_ranks_by_field_weight(self):
+        # A title match outranks a match in the description
+        self.assertEqual(self.search('ductless'), ['Ductless hood', 'Storage cabinet'])
+        ranks = dict(search_pages(live_equipment_pages(), 'ductless hood').values_list('title', 'search_rank'))
+        # title 'ductless' + title, tag and description 'hood'; description only
+        self.assertEqual(ranks, {'Ductless hood': 5 + 5 + 4 + 1, 'Storage cabinet': 1 + 1})
+
+    def test_composes_with_tag_filters(self):
+        pages = filter_pages(live_equipment_pages(), {'Manufacturer': ['Other']})
+        self.assertEqual(self.search('ductless', pages), ['Storage cabinet'])
+
+        response = self.client.get(reverse('search'), {'query': 'ductless', 'type': 'Fume Hood'})
+        self.assertEqual([page.id for page in response.context['search_results']], [self.hood.id])
+        types = response.context['available_filters']['Type']
+        self.assertEqual([(tag['name'], tag['page_count']) for tag in types], [('Fume Hood', 1)])
+
+    def test_documents_follow_publish_and_unpublish(self):
+        draft = self.create_page(4, ['Type: Fume Hood'], is_published=False, title='Walk-in hood')
+        self.assertEqual(self.search('walk'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.save_revision().publish()
+        self.assertEqual(self.search('walk'), ['Walk-in hood'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hood.unpublish()
+        self.assertEqual(self.search('ductless'), ['Storage cabinet'])
+
+    def test_import_refreshes_the_document_once(self):
+        with mock.patch('apps.search.fulltext.refresh_search_documents', wraps=refresh_search_documents) as refresh, \
+                CaptureQueriesContext(connection) as queries:
+            page = self.create_page(4, ['Type: Fume Hood'], title='Walk-in hood', features=['Ductless'],
+                                    models=[{'name': 'Purair', 'specifications': [
+                                        {'name': 'Power', 'specs': [{'key': 'Voltage', 'value': '230V'}]}]}])
+
+        refresh.assert_called_once_with([page.id])
+        # One delete and one insert
+        self.assertEqual(len([query for query in queries if 'search_pagesearchdocument' in query['sql']]), 2)
+        self.assertEqual(self.search('purair'), ['Balance enclosure', 'Walk-in hood'])
+
+    def test_rebuild_matches_incremental_documents(self):
+        documents = set(PageSearchDocument.objects.values_list('page_id', 'title', 'tags', 'model_names', 'specs',
+                                                                'description'))
+        PageSearchDocument.objects.all().delete()
+
+        self.assertEqual(rebuild_search_documents(chunk_size=2), 3)
+        self.assertEqual(set(PageSearchDocument.objects.values_list('page_id', 'title', 'tags', 'model_names', 'specs',
+                                                                     'description')), documents)
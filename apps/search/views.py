@@ -1,13 +1,15 @@
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.template.response import TemplateResponse
 
-from django.db.models import Count, Q
 from django.http import Http404
 from django.contrib.contenttypes.models import ContentType
 
 from wagtail.models import Page
 from apps.base_site.models import LabEquipmentPage, MultiProductPage
+from apps.base_site.product_cards import prefetch_product_cards
 from apps.categorized_tags.models import CategorizedTag, TagCategory
+from .facets import facet_counts, filter_pages
+from .fulltext import search_pages
 
 
 # To enable logging of search queries for use with the "Promoted search results" module
@@ -30,22 +32,11 @@ def search(request):
         content_type=labequipment_content_type
     )
     
-    # Apply search if provided
+    # Apply search if provided. The ranked match is composed into the page query,
+    # so the tag filters, facet counts and pagination below all run in SQL
     if search_query:
-        # Search happens on the specific pages
-        specific_pages = LabEquipmentPage.objects.live()
-        search_results = specific_pages.search(search_query)
-        
-        # Get the IDs from the search results
-        result_ids = [result.id for result in search_results]
-        
-        # Filter the base pages by these IDs
-        if result_ids:
-            base_pages = base_pages.filter(id__in=result_ids)
-        else:
-            # No results found
-            base_pages = Page.objects.none()
-            
+        base_pages = search_pages(base_pages, search_query)
+
         # To log this query for use with the "Promoted search results" module:
         # query = Query.get(search_query)
         # query.add_hit()
@@ -57,80 +48,29 @@ def search(request):
     category_colors = {category.name: category.color for category in tag_categories}
     
     # Keep track of applied filters
+    # URL parameter format: ?manufacturer=AirScience&manufacturer=Other&type=Fume+Hood
     applied_filters = {}
-    
-    # Process tag filters from URL parameters
     for category in tag_categories:
-        # URL parameter format: ?manufacturer=AirScience&manufacturer=Other&type=Fume+Hood
         category_values = request.GET.getlist(category.name.lower())
         if category_values:
-            # Store applied filters for displaying in template
             applied_filters[category.name] = category_values
-            
-            # Get tag IDs for the selected category values
-            tag_ids = CategorizedTag.objects.filter(
-                category=category.name,
-                name__in=category_values
-            ).values_list('id', flat=True)
-            
-            # Get page IDs that have these tags
-            # Using categorized_tagged_items relationship defined in CategorizedPageTag
-            page_ids_with_tag = Page.objects.filter(
-                categorized_tagged_items__tag_id__in=tag_ids
-            ).values_list('id', flat=True)
-            
-            # Filter base pages to include only those with matching tags
-            if page_ids_with_tag:
-                base_pages = base_pages.filter(id__in=page_ids_with_tag)
-            else:
-                # No pages match this filter
-                base_pages = Page.objects.none()
-                break
     
-    # Get the IDs of the filtered base pages
-    page_ids = list(base_pages.values_list('id', flat=True))
+    # Filter the pages through the facet index: one subquery per category, all
+    # composed into the page query
+    base_pages = filter_pages(base_pages, applied_filters)
     
-    # Get available tags for each category with counts
+    # Get available tags for each category with counts, in one grouped query
     available_filters = {}
-    if page_ids:  # Only process if we have results
-        # Convert to specific pages for tag counting
-        specific_pages = LabEquipmentPage.objects.filter(page_ptr_id__in=page_ids)
-        
-        for category in tag_categories:
-            # Get tags that are used by any of the specific pages
-            # Get through the categorized_tagged_items relationship
-            tag_ids = (CategorizedTag.objects
-                      .filter(category=category.name)
-                      .filter(categorized_tags_categorizedpagetag_items__content_object__in=specific_pages)
-                      .values_list('id', flat=True)
-                      .distinct())
-            
-            if tag_ids:
-                # Get the tags with counts
-                tags_with_counts = (
-                    CategorizedTag.objects
-                    .filter(id__in=tag_ids)
-                    .annotate(page_count=Count('categorized_tags_categorizedpagetag_items',
-                                              filter=Q(categorized_tags_categorizedpagetag_items__content_object__in=specific_pages)))
-                    .values('name', 'page_count')
-                    .order_by('name')
-                )
-                
-                # Add the category color to each tag
-                tags_list = list(tags_with_counts)
-                for tag in tags_list:
-                    tag['category_color'] = category_colors.get(category.name, '#777777')
-                    
-                if tags_list:
-                    available_filters[category.name] = tags_list
-    
-    # Get specific pages for the results (with full data)
-    specific_pages = []
-    if page_ids:
-        specific_pages = [p.specific for p in base_pages]
+    for category_name, tags_list in facet_counts(base_pages).items():
+        if category_name not in category_colors:
+            continue
+        for tag in tags_list:
+            tag['category_color'] = category_colors[category_name]
+        available_filters[category_name] = tags_list
     
-    # Pagination
-    paginator = Paginator(specific_pages, 12)  # Show 12 products per page
+    # Pagination. Only the pages of the current result page are turned into
+    # specific pages, with one query per page type
+    paginator = Paginator(base_pages.specific(), 12)  # Show 12 products per page
     try:
         search_results = paginator.page(page_num)
 
@@ -139,6 +79,9 @@ def search(request):
     except EmptyPage:
         search_results = paginator.page(paginator.num_pages)
 
+    # Load the images and tags of the listed products in bulk
+    search_results.object_list = prefetch_product_cards(search_results.object_list)
+
 
     # Get the MultiProductPage to use its template
     try:
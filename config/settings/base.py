@@ -163,3 +163,96 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Explicitly set SSL redirect to False to prevent Safari HTTPS issues
 SECURE_SSL_REDIRECT = False
+
+# HTML parser backend used by the scrapers and AI preprocessing:
+# 'html.parser' (default), 'auto' (lxml if installed), 'lxml' or 'html5lib'.
+# lxml and html5lib are optional packages, not in requirements.txt
+SCRAPER_HTML_PARSER = os.getenv('SCRAPER_HTML_PARSER', 'html.parser')
+
+# Concurrency of AI batch URL processing (see apps/ai_processing/batch.py):
+# worker threads, page downloads and Bedrock calls in flight, and the initial
+# Bedrock request rate, which adapts to throttling (0 disables rate limiting)
+AI_BATCH_MAX_WORKERS = int(os.getenv('AI_BATCH_MAX_WORKERS', '4'))
+AI_BATCH_FETCH_CONCURRENCY = int(os.getenv('AI_BATCH_FETCH_CONCURRENCY', '4'))
+AI_BATCH_BEDROCK_CONCURRENCY = int(os.getenv('AI_BATCH_BEDROCK_CONCURRENCY', '2'))
+AI_BEDROCK_REQUESTS_PER_SECOND = float(os.getenv('AI_BEDROCK_REQUESTS_PER_SECOND', '1.0'))
+
+# Shared Bedrock client (see BedrockClientProvider in apps/ai_processing/utils.py):
+# connection pool size (at least AI_BATCH_BEDROCK_CONCURRENCY), keep-alive,
+# timeouts in seconds and attempts per call made by botocore
+AI_BEDROCK_MAX_POOL_CONNECTIONS = int(os.getenv('AI_BEDROCK_MAX_POOL_CONNECTIONS', '10'))
+AI_BEDROCK_TCP_KEEPALIVE = os.getenv('AI_BEDROCK_TCP_KEEPALIVE', 'True') == 'True'
+AI_BEDROCK_CONNECT_TIMEOUT = int(os.getenv('AI_BEDROCK_CONNECT_TIMEOUT', '10'))
+AI_BEDROCK_READ_TIMEOUT = int(os.getenv('AI_BEDROCK_READ_TIMEOUT', '300'))
+AI_BEDROCK_MAX_ATTEMPTS = int(os.getenv('AI_BEDROCK_MAX_ATTEMPTS', '3'))
+
+# Cache of Bedrock extraction results (see apps/ai_processing/result_cache.py):
+# 'database', 'filesystem' or 'none'; entries expire after AI_RESULT_CACHE_TTL seconds
+AI_RESULT_CACHE_BACKEND = os.getenv('AI_RESULT_CACHE_BACKEND', 'database')
+AI_RESULT_CACHE_DIR = os.getenv('AI_RESULT_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'bedrock'))
+AI_RESULT_CACHE_TTL = int(os.getenv('AI_RESULT_CACHE_TTL', str(30 * 24 * 60 * 60)))
+AI_RESULT_CACHE_MAX_ENTRIES = int(os.getenv('AI_RESULT_CACHE_MAX_ENTRIES', '5000'))
+# Minimum seconds between the evictions run by cache writes, per process
+AI_RESULT_CACHE_EVICT_INTERVAL = int(os.getenv('AI_RESULT_CACHE_EVICT_INTERVAL', '300'))
+
+# Page downloads of the AI pipeline (see apps/ai_processing/fetch.py): connections
+# per host and thread, retries, timeout in seconds and pages remembered for
+# conditional (ETag/Last-Modified) requests
+AI_FETCH_POOL_SIZE = int(os.getenv('AI_FETCH_POOL_SIZE', '10'))
+AI_FETCH_RETRIES = int(os.getenv('AI_FETCH_RETRIES', '3'))
+AI_FETCH_TIMEOUT = int(os.getenv('AI_FETCH_TIMEOUT', '30'))
+AI_FETCH_REMEMBERED_PAGES = int(os.getenv('AI_FETCH_REMEMBERED_PAGES', '128'))
+
+# Work queue of URL processing requests (see apps/ai_processing/work_queue.py):
+# lease of a claimed request in seconds, attempts before a request stays failed,
+# retry backoff (doubled per attempt, capped) and polling interval of idle workers
+AI_QUEUE_LEASE_SECONDS = int(os.getenv('AI_QUEUE_LEASE_SECONDS', '300'))
+AI_QUEUE_MAX_ATTEMPTS = int(os.getenv('AI_QUEUE_MAX_ATTEMPTS', '3'))
+AI_QUEUE_RETRY_BACKOFF = int(os.getenv('AI_QUEUE_RETRY_BACKOFF', '60'))
+AI_QUEUE_RETRY_BACKOFF_MAX = int(os.getenv('AI_QUEUE_RETRY_BACKOFF_MAX', '3600'))
+AI_QUEUE_POLL_INTERVAL = float(os.getenv('AI_QUEUE_POLL_INTERVAL', '5'))
+
+# AI processing dashboard (see apps/ai_processing/status_counts.py): seconds the
+# status histograms are cached between state transitions, and batches per page of
+# the lazily loaded batch filter
+AI_DASHBOARD_COUNTS_TTL = int(os.getenv('AI_DASHBOARD_COUNTS_TTL', '30'))
+AI_DASHBOARD_BATCH_OPTIONS_PAGE_SIZE = int(os.getenv('AI_DASHBOARD_BATCH_OPTIONS_PAGE_SIZE', '50'))
+
+# Django caches: 'locmem' (per process), 'filesystem' (shared by the processes of a
+# host, under CACHE_DIR) or 'dummy' (no caching). The 'pages' cache holds rendered
+# product pages and fragments for PAGE_CACHE_TTL seconds, invalidated on publish,
+# unpublish and tag changes (see apps/base_site/page_cache.py). Invalidations only
+# reach the process that made them under 'locmem', so other processes may serve a
+# stale page until it expires; its TTL defaults to one minute instead of one day
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'django'))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '5000'))
+PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', str(60 if CACHE_BACKEND == 'locmem' else 24 * 60 * 60)))
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'filesystem': 'django.core.cache.backends.filebased.FileBasedCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+CACHES = {
+    alias: {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.path.join(CACHE_DIR, alias) if CACHE_BACKEND == 'filesystem' else alias,
+        'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    }
+    for alias in ('default', 'pages')
+}
+
+# Token budget of the prompt variables sent to Bedrock (see apps/ai_processing/payload.py):
+# estimated tokens, existing tags sent with a page, and characters counted per token
+AI_PAYLOAD_MAX_TOKENS = int(os.getenv('AI_PAYLOAD_MAX_TOKENS', '25000'))
+AI_PAYLOAD_MAX_TAGS = int(os.getenv('AI_PAYLOAD_MAX_TAGS', '200'))
+AI_PAYLOAD_CHARS_PER_TOKEN = int(os.getenv('AI_PAYLOAD_CHARS_PER_TOKEN', '4'))
+
+# Debug artifacts (simplified AI payloads, scraped pages) for inspection, see
+# apps/scrapers/utils/debug_artifacts.py; off by default
+DEBUG_ARTIFACTS_ENABLED = os.getenv('DEBUG_ARTIFACTS_ENABLED', 'False') == 'True'
+DEBUG_ARTIFACTS_DIR = os.getenv('DEBUG_ARTIFACTS_DIR', os.path.join(MEDIA_ROOT, 'debug_artifacts'))
+DEBUG_ARTIFACTS_SAMPLE_RATE = float(os.getenv('DEBUG_ARTIFACTS_SAMPLE_RATE', '1.0'))
+DEBUG_ARTIFACTS_MAX_BYTES = int(os.getenv('DEBUG_ARTIFACTS_MAX_BYTES', str(1024 * 1024)))
+DEBUG_ARTIFACTS_RETENTION_DAYS = int(os.getenv('DEBUG_ARTIFACTS_RETENTION_DAYS', '7'))